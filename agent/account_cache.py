@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from single_flight import SingleFlight
+
+# Status que ainda podem mudar (PENDING vira COMPLETED/FAILED no backend)
+PENDING_STATUSES = {"PENDING"}
+
+
+def _operation_key(operation: dict):
+    # Linhas do Supabase têm id; sem id, os campos que identificam a operação
+    if operation.get("id") is not None:
+        return operation["id"]
+    return (operation.get("created_at"), operation.get("stellar_transaction_hash"), operation.get("type"),
+            operation.get("amount"), operation.get("destination_key"))
+
+
+def _is_pending(operation: dict) -> bool:
+    return str(operation.get("status") or "").upper() in PENDING_STATUSES
+
+
+def _history_cursor(items: list) -> str:
+    # Operação ainda pendente segura o cursor: ela é buscada de novo até ter status final
+    pending = [item.get("created_at") or "" for item in items if _is_pending(item)]
+    if pending:
+        return min(pending)
+    return max((item.get("created_at") or "" for item in items), default="")
+
+
+class AccountCache:
+    """
+    Per-user (userId) cache of balances and operation history, private to the process.
+
+    Saldos expiram em ACCOUNT_CACHE_TTL_SECONDS. O histórico guarda a lista e um
+    cursor (created_at mais recente, ou o da operação PENDING mais antiga): depois
+    do TTL, só as operações a partir do cursor são buscadas, e as que voltam
+    substituem as guardadas com a mesma chave (PENDING -> COMPLETED/FAILED). A
+    cada ACCOUNT_CACHE_FULL_REFRESH_SECONDS a lista inteira é buscada de novo.
+    `invalidate` (após um pagamento) descarta o saldo e marca o histórico como
+    velho. Buscas iguais em paralelo viram uma só.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_users: int = None, max_history: int = None,
+                 full_refresh_seconds: float = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("ACCOUNT_CACHE_TTL_SECONDS", "30"))
+        self.full_refresh_seconds = (full_refresh_seconds if full_refresh_seconds is not None
+                                     else float(os.getenv("ACCOUNT_CACHE_FULL_REFRESH_SECONDS", "300")))
+        self.max_users = max_users or int(os.getenv("ACCOUNT_CACHE_MAX_USERS", "10000"))
+        self.max_history = max_history or int(os.getenv("ACCOUNT_CACHE_MAX_HISTORY", "200"))
+        self._balances = OrderedDict()
+        self._history = OrderedDict()
+        # Incrementado a cada invalidate: resposta de uma busca anterior não entra no cache
+        self._generations = {}
+        self._flights = SingleFlight("account_cache")
+        self._metrics = {"hits": 0, "misses": 0, "incremental": 0, "full_refreshes": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    async def balances(self, user_id: str, fetch) -> dict:
+        """Cached balances response, or `await fetch()` ({"success", "balances"}) on a miss."""
+        with self._lock:
+            entry = self._balances.get(user_id)
+            if entry is not None and entry[0] >= time.time():
+                self._balances.move_to_end(user_id)
+                self._metrics["hits"] += 1
+                return entry[1]
+            self._metrics["misses"] += 1
+        return await self._flights.do(("balances", user_id), lambda: self._fetch_balances(user_id, fetch))
+
+    async def history(self, user_id: str, fetch) -> dict:
+        """
+        Cached history response. `fetch(since)` returns {"success", "history"};
+        `since` is the cursor of the cached list, or None for a full fetch.
+        """
+        with self._lock:
+            entry = self._history.get(user_id)
+            if entry is not None and entry["expires_at"] >= time.time():
+                self._history.move_to_end(user_id)
+                self._metrics["hits"] += 1
+                return {"success": True, "history": entry["items"]}
+            self._metrics["incremental" if entry is not None else "misses"] += 1
+        return await self._flights.do(("history", user_id), lambda: self._fetch_history(user_id, fetch))
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._balances.pop(user_id, None)
+            entry = self._history.get(user_id)
+            if entry is not None:
+                # Mantém a lista e o cursor: a próxima leitura é incremental
+                entry["expires_at"] = 0
+            self._metrics["invalidations"] += 1
+
+    def stats(self) -> dict:
+        flights = self._flights.stats()
+        with self._lock:
+            return {**self._metrics, "users": len(self._balances.keys() | self._history.keys()),
+                    "coalesced": flights["followers"], "inflight": flights["inflight"]}
+
+    async def _fetch_balances(self, user_id: str, fetch) -> dict:
+        generation = self._generations.get(user_id, 0)
+        response = await fetch()
+        if response.get("success"):
+            with self._lock:
+                if self._generations.get(user_id, 0) == generation:
+                    self._balances[user_id] = (time.time() + self.ttl_seconds, response)
+                    self._balances.move_to_end(user_id)
+                    self._evict(self._balances)
+        return response
+
+    async def _fetch_history(self, user_id: str, fetch) -> dict:
+        generation = self._generations.get(user_id, 0)
+        now = time.time()
+        with self._lock:
+            entry = self._history.get(user_id)
+            cached = None
+            if entry is not None and now - entry["full_at"] < self.full_refresh_seconds:
+                cached = list(entry["items"])
+            elif entry is not None:
+                # Operações mais antigas que o cursor também mudam (ou somem): de tempos em tempos, busca tudo
+                self._metrics["full_refreshes"] += 1
+        cursor = _history_cursor(cached) if cached else ""
+
+        response = await fetch(cursor or None)
+        if not response.get("success"):
+            return response
+
+        fetched = response.get("history") or []
+        if cached is not None:
+            # O cursor é inclusivo (>=); a versão recém-buscada substitui a guardada
+            merged = {_operation_key(item): item for item in cached}
+            merged.update((_operation_key(item), item) for item in fetched)
+            items = sorted(merged.values(), key=lambda item: item.get("created_at") or "", reverse=True)
+            full_at = entry["full_at"] if cursor else now
+        else:
+            items = list(fetched)
+            full_at = now
+        items = items[:self.max_history]
+
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                expires_at = time.time() + self.ttl_seconds
+            else:
+                # Houve pagamento durante a busca: guarda a lista, mas já vencida
+                expires_at = 0
+            self._history[user_id] = {"expires_at": expires_at, "items": items, "full_at": full_at}
+            self._history.move_to_end(user_id)
+            self._evict(self._history)
+        return {"success": True, "history": items}
+
+    def _evict(self, entries: OrderedDict):
+        while len(entries) > self.max_users:
+            evicted, _ = entries.popitem(last=False)
+            if evicted not in self._balances and evicted not in self._history:
+                self._generations.pop(evicted, None)
@@ -0,0 +1,103 @@
+"""
+Carga do SimpleAgent fora do import dos servidores.
+
+Importar `simple` traz crewai e as dependências do LLM, o que leva segundos e
+bastante memória. Os servidores criam um `AgentLoader` em vez de instanciar o
+SimpleAgent no import: a porta abre logo, o import e o warm-up rodam numa
+thread em segundo plano (ou no processo mestre, com `serve.py --preload`,
+antes do fork dos workers) e /ready responde 503 até terminar. Requisições
+que chegam antes disso esperam até AGENT_LOAD_TIMEOUT_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+
+LOAD_TIMEOUT_SECONDS = float(os.getenv("AGENT_LOAD_TIMEOUT_SECONDS", "60"))
+
+
+class AgentNotReady(Exception):
+    """The agent did not finish loading in time (or failed to load)."""
+
+
+class AgentLoader:
+    def __init__(self):
+        self.agent = None
+        self.error = None
+        self.import_seconds = None
+        self.build_seconds = None
+        self._loaded = threading.Event()
+        # Marcado ao fim de cada tentativa de carga, com sucesso ou com erro
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def load(self):
+        """Import `simple` and build the SimpleAgent once; safe to call from several threads."""
+        with self._lock:
+            if self.agent is not None:
+                return self.agent
+            try:
+                started = time.perf_counter()
+                from simple import SimpleAgent
+                self.import_seconds = time.perf_counter() - started
+                started = time.perf_counter()
+                self.agent = SimpleAgent()
+                self.build_seconds = time.perf_counter() - started
+            except Exception as e:
+                self.error = str(e)
+                self._finished.set()
+                logging.error(f"Falha ao carregar o agente: {e}")
+                raise
+            self.error = None
+            self._loaded.set()
+            self._finished.set()
+            logging.info(f"Agente carregado: import {self.import_seconds:.2f}s, construção {self.build_seconds:.2f}s")
+            return self.agent
+
+    def start_background_load(self) -> threading.Thread:
+        """Load the agent, then warm up its pool, in a daemon thread."""
+        def target():
+            try:
+                self.load().warm_up()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=target, name="agent-load", daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, timeout: float = None):
+        """
+        The loaded agent, waiting up to `timeout` seconds while it loads; raises
+        AgentNotReady on timeout, and right away once the load has failed.
+        """
+        if self.agent is None and self.error is not None:
+            raise AgentNotReady(self.error)
+        if not self._finished.wait(LOAD_TIMEOUT_SECONDS if timeout is None else timeout):
+            raise AgentNotReady("Agent is still loading")
+        if self.agent is None:
+            raise AgentNotReady(self.error or "Agent failed to load")
+        return self.agent
+
+    async def aget(self, timeout: float = None):
+        if self._finished.is_set():
+            return self.get()
+        return await asyncio.to_thread(self.get, timeout)
+
+    def session_storage(self):
+        self.get()
+        from simple import SESSION_STORAGE
+        return SESSION_STORAGE
+
+    def status(self) -> dict:
+        status = {"loaded": self.loaded, "import_seconds": self.import_seconds,
+                  "build_seconds": self.build_seconds, "load_error": self.error}
+        if self.agent is None:
+            return {**status, "ready": False}
+        return {**status, **self.agent.agent_pool.status()}
@@ -0,0 +1,79 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from tracing import span
+
+
+class AgentPool:
+    """
+    Pool pré-aquecido de ferramentas e agentes CrewAI.
+
+    As ferramentas (ex.: JSONSearchTool, que indexa e gera embeddings na
+    construção) são criadas uma única vez e compartilhadas. Os agentes são
+    criados em `size` slots, para que requisições concorrentes não usem a
+    mesma instância de Agent; cada requisição só monta o Task com o seu texto.
+    """
+
+    def __init__(self, tool_builders: dict, agent_builders: dict, size: int = None):
+        self.tool_builders = tool_builders
+        self.agent_builders = agent_builders
+        # Sem AGENT_POOL_SIZE, um slot por thread do executor (cada crew em execução segura um slot)
+        self.size = size or int(os.getenv("AGENT_POOL_SIZE", "0")) or int(os.getenv("AGENT_MAX_WORKERS", "8"))
+        self.tools = {}
+        self.error = None
+        self.warm_up_seconds = None
+        self._slots = queue.Queue()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """Build tools and agent slots once. Safe to call more than once."""
+        with self._lock:
+            if self._ready.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                tools = {}
+                for name, build in self.tool_builders.items():
+                    # JSONSearchTool indexa e gera embeddings aqui; o span mostra quanto custa
+                    with span(f"pool.build_tool.{name}"):
+                        tools[name] = build()
+                self.tools = tools
+                for _ in range(self.size):
+                    self._slots.put({name: build(self.tools) for name, build in self.agent_builders.items()})
+            except Exception as e:
+                self.error = str(e)
+                logging.error(f"Falha no warm-up do pool de agentes: {e}")
+                raise
+            self.warm_up_seconds = time.perf_counter() - started
+            self.error = None
+            self._ready.set()
+            logging.info(f"Pool de agentes pronto em {self.warm_up_seconds:.2f}s ({self.size} slots)")
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        """Borrow a slot of agents; warms the pool on first use if startup didn't."""
+        if not self._ready.is_set():
+            self.warm_up()
+        slot = self._slots.get(timeout=timeout)
+        try:
+            yield slot
+        finally:
+            self._slots.put(slot)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "size": self.size,
+            "available": self._slots.qsize(),
+            "warm_up_seconds": self.warm_up_seconds,
+            "error": self.error,
+        }
@@ -1,30 +1,54 @@
 # agent_server.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import logging
 
-# Importe a classe do seu agente. Supondo que o arquivo se chame 'agent.py'
-# e a classe seja 'StellarConverseCrew'. Adapte se o nome for diferente.
-from agent import StellarConverseCrew, SESSION_STORAGE
+from agent_loader import AgentLoader, AgentNotReady
+from bounded_executor import ServerBusy, unavailable_headers
+from http_client import aclose_async_client
+from streaming import stream_query
+from tracing import render_metrics
 
 # Configura o logging
 logging.basicConfig(level=logging.INFO)
 
-# Inicializa a aplicação FastAPI e o Crew
+# Inicializa a aplicação FastAPI; o Crew é carregado em segundo plano (ver agent_loader.py)
 app = FastAPI(
     title="Stellar Converse AI Agent API",
     description="An API to process user queries via a CrewAI agent."
 )
-crew = StellarConverseCrew()
+loader = AgentLoader()
 
 class QueryRequest(BaseModel):
     query: str
     session_id: str # O user_id do Telegram/Discord será usado aqui
 
+@app.on_event("startup")
+def warm_up_agent():
+    """Importa o agente e constrói ferramentas, embeddings e agentes em segundo plano ao subir o servidor."""
+    loader.start_background_load()
+
+@app.on_event("shutdown")
+async def close_clients():
+    """Fecha o pool de conexões HTTP e o executor dos crews."""
+    await aclose_async_client()
+    if loader.loaded:
+        loader.agent.executor.shutdown()
+
+def agent_unavailable(e: AgentNotReady) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Agent is not ready: {e}", headers=unavailable_headers(2))
+
 # --- Endpoints da API ---
 
+@app.get("/ready")
+def readiness():
+    """Readiness probe para o load balancer: 503 enquanto o warm-up não terminar."""
+    status = loader.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.post("/query")
-def handle_query(request: QueryRequest):
+async def handle_query(request: QueryRequest, x_request_id: str = Header(None)):
     """
     Este é o endpoint principal que recebe as mensagens dos bots.
     """
@@ -32,23 +56,60 @@ def handle_query(request: QueryRequest):
         logging.info(f"Recebida query para session_id='{request.session_id}': '{request.query}'")
         
         # Chama o método do seu crew para processar a mensagem
-        result = crew.process_query(request.query, request.session_id)
+        crew = await loader.aget()
+        result = await crew.aprocess_query(request.query, request.session_id, request_id=x_request_id)
         
         logging.info(f"Resposta do CrewAI: {result}")
         return {"result": result}
+    except AgentNotReady as e:
+        raise agent_unavailable(e)
+    except ServerBusy as e:
+        # Backpressure: o executor dos crews está lotado
+        raise HTTPException(status_code=503, detail="Agent is busy, try again shortly", headers=unavailable_headers(1, e.processed))
     except Exception as e:
         logging.error(f"Erro ao processar a query para session_id='{request.session_id}': {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest, x_request_id: str = Header(None)):
+    """
+    Variante em streaming de /query para os bots: uma linha JSON por evento
+    (intenção resolvida, chamada à API, pedaços da resposta) e, no fim,
+    {"event": "result", "result": ...} com o mesmo conteúdo de /query.
+    """
+    logging.info(f"Recebida query (stream) para session_id='{request.session_id}': '{request.query}'")
+    try:
+        crew = await loader.aget()
+    except AgentNotReady as e:
+        raise agent_unavailable(e)
+    return StreamingResponse(stream_query(crew, request.query, request.session_id, x_request_id), media_type="application/x-ndjson")
+
 @app.get("/session/{session_id}")
 def get_session_info(session_id: str):
     """Endpoint de utilidade para verificar o estado da sessão (se está logado, etc.)"""
-    session_data = SESSION_STORAGE.get(session_id, {})
+    try:
+        session_data = loader.session_storage().get(session_id, {})
+    except AgentNotReady as e:
+        raise agent_unavailable(e)
     return {
         "session_id": session_id,
         "authenticated": bool(session_data.get("sessionToken")),
         "user_id": session_data.get("userId"),
-        "email": session_data.get("email")
+        "email": session_data.get("email"),
+        "pending_transaction": bool(session_data.get("pending_transaction"))
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métricas no formato do Prometheus: spans do pipeline, tokens do LLM e latência da API Node."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/sessions/stats")
+def get_session_stats():
+    """Métricas do session store (tamanho, hits, expirações e evicções)."""
+    try:
+        return loader.session_storage().stats()
+    except AgentNotReady as e:
+        raise agent_unavailable(e)
+
 # Para rodar este servidor, use o comando: uvicorn agent_server:app --reload --port 8000
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+Leitura de valores de pagamento escritos em PT ou EN.
+
+"10,5" e "10.5" são 10.5 e "1.000,50" e "1,000.50" são 1000.50. Já "1,000" e
+"1.000" mudam de valor conforme o idioma (mil em um, um no outro): em vez de
+adivinhar, `parse_amount` recusa e quem chama pede para o usuário confirmar.
+"""
+import re
+
+
+AMOUNT_PATTERN = r"\d+(?:[.,]\d+)*"
+_GROUPED = re.compile(r"^\d{1,3}(?:(?P<sep>[.,])\d{3})+$")
+
+
+class AmbiguousAmountError(ValueError):
+    """The amount could be read as two different values (e.g. "1,000")."""
+
+
+def parse_amount(text) -> str:
+    """
+    Normalized amount ("1000.50") from user text. Raises AmbiguousAmountError
+    when the separator could be either decimal or thousands, and ValueError
+    when the text is not an amount.
+    """
+    text = str(text).strip().replace(" ", "")
+    if not re.fullmatch(AMOUNT_PATTERN, text):
+        raise ValueError(f"invalid amount '{text}'")
+    separators = [char for char in text if char in ".,"]
+    if not separators:
+        return text
+
+    decimal_separator = separators[-1]
+    integer, _, fraction = text.rpartition(decimal_separator)
+    if len(set(separators)) == 2:
+        # "1.000,50" / "1,000.50": o último separador é o decimal, o outro agrupa milhares
+        if separators.count(decimal_separator) != 1 or not _GROUPED.match(integer):
+            raise ValueError(f"invalid amount '{text}'")
+        return integer.replace(separators[0], "") + "." + fraction
+
+    if len(separators) > 1:
+        # "1.000.000": só pode ser agrupamento de milhares
+        if not _GROUPED.match(text):
+            raise ValueError(f"invalid amount '{text}'")
+        return text.replace(decimal_separator, "")
+
+    # Um separador só: com exatamente 3 dígitos depois ("1,000") pode ser mil ou um
+    if len(fraction) == 3 and integer.lstrip("0"):
+        raise AmbiguousAmountError(f"ambiguous amount '{text}'")
+    return f"{integer}.{fraction}"
@@ -1,8 +1,13 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from simple import SimpleAgent
+from agent_loader import AgentLoader, AgentNotReady
+from bounded_executor import ServerBusy, unavailable_headers
+from http_client import aclose_async_client
+from streaming import stream_query
+from tracing import render_metrics
 
 
 app = FastAPI()
@@ -16,24 +21,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-crew = SimpleAgent()
+# O SimpleAgent (crewai e cia.) é importado em segundo plano; ver agent_loader.py
+loader = AgentLoader()
+
+
+def agent():
+    try:
+        return loader.get()
+    except AgentNotReady as e:
+        raise HTTPException(status_code=503, detail=f"Agent is not ready: {e}", headers=unavailable_headers(2))
+
+
+async def aagent():
+    try:
+        return await loader.aget()
+    except AgentNotReady as e:
+        raise HTTPException(status_code=503, detail=f"Agent is not ready: {e}", headers=unavailable_headers(2))
+
+
+@app.on_event("startup")
+def warm_up_agent():
+    # Importa o agente e pré-aquece ferramentas e agentes sem bloquear a subida do servidor
+    loader.start_background_load()
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await aclose_async_client()
+    if loader.loaded:
+        loader.agent.executor.shutdown()
+
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 503 até o agente carregar e o pool terminar o warm-up."""
+    status = loader.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
 class QueryRequest(BaseModel):
     query: str
     session_id: str
 
 @app.post("/query")
-def query_endpoint(request):
-    result = crew.process_query(request["query"], request["session_id"]) # integracao com front
+async def query_endpoint(request: QueryRequest, x_request_id: str = Header(None)):
+    crew = await aagent()
+    try:
+        result = await crew.aprocess_query(request.query, request.session_id, request_id=x_request_id) # integracao com front
+    except ServerBusy as e:
+        raise HTTPException(status_code=503, detail="Agent is busy, try again shortly", headers=unavailable_headers(1, e.processed))
     return {"result": result}
 
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest, x_request_id: str = Header(None)):
+    """Mesmo que /query, mas em NDJSON: eventos de progresso e por fim {"event": "result"}."""
+    crew = await aagent()
+    return StreamingResponse(stream_query(crew, request.query, request.session_id, x_request_id), media_type="application/x-ndjson")
+
 @app.get("/session/{session_id}")
 def get_session_info(session_id: str):
-    from agent import SESSION_STORAGE
-    session_data = SESSION_STORAGE.get(session_id, {})
+    agent()
+    session_data = loader.session_storage().get(session_id, {})
     return {
         "session_id": session_id,
         "authenticated": bool(session_data.get("sessionToken")),
         "user_id": session_data.get("userId"),
-        "email": session_data.get("email")
-    }
\ No newline at end of file
+        "email": session_data.get("email"),
+        "pending_transaction": bool(session_data.get("pending_transaction"))
+    }
+
+@app.get("/router/stats")
+def get_router_stats():
+    """Contadores de hit/miss do fast path de intenções."""
+    return agent().intent_router.stats()
+
+
+@app.get("/sessions/stats")
+def get_session_stats():
+    """Métricas do session store (tamanho, hits, expirações e evicções)."""
+    agent()
+    return loader.session_storage().stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Spans do pipeline, tokens do LLM e latência da API Node no formato do Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/mapper/stats")
+def get_mapper_stats():
+    """Chamadas, escalonamentos, latência, tokens e custo por camada de modelo do mapper."""
+    mapper = agent().tiered_mapper
+    return mapper.stats() if mapper is not None else {"mode": "crew"}
+
+
+@app.get("/cache/stats")
+def get_llm_cache_stats():
+    """Hit rate e tamanho do cache de respostas do LLM."""
+    return agent().llm_cache.stats()
+
+
+@app.get("/cache/account/stats")
+def get_account_cache_stats():
+    """Hits, buscas incrementais do histórico e requisições agrupadas do cache de saldos/histórico."""
+    return agent().account_cache.stats()
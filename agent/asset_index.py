@@ -0,0 +1,102 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from intent_router import normalize_text
+
+
+ISSUERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "issuers.json")
+
+# Apelidos em PT/EN que os usuários usam no lugar do código do ativo. Nada de
+# tickers de outros ativos ("usd", "usdt"): um pagamento nunca troca de ativo.
+ASSET_ALIASES = {
+    "XLM": ["xlm", "lumen", "lumens", "stellar"],
+    "USDC": ["dolar", "dolares", "dollar", "dollars"],
+    "BRLC": ["real", "reais", "brl"],
+    "EURC": ["euro", "euros", "eur"],
+    "ARS": ["peso", "pesos", "peso argentino"],
+    "AQUA": ["aquarius"],
+    "yXLM": ["xlm rendendo", "staked xlm"],
+}
+
+ISSUER_KEY_PATTERN = re.compile(r"^G[A-Za-z0-9]{55}$")
+
+
+@dataclass(frozen=True)
+class AssetInfo:
+    code: str
+    issuer: str = None
+    name: str = ""
+    anchor: str = ""
+
+    @property
+    def is_native(self) -> bool:
+        return self.issuer is None
+
+
+NATIVE_ASSET = AssetInfo(code="XLM", issuer=None, name="Stellar Lumens", anchor="native")
+
+
+class AssetIndex:
+    """
+    Índice em memória de issuers.json.
+
+    `resolve` aceita só código (sem diferenciar maiúsculas), nome, apelido
+    ("dolar" -> USDC) ou chave do emissor quando ela é única. Sem match
+    aproximado: o ativo resolvido é o que vai no pagamento, e um ticker não
+    suportado ("usdt") tem que voltar como desconhecido. XLM é o ativo nativo
+    (sem emissor).
+    """
+
+    def __init__(self, issuers: dict, aliases: dict = None):
+        self.assets = {"XLM": NATIVE_ASSET}
+        for code, data in issuers.items():
+            self.assets[code] = AssetInfo(
+                code=code,
+                issuer=data.get("issuer"),
+                name=data.get("name", ""),
+                anchor=data.get("anchor", ""),
+            )
+
+        self._lookup = {}
+        for code, asset in self.assets.items():
+            self._lookup.setdefault(normalize_text(code), asset)
+            if asset.name:
+                self._lookup.setdefault(normalize_text(asset.name), asset)
+        for code, aliases_for_code in (aliases if aliases is not None else ASSET_ALIASES).items():
+            if code in self.assets:
+                for alias in aliases_for_code:
+                    self._lookup.setdefault(normalize_text(alias), self.assets[code])
+
+        self._by_issuer = {}
+        for asset in self.assets.values():
+            if asset.issuer:
+                self._by_issuer.setdefault(asset.issuer, []).append(asset)
+
+    @classmethod
+    def load(cls, path: str = ISSUERS_PATH) -> "AssetIndex":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def resolve(self, text: str):
+        """Return the AssetInfo for a code, name, alias or unique issuer key, or None."""
+        raw = (text or "").strip()
+        if not raw:
+            return None
+        if ISSUER_KEY_PATTERN.match(raw):
+            matches = self._by_issuer.get(raw, [])
+            return matches[0] if len(matches) == 1 else None
+
+        return self._lookup.get(normalize_text(raw))
+
+    def describe(self) -> str:
+        """Compact 'CODE (Name)' list for prompts."""
+        return ", ".join(f"{asset.code} ({asset.name})" for asset in self.assets.values())
+
+
+@lru_cache(maxsize=None)
+def load_asset_index(path: str = ISSUERS_PATH) -> AssetIndex:
+    """Process-wide AssetIndex, loaded once."""
+    return AssetIndex.load(path)
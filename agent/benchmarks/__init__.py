@@ -0,0 +1 @@
+"""Benchmarks do agente. Rode a partir de `agent/`, ex.: `python -m benchmarks.session_lookup`."""
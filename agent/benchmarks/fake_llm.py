@@ -0,0 +1,189 @@
+"""
+LLM falso para benchmarks e testes de carga, sem chamar a OpenAI.
+
+Responde no formato ReAct que o CrewAI espera ("Final Answer: ...") com
+saídas determinísticas: para o prompt do task mapper, o JSON de tarefa
+registrado para a query em `canned_responses.json` (ou outro arquivo via
+FAKE_LLM_CANNED_PATH) ou, se não houver, deduzido por regras simples; para o
+final_agent, uma frase curta. A latência de cada chamada é configurável e
+bloqueia a thread, como uma chamada HTTP síncrona.
+
+Para usar no SimpleAgent (inclusive nos workers do servidor):
+
+    AGENT_LLM_FACTORY=benchmarks.fake_llm:build_fake_llm FAKE_LLM_LATENCY_MS=800 uvicorn agent_server:app
+
+O mapper em camadas (MAPPER_MODE=tiered) usa outro cliente, com saída JSON
+direta e latência por modelo em FAKE_LLM_MODEL_LATENCY_MS:
+
+    MAPPER_CLIENT_FACTORY=benchmarks.fake_llm:build_fake_structured_client \
+        FAKE_LLM_MODEL_LATENCY_MS=gpt-4o-mini=300,gpt-4o=900 uvicorn agent_server:app
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from amounts import parse_amount
+from intent_router import EMAIL_PATTERN, PAYMENT_PATTERN
+from llm_cache import cache_key_text
+
+
+QUERY_PATTERN = re.compile(r'User Query:\s*"(?P<query>.*?)"', re.DOTALL)
+TASK_PATTERN = re.compile(r"result of an API call for the task:\s*(?P<task>\w+)")
+CANNED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "canned_responses.json")
+
+
+def load_canned(path: str = None) -> dict:
+    """Canned mapper outputs keyed by normalized query text."""
+    with open(path or os.getenv("FAKE_LLM_CANNED_PATH", CANNED_PATH), "r") as f:
+        return {cache_key_text(query): response for query, response in json.load(f).items()}
+
+
+def fake_amount(text: str) -> str:
+    """Amount as the router reads it ("1.000,50" -> "1000.50")."""
+    try:
+        return parse_amount(text)
+    except ValueError:
+        # "1,000" ambíguo: vai como veio e a validação do schema pede confirmação, como com o LLM real
+        return text
+
+
+class FakeResponder:
+    """Gera as respostas e conta as chamadas; compartilhado pelos adaptadores abaixo."""
+
+    def __init__(self, latency_ms: float = None, jitter: float = None, canned: dict = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("FAKE_LLM_LATENCY_JITTER", "0.2"))
+        self.canned = canned if canned is not None else load_canned()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, prompt: str) -> str:
+        self.wait(self.latency_ms)
+        return f"Thought: I now know the final answer\nFinal Answer: {self.answer(prompt)}"
+
+    def wait(self, latency_ms: float):
+        with self._lock:
+            self.calls += 1
+        if latency_ms > 0:
+            time.sleep(latency_ms * (1 + random.uniform(-self.jitter, self.jitter)) / 1000)
+
+    def answer(self, prompt: str) -> str:
+        task = TASK_PATTERN.search(prompt)
+        if task:
+            return f"Resposta de teste para {task.group('task')}."
+        query = QUERY_PATTERN.search(prompt)
+        return json.dumps(self.map_query(query.group("query") if query else prompt), ensure_ascii=False)
+
+    def map_query(self, query: str) -> dict:
+        """Task JSON for a user query, with the same schema as the mapper prompt."""
+        canned = self.canned.get(cache_key_text(query))
+        if canned is not None:
+            return canned
+        lowered = query.lower()
+        email = EMAIL_PATTERN.search(query)
+        payment = PAYMENT_PATTERN.search(query)
+        if email and ("cadastr" in lowered or "criar conta" in lowered or "sign up" in lowered):
+            return {"message": "Criando sua conta.", "task": "onboard_user", "params": {"email": email.group(0)}}
+        if email:
+            return {"message": "Fazendo login.", "task": "login", "params": {"email": email.group(0)}}
+        if payment:
+            params = {key: value or "" for key, value in payment.groupdict().items()}
+            return {
+                "message": "Preparando o pagamento.",
+                "task": "execute_payment",
+                "params": {
+                    "destination": params.get("name", ""),
+                    "amount": fake_amount(params.get("amount", "")),
+                    "asset": params.get("asset", "") or "XLM",
+                    "memo": "",
+                },
+            }
+        if "contat" in lowered or "contact" in lowered:
+            return {"message": "Listando seus contatos.", "task": "list_contacts", "params": {}}
+        if "saldo" in lowered or "balance" in lowered:
+            return {"message": "Consultando seu saldo.", "task": "get_account_balance", "params": {}}
+        if "histor" in lowered:
+            return {"message": "Buscando seu histórico.", "task": "get_operations_history", "params": {}}
+        return {"message": "Não entendi o pedido.", "task": "clarification_needed", "params": {"message": query}}
+
+
+def build_langchain_llm(responder: FakeResponder):
+    """Adapter with the `langchain_openai.OpenAI` interface (a langchain LLM)."""
+    from langchain_core.language_models.llms import LLM
+
+    class FakeOpenAI(LLM):
+        model_name: str = "fake-llm"
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-openai"
+
+        def _call(self, prompt: str, stop=None, run_manager=None, **kwargs) -> str:
+            return responder.respond(prompt)
+
+    return FakeOpenAI()
+
+
+def build_crewai_llm(responder: FakeResponder):
+    """
+    Adapter for CrewAI versions that convert langchain LLMs to litellm by
+    model name; a BaseLLM subclass is used as-is. None when unavailable.
+    """
+    try:
+        from crewai import BaseLLM
+    except ImportError:
+        return None
+
+    class FakeCrewLLM(BaseLLM):
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+            if isinstance(messages, str):
+                prompt = messages
+            else:
+                prompt = "\n".join(str(message.get("content", "")) for message in messages)
+            return responder.respond(prompt)
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return True
+
+        def get_context_window_size(self) -> int:
+            return 8192
+
+    return FakeCrewLLM(model="fake-llm")
+
+
+class FakeStructuredClient:
+    """Cliente da saída estruturada do mapper em camadas (interface de model_tiers.OpenAIStructuredClient)."""
+
+    def __init__(self, responder: FakeResponder, model_latency_ms: dict = None):
+        self.responder = responder
+        if model_latency_ms is None:
+            pairs = [item.split("=", 1) for item in os.getenv("FAKE_LLM_MODEL_LATENCY_MS", "").split(",") if "=" in item]
+            model_latency_ms = {model.strip(): float(latency) for model, latency in pairs}
+        self.model_latency_ms = model_latency_ms
+
+    def complete(self, model: str, system: str, user: str, schema: dict) -> tuple:
+        self.responder.wait(self.model_latency_ms.get(model, self.responder.latency_ms))
+        content = json.dumps(self.responder.map_query(user), ensure_ascii=False)
+        # ~4 caracteres por token, só para o custo estimado ter ordem de grandeza
+        usage = {"prompt_tokens": (len(system) + len(user)) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return content, usage
+
+
+RESPONDER = FakeResponder()
+
+
+def build_fake_llm():
+    """Factory for AGENT_LLM_FACTORY: the CrewAI-native adapter when supported, else the langchain one."""
+    return build_crewai_llm(RESPONDER) or build_langchain_llm(RESPONDER)
+
+
+def build_fake_structured_client():
+    """Factory for MAPPER_CLIENT_FACTORY."""
+    return FakeStructuredClient(RESPONDER)
@@ -0,0 +1,145 @@
+"""
+Teste de carga do modo multi-worker contra um LLM falso e a API Node stub.
+
+Para cada número de workers, sobe o stub da API Node, os workers do
+`serve.py` (com AGENT_LLM_FACTORY=benchmarks.fake_llm:build_fake_llm e
+SESSION_STORE=sqlite) e dispara usuários virtuais concorrentes: login e
+depois consultas que passam pelo task mapper (fast path e cache de LLM
+desligados, para medir o caminho caro). Mostra throughput e latência.
+
+    python -m benchmarks.load_bench --workers 1 2 4 --users 64 --queries 5 --llm-latency-ms 800
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import httpx
+
+from serve import start_sticky_workers, worker_endpoints, worker_env
+
+
+QUERIES = [
+    "listar meus contatos",
+    "qual o meu saldo?",
+    "mostrar meu histórico de operações",
+    "enviar 10 XLM para Maria",
+]
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def wait_ready(client: httpx.AsyncClient, base_urls: list, timeout: float = 180):
+    deadline = time.monotonic() + timeout
+    pending = set(base_urls)
+    while pending:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"workers not ready: {sorted(pending)}")
+        for url in list(pending):
+            try:
+                response = await client.get(f"{url}/ready")
+                if response.status_code == 200:
+                    pending.discard(url)
+            except httpx.TransportError:
+                pass
+        await asyncio.sleep(0.5)
+
+
+async def virtual_user(client: httpx.AsyncClient, endpoints: list, user: int, queries: int, latencies: list, errors: list):
+    session_id = f"load:{user}"
+    # Mesmo roteamento do gateway dos bots (stellarBots/agent_client.py)
+    endpoint = endpoints[zlib.crc32(session_id.encode("utf-8")) % len(endpoints)]
+    messages = [f"fazer login com user{user}@example.com"]
+    for i in range(queries):
+        query = QUERIES[(user + i) % len(QUERIES)]
+        messages.append(query)
+        if query.startswith("enviar"):
+            # O pagamento fica aguardando a chave secreta; o stub aceita qualquer uma
+            messages.append("S" + "A" * 55)
+    for message in messages:
+        started = time.perf_counter()
+        try:
+            response = await client.post(endpoint, json={"query": message, "session_id": session_id})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+
+async def run_load(endpoints: list, users: int, queries: int) -> dict:
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        await wait_ready(client, [url.rsplit("/query", 1)[0] for url in endpoints])
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, endpoints, user, queries, latencies, errors) for user in range(users)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        "sample_error": errors[0] if errors else "",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=5, help="queries per user after login")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--api-latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--api-port", type=int, default=3901)
+    parser.add_argument("--app", default="agent_server:app")
+    args = parser.parse_args()
+
+    stub = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_node_api", "--port", str(args.api_port),
+                             "--latency-ms", str(args.api_latency_ms)])
+    print(f"{'workers':>8} {'reqs':>6} {'errors':>7} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = worker_env(workers)
+                env.update({
+                    "SESSION_STORE": "sqlite",
+                    "SESSION_DB_PATH": os.path.join(tmp, "sessions.sqlite3"),
+                    "NODE_API_BASE_URL": f"http://127.0.0.1:{args.api_port}",
+                    "AGENT_LLM_FACTORY": "benchmarks.fake_llm:build_fake_llm",
+                    "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+                    "INTENT_ROUTER_ENABLED": "false",
+                    "LLM_CACHE_ENABLED": "false",
+                })
+                processes = start_sticky_workers(args.app, "127.0.0.1", args.port, workers, env)
+                try:
+                    result = asyncio.run(run_load(worker_endpoints("127.0.0.1", args.port, workers), args.users, args.queries))
+                finally:
+                    for process in processes:
+                        process.terminate()
+                    for process in processes:
+                        process.wait()
+            print(f"{workers:>8} {result['requests']:>6} {result['errors']:>7} {result['throughput']:>8.2f} "
+                  f"{result['p50']:>8.2f} {result['p95']:>8.2f}")
+            if result["sample_error"]:
+                print(f"         first error: {result['sample_error']}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
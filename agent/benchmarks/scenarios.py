@@ -0,0 +1,219 @@
+"""
+Cenários de benchmark do pipeline do SimpleAgent, sem OpenAI nem backend Node.
+
+Sobe o stub da API Node (`benchmarks.stub_node_api`), troca o LLM pelo
+`benchmarks.fake_llm` e roda usuários virtuais concorrentes chamando
+`SimpleAgent.arun` no mesmo processo. Mede latência por etapa, throughput
+e memória, e compara com uma baseline para acusar regressões no CI.
+
+    python -m benchmarks.scenarios --scenario payment --users 20 --iterations 3
+    python -m benchmarks.scenarios --output bench.json
+    python -m benchmarks.scenarios --baseline bench.json --max-regression 0.25   # exit 1 se piorar
+    python -m benchmarks.scenarios --mapper tiered --fast-llm-latency-ms 80       # mapper em camadas
+
+Cenários:
+    payment     login -> listar contatos -> pedido de pagamento -> chave secreta
+    read        login -> listar contatos -> saldo -> histórico
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+
+SECRET_KEY = "S" + "A" * 55
+SCENARIOS = {
+    "payment": [
+        ("list_contacts", "listar meus contatos"),
+        ("payment_request", "enviar 10 XLM para Maria"),
+        ("secret_key", SECRET_KEY),
+    ],
+    "read": [
+        ("list_contacts", "listar meus contatos"),
+        ("balance", "qual o meu saldo?"),
+        ("history", "mostrar meu histórico de operações"),
+    ],
+}
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_stub_api(port: int, latency_ms: float) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_node_api", "--port", str(port),
+                                "--latency-ms", str(latency_ms)])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise TimeoutError("stub Node API did not start")
+
+
+async def virtual_user(agent, user: int, steps: list, iterations: int, stages: dict, errors: list):
+    session_id = f"bench:{user}"
+    plan = [("login", f"fazer login com user{user}@example.com")] + steps * iterations
+    for stage, text in plan:
+        started = time.perf_counter()
+        try:
+            result = await agent.arun({"query": text}, session_id=session_id)
+            if not isinstance(result, dict) or not result.get("message"):
+                errors.append(f"{stage}: empty result {result!r}")
+        except Exception as e:
+            errors.append(f"{stage}: {type(e).__name__}: {e}")
+            continue
+        stages.setdefault(stage, []).append(time.perf_counter() - started)
+
+
+async def run_scenario(agent, scenario: str, users: int, iterations: int) -> dict:
+    stages, errors = {}, []
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(agent, user, SCENARIOS[scenario], iterations, stages, errors)
+                           for user in range(users)))
+    elapsed = time.perf_counter() - started
+    requests = sum(len(values) for values in stages.values())
+    return {
+        "scenario": scenario,
+        "users": users,
+        "iterations": iterations,
+        "requests": requests,
+        "errors": len(errors),
+        "sample_errors": errors[:3],
+        "seconds": elapsed,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "mean": statistics.mean(values),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+            }
+            for stage, values in stages.items()
+        },
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list:
+    """Human-readable regressions of p50 per stage and of throughput beyond `max_regression`."""
+    regressions = []
+    for stage, stats in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base and base["p50"] > 0 and stats["p50"] > base["p50"] * (1 + max_regression):
+            regressions.append(f"{stage} p50 {stats['p50'] * 1000:.1f}ms > baseline {base['p50'] * 1000:.1f}ms")
+    if baseline.get("throughput") and result["throughput"] < baseline["throughput"] * (1 - max_regression):
+        regressions.append(f"throughput {result['throughput']:.2f} req/s < baseline {baseline['throughput']:.2f} req/s")
+    return regressions
+
+
+def print_report(result: dict):
+    print(f"scenario={result['scenario']} users={result['users']} iterations={result['iterations']} "
+          f"requests={result['requests']} errors={result['errors']} "
+          f"throughput={result['throughput']:.2f} req/s in {result['seconds']:.2f}s")
+    print(f"{'stage':>16} {'count':>6} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:>16} {stats['count']:>6} {stats['mean'] * 1000:>10.1f} {stats['p50'] * 1000:>10.1f} "
+              f"{stats['p95'] * 1000:>10.1f} {stats['max'] * 1000:>10.1f}")
+    memory = result["memory"]
+    line = f"memory: max RSS {memory['max_rss_mb']:.1f} MB"
+    if memory["heap_peak_mb"] is not None:
+        line += f", python heap peak {memory['heap_peak_mb']:.1f} MB"
+    print(line)
+    mapper = result.get("mapper")
+    if mapper:
+        print(f"mapper: {mapper['messages']} mensagens, custo estimado {mapper['cost_per_message_usd']} USD/mensagem")
+        for name, tier in mapper["tiers"].items():
+            print(f"  {name} ({tier['model']}): {tier['calls']} chamadas, {tier['escalated']} escalonadas, "
+                  f"p50 {tier['p50_ms']} ms, {tier['cost_usd']} USD")
+    for error in result["sample_errors"]:
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="payment")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=3, help="scenario repetitions per user after login")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--api-latency-ms", type=float, default=20)
+    parser.add_argument("--api-port", type=int, default=3902)
+    parser.add_argument("--mapper", choices=["crew", "tiered"], default="crew", help="task mapper (see model_tiers.py)")
+    parser.add_argument("--fast-llm-latency-ms", type=float, default=80, help="latency of the fast tier with --mapper tiered")
+    parser.add_argument("--fast-path", action="store_true", help="keep the intent router on (default: every query hits the LLM)")
+    parser.add_argument("--trace-memory", action="store_true", help="also record the Python heap peak (tracemalloc slows the run)")
+    parser.add_argument("--output", help="write the result as JSON (e.g. to use as a baseline)")
+    parser.add_argument("--baseline", help="JSON result to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Precisa estar no ambiente antes do import do simple (lido na carga do módulo)
+    os.environ.update({
+        "NODE_API_BASE_URL": f"http://127.0.0.1:{args.api_port}",
+        "AGENT_LLM_FACTORY": "benchmarks.fake_llm:build_fake_llm",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "INTENT_ROUTER_ENABLED": "true" if args.fast_path else "false",
+        "LLM_CACHE_ENABLED": "false",
+        "SESSION_STORE": "memory",
+    })
+    if args.mapper == "tiered":
+        os.environ.update({
+            "MAPPER_MODE": "tiered",
+            "MAPPER_CLIENT_FACTORY": "benchmarks.fake_llm:build_fake_structured_client",
+            "FAKE_LLM_MODEL_LATENCY_MS": f"{os.getenv('MAPPER_FAST_MODEL', 'gpt-4o-mini')}={args.fast_llm_latency_ms},"
+                                         f"{os.getenv('MAPPER_STRONG_MODEL', 'gpt-4o')}={args.llm_latency_ms}",
+        })
+    stub = start_stub_api(args.api_port, args.api_latency_ms)
+    try:
+        if args.trace_memory:
+            tracemalloc.start()
+        from simple import SimpleAgent
+        agent = SimpleAgent()
+        agent.warm_up()
+        result = asyncio.run(run_scenario(agent, args.scenario, args.users, args.iterations))
+        if agent.tiered_mapper is not None:
+            result["mapper"] = agent.tiered_mapper.stats()
+        heap_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        tracemalloc.stop()
+        agent.executor.shutdown()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    # ru_maxrss vem em KB no Linux
+    result["memory"] = {
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heap_peak_mb": heap_peak / (1024 * 1024) if heap_peak is not None else None,
+    }
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = result["errors"] > 0
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
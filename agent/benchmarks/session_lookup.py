@@ -0,0 +1,64 @@
+"""
+Micro-benchmark do lookup de sessão por token.
+
+Compara o índice reverso do SessionStore (`find_by_token`) com a varredura
+linear que o ExecutePaymentTool fazia antes, de 10 a 1M sessões ativas.
+
+    python -m benchmarks.session_lookup --sizes 10 1000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def populate(store, size: int) -> list:
+    tokens = []
+    for i in range(size):
+        token = f"token-{i}"
+        store.set(f"telegram:{i}", {"sessionToken": token, "userId": f"user-{i}"})
+        tokens.append(token)
+    return tokens
+
+
+def linear_scan(store, token: str):
+    for session_id, data in store.items():
+        if data.get("sessionToken") == token:
+            return session_id, data
+    return None
+
+
+def time_lookups(fn, store, tokens: list, lookups: int) -> float:
+    sample = [random.choice(tokens) for _ in range(lookups)]
+    started = time.perf_counter()
+    for token in sample:
+        fn(store, token)
+    return (time.perf_counter() - started) / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--scan-lookups", type=int, default=20, help="linear scans are slow; keep this small")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>10} {'index (us)':>12} {'scan (us)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            if args.backend == "sqlite":
+                store = SQLiteSessionStore(path=os.path.join(tmp, f"sessions-{size}.sqlite3"), max_entries=size + 1)
+            else:
+                store = MemorySessionStore(max_entries=size + 1)
+            tokens = populate(store, size)
+            indexed = time_lookups(lambda s, t: s.find_by_token(t), store, tokens, args.lookups)
+            scanned = time_lookups(linear_scan, store, tokens, args.scan_lookups)
+            print(f"{size:>10} {indexed:>12.2f} {scanned:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cold start do servidor do agente: tempo de import, tempo até a porta abrir,
+tempo até /ready e memória por worker.
+
+Compara `serve.py --workers N` (cada worker importa e constrói o agente
+sozinho) com `serve.py --workers N --preload` (o mestre carrega uma vez e os
+workers nascem por fork). A memória vem de /proc, então a parte de RSS/PSS só
+funciona no Linux; PSS divide as páginas compartilhadas entre os processos e
+mostra o ganho do copy-on-write, que o RSS esconde.
+
+    python -m benchmarks.startup --workers 1 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+FAKE_ENV = {
+    "AGENT_LLM_FACTORY": "benchmarks.fake_llm:build_fake_llm",
+    "FAKE_LLM_LATENCY_MS": "0",
+}
+
+
+def import_seconds(module: str, env: dict) -> float:
+    """Wall time to import `module` in a fresh interpreter."""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def descendants(pid: int) -> list:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # O nome do processo pode ter espaços; o ppid vem depois do ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def memory_kb(pid: int) -> dict:
+    usage = {"rss": 0, "pss": 0}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss"] = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    usage["pss"] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+
+def wait_for(url: str, ok, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if ok(httpx.get(url, timeout=2)):
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def measure_server(args, workers: int, preload: bool, env: dict) -> dict:
+    command = [sys.executable, "serve.py", "--app", args.app, "--port", str(args.port), "--workers", str(workers)]
+    if preload:
+        command.append("--preload")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        wait_for(f"{base_url}/metrics", lambda response: response.status_code == 200, args.timeout)
+        listen = time.perf_counter() - started
+        # Sem --sticky os workers dividem a porta: só conta como pronto quando
+        # várias respostas seguidas (de workers quaisquer) vierem 200
+        streak = {"count": 0}
+
+        def all_ready(response):
+            streak["count"] = streak["count"] + 1 if response.status_code == 200 else 0
+            return streak["count"] >= 4 * workers
+
+        wait_for(f"{base_url}/ready", all_ready, args.timeout)
+        ready = time.perf_counter() - started
+        processes = [process.pid] + descendants(process.pid)
+        usage = [memory_kb(pid) for pid in processes]
+        usage = [item for item in usage if item["rss"]]
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "listen": listen,
+        "ready": ready,
+        "processes": len(usage),
+        "rss_mb": sum(item["rss"] for item in usage) / 1024,
+        "pss_mb": sum(item["pss"] for item in usage) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--port", type=int, default=8201)
+    parser.add_argument("--app", default="agent_server:app")
+    parser.add_argument("--timeout", type=float, default=180)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, **FAKE_ENV, "SESSION_STORE": "sqlite", "SESSION_DB_PATH": os.path.join(tmp, "sessions.sqlite3")}
+        for module in ("simple", args.app.partition(":")[0]):
+            print(f"import {module}: {import_seconds(module, env):.2f}s")
+
+        print(f"{'workers':>8} {'mode':>8} {'listen (s)':>11} {'ready (s)':>10} {'procs':>6} {'RSS (MB)':>9} {'PSS (MB)':>9}")
+        for workers in args.workers:
+            for preload in (False, True):
+                result = measure_server(args, workers, preload, env)
+                print(f"{workers:>8} {'preload' if preload else 'spawn':>8} {result['listen']:>11.2f} {result['ready']:>10.2f} "
+                      f"{result['processes']:>6} {result['rss_mb']:>9.1f} {result['pss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
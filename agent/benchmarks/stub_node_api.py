@@ -0,0 +1,172 @@
+"""
+Stand-in local para os endpoints `/api/actions/*` do backend Node.
+
+Responde com os mesmos formatos do `actions.controller.ts` (login,
+onboard-user, list-contacts, add-contact, build-payment-xdr,
+sign-and-submit-xdr, get-account-balance, get-operation-history), sem
+Supabase nem Horizon, com latência configurável para simular a rede.
+
+    python -m benchmarks.stub_node_api --port 3901 --latency-ms 20
+    NODE_API_BASE_URL=http://127.0.0.1:3901 uvicorn agent_server:app
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+
+LATENCY_MS = float(os.getenv("STUB_API_LATENCY_MS", "20"))
+# Variação aleatória (+/-) sobre a latência base, em fração
+LATENCY_JITTER = float(os.getenv("STUB_API_LATENCY_JITTER", "0.2"))
+
+# Contatos pré-cadastrados de todo usuário do stub
+DEFAULT_CONTACTS = [
+    {"contact_name": "Maria", "stellar_public_key": "GBZXN7PIRZGNMHGA7MUUUF4GWPY5AYPV6LY4UV2GL6VJGIQRXFDNMADI"},
+    {"contact_name": "Paulo", "stellar_public_key": "GCKFBEIYV2U22IO2BJ4KVJOIP7XPWQGQFKKWXR6DOSJBV7STMAQSMTGG"},
+    {"contact_name": "Ana", "stellar_public_key": "GDQP2KPQGKIHYJGXNUIYOMHARUARCA7DJT5FO2FFOOKY3B2WSQHG4W37"},
+]
+
+app = FastAPI(title="Stub Node API")
+_contacts = {}
+_history = {}
+_metrics = {"requests": 0}
+
+
+def user_id_for(email: str) -> str:
+    return hashlib.sha256(email.lower().encode("utf-8")).hexdigest()[:16]
+
+
+def public_key_for(user_id: str) -> str:
+    # Formato de chave Stellar (G + 55 base32); não é uma conta real
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+    digest = hashlib.sha256(user_id.encode("utf-8")).digest() * 2
+    return "G" + "".join(alphabet[b % 32] for b in digest[:55])
+
+
+def user_from_token(authorization: str):
+    token = (authorization or "").split(" ")[-1]
+    return token[len("stub-token-"):] if token.startswith("stub-token-") else None
+
+
+def unauthorized():
+    return JSONResponse(status_code=401, content={"success": False, "message": "Access token required"})
+
+
+@app.middleware("http")
+async def simulate_latency(request: Request, call_next):
+    _metrics["requests"] += 1
+    if LATENCY_MS > 0:
+        jitter = 1 + random.uniform(-LATENCY_JITTER, LATENCY_JITTER)
+        await asyncio.sleep(LATENCY_MS * jitter / 1000)
+    return await call_next(request)
+
+
+@app.post("/api/actions/login")
+async def login(body: dict):
+    user_id = user_id_for(body.get("email", ""))
+    return {"success": True, "sessionToken": f"stub-token-{user_id}", "userId": user_id, "publicKey": public_key_for(user_id)}
+
+
+@app.post("/api/actions/onboard-user")
+async def onboard_user(body: dict):
+    user_id = user_id_for(body.get("email", ""))
+    return JSONResponse(status_code=201, content={
+        "success": True,
+        "userId": user_id,
+        "publicKey": public_key_for(user_id),
+        "secretKey": "S" + public_key_for(user_id)[1:],
+        "message": "User onboarded successfully",
+    })
+
+
+@app.post("/api/actions/list-contacts")
+async def list_contacts(authorization: str = Header(None)):
+    user_id = user_from_token(authorization)
+    if not user_id:
+        return unauthorized()
+    contacts = _contacts.setdefault(user_id, [dict(c) for c in DEFAULT_CONTACTS])
+    return {"success": True, "contacts": contacts, "count": len(contacts)}
+
+
+@app.post("/api/actions/add-contact")
+async def add_contact(body: dict, authorization: str = Header(None)):
+    user_id = user_from_token(authorization)
+    if not user_id:
+        return unauthorized()
+    contact = {"contact_name": body.get("contact_name"), "stellar_public_key": body.get("public_key")}
+    _contacts.setdefault(user_id, [dict(c) for c in DEFAULT_CONTACTS]).append(contact)
+    return JSONResponse(status_code=201, content={"success": True, "contact": contact})
+
+
+@app.post("/api/actions/build-payment-xdr")
+async def build_payment_xdr(body: dict, authorization: str = Header(None)):
+    if not user_from_token(authorization):
+        return unauthorized()
+    return {
+        "success": True,
+        "xdr": f"AAAA-stub-{uuid.uuid4().hex}",
+        "message": "Transaction XDR built successfully. Sign and submit externally.",
+    }
+
+
+@app.post("/api/actions/sign-and-submit-xdr")
+async def sign_and_submit_xdr(body: dict, authorization: str = Header(None)):
+    user_id = user_from_token(authorization)
+    if not user_id:
+        return unauthorized()
+    operation = dict(body.get("operationData") or {})
+    operation.update({"id": uuid.uuid4().hex, "status": "SUCCESS",
+                      "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+    _history.setdefault(user_id, []).insert(0, operation)
+    return {"success": True, "hash": uuid.uuid4().hex + uuid.uuid4().hex, "message": "Transaction signed and submitted successfully"}
+
+
+@app.post("/api/actions/get-account-balance")
+async def get_account_balance(body: dict, authorization: str = Header(None)):
+    if not user_from_token(authorization):
+        return unauthorized()
+    return {"success": True, "balances": [
+        {"balance": "1000.0000000", "asset_type": "native"},
+        {"balance": "250.0000000", "asset_type": "credit_alphanum4", "asset_code": "USDC",
+         "asset_issuer": "GA5ZSEJYB37JRC5AVCIA5MOP4RHTM335X2KGX3IHOJAPP5RE34K4KZVN"},
+    ]}
+
+
+@app.post("/api/actions/get-operation-history")
+async def get_operation_history(body: dict = None, authorization: str = Header(None)):
+    user_id = user_from_token(authorization)
+    if not user_id:
+        return unauthorized()
+    since = (body or {}).get("since")
+    history = _history.get(user_id, [])
+    if since:
+        history = [operation for operation in history if operation["created_at"] >= since]
+    return {"success": True, "history": history}
+
+
+@app.get("/stats")
+async def stats():
+    return {**_metrics, "users": len(_contacts)}
+
+
+def main():
+    global LATENCY_MS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3901)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    args = parser.parse_args()
+    LATENCY_MS = args.latency_ms
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Respostas 503 em que a mensagem foi recusada antes de qualquer efeito (agente
+# carregando, fila cheia antes do mapper) levam este header: só essas podem ser
+# reenviadas pelo cliente sem repetir pagamento, contato novo ou login
+REJECTED_HEADER = "X-Agent-Rejected"
+
+
+class ServerBusy(Exception):
+    """
+    Raised when the executor queue is full; the API answers 503 instead of piling up work.
+
+    `processed` marca recusas que chegaram depois de efeitos da mensagem (ex.:
+    o final_agent depois do pagamento): a resposta sai sem REJECTED_HEADER.
+    """
+
+    def __init__(self, message: str = "Agent executor queue is full", processed: bool = False):
+        super().__init__(message)
+        self.processed = processed
+
+
+def unavailable_headers(retry_after: int, processed: bool = False) -> dict:
+    """Headers of a 503: Retry-After, plus REJECTED_HEADER when nothing of the request was done."""
+    headers = {"Retry-After": str(retry_after)}
+    if not processed:
+        headers[REJECTED_HEADER] = "before-processing"
+    return headers
+
+
+class BoundedExecutor:
+    """
+    Executor com limite de threads e de fila para trabalho bloqueante
+    (ex.: crew.kickoff). Quando há mais de `max_pending` tarefas aguardando
+    ou executando, novas submissões falham rápido com ServerBusy.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        self.max_workers = max_workers or int(os.getenv("AGENT_MAX_WORKERS", "8"))
+        self.max_pending = max_pending or int(os.getenv("AGENT_MAX_PENDING", "200"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew")
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ServerBusy("Agent executor queue is full")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Copia o contexto para a thread: o trace da requisição segue junto
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,101 @@
+import difflib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from intent_router import normalize_text
+
+
+class ContactIndex:
+    """
+    Índice de nomes de contatos de um usuário.
+
+    `resolve` só aceita o nome exato (sem acento/caixa): é ele que vira a chave
+    de destino de um pagamento. `suggest` acha o contato provável para um nome
+    aproximado (prefixo único, "paul" -> "Paulo Silva", ou similaridade com
+    difflib), que quem chama deve confirmar com o usuário. Tudo em memória.
+    """
+
+    # Tamanho mínimo do nome digitado e do candidato para sugerir por prefixo
+    MIN_PREFIX_LENGTH = 3
+
+    def __init__(self, contacts: list, cutoff: float = 0.8):
+        self.contacts = list(contacts or [])
+        self.cutoff = cutoff
+        self._by_name = {}
+        for contact in self.contacts:
+            name = normalize_text(contact.get("contact_name", ""))
+            if name:
+                self._by_name.setdefault(name, contact)
+
+    def resolve(self, name: str):
+        """Return the contact dict whose name matches exactly, or None."""
+        key = normalize_text(name)
+        return self._by_name.get(key) if key else None
+
+    def suggest(self, name: str):
+        """Likely contact for a name with no exact match (to be confirmed by the user), or None."""
+        key = normalize_text(name)
+        if len(key) < self.MIN_PREFIX_LENGTH or key in self._by_name:
+            return None
+
+        prefixed = [candidate for candidate in self._by_name
+                    if len(candidate) >= self.MIN_PREFIX_LENGTH and candidate.startswith(key)]
+        if len(prefixed) == 1:
+            return self._by_name[prefixed[0]]
+
+        close = difflib.get_close_matches(key, self._by_name.keys(), n=2, cutoff=self.cutoff)
+        if len(close) == 1:
+            return self._by_name[close[0]]
+        return None
+
+    def __len__(self):
+        return len(self.contacts)
+
+
+class ContactsCache:
+    """
+    Per-user (userId) contacts cache with TTL and LRU bound, private to the process.
+
+    Com vários workers, `invalidate` só vale para este processo: quem chama
+    passa em `get` o `contacts_changed_at` compartilhado (estado da conta no
+    SESSION_STORAGE) e listas buscadas antes dele contam como miss.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_users: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("CONTACTS_CACHE_TTL_SECONDS", "300"))
+        self.max_users = max_users or int(os.getenv("CONTACTS_CACHE_MAX_USERS", "10000"))
+        self._entries = OrderedDict()
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, changed_at: float = 0):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.time() or entry[2] < changed_at:
+                self._entries.pop(user_id, None)
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._metrics["hits"] += 1
+            return entry[1]
+
+    def put(self, user_id: str, contacts: list, fetched_at: float = None) -> ContactIndex:
+        # fetched_at: quando a busca começou; um contato adicionado durante ela não está na lista
+        index = ContactIndex(contacts)
+        with self._lock:
+            self._entries[user_id] = (time.time() + self.ttl_seconds, index, fetched_at or time.time())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._metrics["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "users": len(self._entries)}
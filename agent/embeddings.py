@@ -0,0 +1,109 @@
+"""
+Embeddings locais para a busca vetorial em issuers.json, que só existe no
+mapper CrewAI (MAPPER_MODE=crew com MAPPER_ISSUERS_SEARCH_TOOL=true); no padrão
+(MAPPER_MODE=tiered) este módulo não carrega modelo nenhum.
+
+Com EMBEDDING_BACKEND=local (padrão), um modelo pequeno do sentence-transformers
+roda na CPU: é carregado uma vez por processo, codifica em lotes e não depende
+de rede (com LOCAL_EMBEDDING_MODEL apontando para uma pasta local, funciona sem
+internet). Os vetores ficam no Chroma em `agent/db`. Sem sentence-transformers
+ou chromadb instalados, quem chama volta para o JSONSearchTool e o provedor
+remoto padrão.
+"""
+import importlib.util
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local").lower()
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+# Vetores de consultas recentes (as perguntas se repetem muito)
+QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+
+
+def local_embeddings_available() -> bool:
+    return all(importlib.util.find_spec(name) is not None for name in ("sentence_transformers", "chromadb"))
+
+
+def use_local_embeddings() -> bool:
+    """True when EMBEDDING_BACKEND=local and its optional dependencies are installed."""
+    if EMBEDDING_BACKEND != "local":
+        return False
+    if not local_embeddings_available():
+        logging.warning("EMBEDDING_BACKEND=local sem sentence-transformers/chromadb instalados; usando o provedor remoto")
+        return False
+    return True
+
+
+class LocalEmbedder:
+    """sentence-transformers model on CPU, loaded on first use and shared by every index."""
+
+    def __init__(self, model_name: str = None, batch_size: int = None, device: str = None):
+        self.model_name = model_name or LOCAL_EMBEDDING_MODEL
+        self.batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        self.device = device or EMBEDDING_DEVICE
+        self._model = None
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+                logging.info(f"Modelo de embeddings local carregado: {self.model_name} ({self.device})")
+            return self._model
+
+    def embed(self, texts: list) -> list:
+        """Normalized vectors for `texts`, encoded in batches of `batch_size`."""
+        if not texts:
+            return []
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list:
+        with self._lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                return vector
+        vector = self.embed([text])[0]
+        with self._lock:
+            self._queries[text] = vector
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+
+class ChromaEmbeddingFunction:
+    """Adapter exposing a LocalEmbedder through chromadb's EmbeddingFunction interface."""
+
+    def __init__(self, embedder: LocalEmbedder):
+        self.embedder = embedder
+
+    def __call__(self, input: list) -> list:
+        if len(input) == 1:
+            return [self.embedder.embed_query(input[0])]
+        return self.embedder.embed(input)
+
+    def name(self) -> str:
+        return "local-sentence-transformers"
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_local_embedder() -> LocalEmbedder:
+    """Process-wide embedder: the model is loaded once no matter how many indexes use it."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = LocalEmbedder()
+        return _embedder
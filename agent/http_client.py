@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+import httpx
+
+from tracing import HTTPX_EVENT_HOOKS
+
+
+# Um cliente por event loop: o servidor usa sempre o mesmo loop (e o mesmo pool
+# de conexões); chamadas síncronas via `run_sync` ganham um cliente próprio,
+# fechado junto com o loop.
+_CLIENTS = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    )
+    timeout = httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", "30")))
+    return httpx.AsyncClient(limits=limits, timeout=timeout, event_hooks=HTTPX_EVENT_HOOKS)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared, pooled AsyncClient for the Node API, bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        # Loops já fechados (asyncio.run de fora do run_sync) não usam mais os seus clientes
+        for dead_loop in [dead_loop for dead_loop in _CLIENTS if dead_loop.is_closed()]:
+            _CLIENTS.pop(dead_loop, None)
+        client = _CLIENTS[loop] = _build_client()
+    return client
+
+
+async def aclose_async_client():
+    """Close the client of the running loop (FastAPI shutdown hook)."""
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_sync(coroutine):
+    """
+    Run a coroutine from sync code (scripts, CrewAI tool threads) in a fresh
+    event loop, closing that loop's client before the loop goes away.
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(main())
@@ -0,0 +1,277 @@
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+
+from amounts import AMOUNT_PATTERN, parse_amount
+
+
+# Regex de email compartilhada com o fluxo de login
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# Destinatário: um token inteiro ("bob@gmail.com", chave G...); pontuação só no fim do token
+DESTINATION_PATTERN = r"(?P<name>[^\s,;:!?\"']+?)(?=[,.;:!?\"']*(?:\s|$))"
+
+# "send 100 USDC to Paulo", "manda 50 xlm pro Bob", "pagar 10,5 BRLC para Maria"
+# Só verbos no imperativo/infinitivo: "mandei", "pagou" etc. não são pedidos de pagamento
+PAYMENT_PATTERN = re.compile(
+    r"\b(?:send|pay|transfer|envi(?:a|e|ar)|mand(?:a|e|ar)|pag(?:a|ue|ar)|transf(?:ira|ere|erir))\s+"
+    rf"(?P<amount>{AMOUNT_PATTERN})\s*(?P<asset>[A-Za-z]{{2,12}})\s+"
+    r"(?:to|para|pro|pra|ao|a)\s+(?:o\s+|a\s+)?" + DESTINATION_PATTERN,
+    re.IGNORECASE,
+)
+# Um item de pagamento em lote: "50 USDC pro Paulo", "30 pro Bob" (ativo herdado do item anterior)
+BATCH_ITEM_PATTERN = re.compile(
+    rf"(?P<amount>{AMOUNT_PATTERN})\s*"
+    r"(?:(?!(?:to|para|pro|pra|ao|a)\b)(?P<asset>[A-Za-z]{2,12})\s+)?"
+    r"(?:to|para|pro|pra|ao|a)\s+(?:o\s+|a\s+)?" + DESTINATION_PATTERN,
+    re.IGNORECASE,
+)
+# Negação, pergunta ou passado: "nao quero mandar...", "mandei ... ontem?", "quanto mandei..."
+# não são ordens de pagamento; o fast path desiste e o LLM decide
+NOT_A_PAYMENT_ORDER = (
+    r"\?|\b(?:nao|nem|nunca|not|never|dont|don't|cancel\w*|desist\w*)\b"
+    r"|\b(?:quanto|quando|qual|quais|como|porque|por que|sera|did|how|what|when|why|should)\b"
+    r"|\b(?:mandei|mandou|enviei|enviou|paguei|pagou|transferi|transferiu|sent|paid|transferred|ontem|yesterday)\b"
+)
+MEMO_PATTERN = re.compile(
+    r"\b(?:memo|note|nota|mensagem|descri\w*)\b[^\"']*[\"'](?P<memo>[^\"']+)[\"']",
+    re.IGNORECASE,
+)
+# O que pode vir depois do destinatário: pontuação, um memo entre aspas e um
+# "valeu"/"por favor". Qualquer outra coisa ("pro bob do trabalho", "pra Maria
+# Silva", "to bob and alice", "pro bob, ana e carlos") pode ser outro
+# destinatário ou parte do nome: o fast path desiste e o LLM decide
+TRAILING_CLAUSE_PATTERN = re.compile(
+    r"[\s,.;:!]*"
+    r"(?:(?:(?:com|with)\s+(?:(?:a|o|um|uma|the)\s+)?)?(?:memo|note|nota|mensagem|descri\w*)\b[\s:=-]*"
+    r"[\"'][^\"']+[\"'][\s,.;:!]*)?"
+    r"(?:(?:por\s+favor|pfv?|please|pls|thanks|thank\s+you|valeu|vlw|obrigad[oa])[\s.!]*)?$",
+    re.IGNORECASE,
+)
+# Entre dois itens de um lote só cabe "e"/"and"/vírgula
+BATCH_SEPARATOR_PATTERN = re.compile(r"[\s,;]*(?:(?:e|and)\s+)?$", re.IGNORECASE)
+
+# Modelo de palavras-chave: (padrão sobre o texto normalizado, peso)
+INTENT_KEYWORDS = {
+    "login": [
+        (r"\blog(?:ar|ue|in)?\b|\blog\s+in\b|\bsign\s+in\b", 0.6),
+        (r"\bentrar\b|\bacessar\b", 0.4),
+        (r"@", 0.4),
+    ],
+    "onboard_user": [
+        (r"\bcri(?:ar|e|a)\b|\bcreate\b|\bcadastr\w*|\bregistr\w*|\bsign\s+up\b|\babrir\b", 0.5),
+        (r"\bconta\b|\baccount\b", 0.1),
+        (r"@", 0.4),
+    ],
+    "list_contacts": [
+        (r"\bcontat\w*|\bcontacts?\b", 0.6),
+        (r"\blist\w*|\bmostr\w*|\bver\b|\bshow\b|\bquais\b|\bmeus\b|\bmy\b|\btodos\b", 0.4),
+    ],
+    "get_account_balance": [
+        (r"\bsaldos?\b|\bbalances?\b", 0.8),
+        (r"\bqual\b|\bquanto\b|\bwhat\b|\bmeu\b|\bmy\b|\bver\b|\bcheck\b|\bconsult\w*", 0.2),
+    ],
+    "execute_payment": [
+        (r"\bsend\b|\bpay\b|\btransfer\b|\benvi\w*|\bmand\w*|\bpag\w*|\btransf\w*", 0.5),
+        (r"\d+(?:[.,]\d+)?\s*[a-z]{2,12}\s+(?:to|para|pro|pra|ao|a)\s+\w+", 0.5),
+    ],
+    "execute_batch_payment": [
+        (r"\bsend\b|\bpay\b|\btransfer\b|\benvi\w*|\bmand\w*|\bpag\w*|\btransf\w*|\bdivid\w*|\bsplit\b", 0.5),
+        (r"\d+(?:[.,]\d+)?\s*(?:[a-z]{2,12}\s+)?(?:to|para|pro|pra|ao|a)\s+\w+.*?(?:\be\b|\band\b|,)\s*\d", 0.5),
+    ],
+}
+
+# Termos que descartam a intenção mesmo com pontuação alta
+INTENT_BLOCKERS = {
+    "list_contacts": r"\badd\b|\badicion\w*|\bsalv\w*|\bremov\w*|\bdelet\w*|\bexclu\w*|\bnovo\b|\bnew\b",
+    "get_account_balance": r"\bhistor\w*|\bhistory\b|\bextrato\b",
+    # Vários valores na mesma frase: é lote, não pagamento simples
+    "execute_payment": r"\d+(?:[.,]\d+)?\s*(?:[a-z]{2,12}\s+)?(?:to|para|pro|pra|ao|a)\s+\w+.*?(?:\be\b|\band\b|,)\s*\d|"
+                       + NOT_A_PAYMENT_ORDER,
+    "execute_batch_payment": NOT_A_PAYMENT_ORDER,
+}
+
+# Palavras que indicam algo além do caminho simples (ex.: vários destinatários)
+AMBIGUOUS_PATTERN = re.compile(r"\b(?:e|and|depois|then|tambem|also)\b\s+\d")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents so keyword rules match PT and EN variants."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class RouteResult:
+    task: str
+    params: dict
+    confidence: float
+    message: str = ""
+
+    def as_task_data(self) -> dict:
+        """Same shape the crew mapper writes to its output file."""
+        return {"message": self.message, "task": self.task, "params": self.params}
+
+
+@dataclass
+class RouterStats:
+    hits: int = 0
+    misses: int = 0
+    hits_by_task: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "hits_by_task": dict(self.hits_by_task),
+        }
+
+
+class IntentRouter:
+    """
+    Fast path local que resolve intenções de alta confiança sem chamar o LLM.
+
+    Combina um modelo de palavras-chave ponderadas (para escolher a intenção)
+    com regras de extração (para montar os params). Se a confiança ficar abaixo
+    do limite, se houver empate entre intenções ou se algum parâmetro não puder
+    ser resolvido, `route` retorna None e o chamador cai no crew.
+    """
+
+    def __init__(self, asset_resolver=None, threshold: float = None, margin: float = 0.3):
+        self.asset_resolver = asset_resolver
+        self.threshold = threshold if threshold is not None else float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.8"))
+        self.margin = margin
+        self.enabled = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() not in ("0", "false", "no")
+        self._keywords = {
+            task: [(re.compile(pattern), weight) for pattern, weight in rules]
+            for task, rules in INTENT_KEYWORDS.items()
+        }
+        self._blockers = {task: re.compile(pattern) for task, pattern in INTENT_BLOCKERS.items()}
+        self._stats = RouterStats()
+        self._lock = threading.Lock()
+
+    def score(self, text: str) -> dict:
+        """Keyword score per intent, capped at 1.0."""
+        normalized = normalize_text(text)
+        scores = {}
+        for task, rules in self._keywords.items():
+            if task in self._blockers and self._blockers[task].search(normalized):
+                continue
+            total = sum(weight for pattern, weight in rules if pattern.search(normalized))
+            if total:
+                scores[task] = min(total, 1.0)
+        return scores
+
+    def route(self, query: str):
+        """Return a RouteResult for high-confidence intents, or None to fall back to the crew."""
+        result = self._route(query) if self.enabled else None
+        with self._lock:
+            if result is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+                self._stats.hits_by_task[result.task] = self._stats.hits_by_task.get(result.task, 0) + 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return self._stats.as_dict()
+
+    def _route(self, query: str):
+        scores = self.score(query)
+        if not scores:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        task, confidence = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if confidence < self.threshold or confidence - runner_up < self.margin:
+            return None
+
+        extractor = getattr(self, f"_extract_{task}")
+        extracted = extractor(query)
+        if extracted is None:
+            return None
+
+        message, params = extracted
+        return RouteResult(task=task, params=params, confidence=confidence, message=message)
+
+    # --- Extratores de parâmetros ---
+
+    def _extract_login(self, query: str):
+        emails = EMAIL_PATTERN.findall(query)
+        if len(emails) != 1:
+            return None
+        return "Fazendo login na conta", {"email": emails[0]}
+
+    def _extract_onboard_user(self, query: str):
+        emails = EMAIL_PATTERN.findall(query)
+        if len(emails) != 1:
+            return None
+        return "Criando sua conta", {"email": emails[0]}
+
+    def _extract_list_contacts(self, query: str):
+        return "Listando seus contatos", {}
+
+    def _extract_get_account_balance(self, query: str):
+        return "Consultando o saldo da sua conta", {}
+
+    def _extract_execute_payment(self, query: str):
+        matches = list(PAYMENT_PATTERN.finditer(query))
+        if len(matches) != 1 or AMBIGUOUS_PATTERN.search(normalize_text(query)):
+            return None
+        match = matches[0]
+        if not TRAILING_CLAUSE_PATTERN.match(query, match.end()):
+            return None
+
+        # O nome segue nos params e é resolvido depois pelo chamador (contatos)
+        destination = match.group("name")
+        asset_code = self.asset_resolver(match.group("asset")) if self.asset_resolver else match.group("asset").upper()
+        amount = self._amount(match.group("amount"))
+        if not asset_code or amount is None:
+            return None
+
+        memo_match = MEMO_PATTERN.search(query)
+        params = {
+            "destination": destination,
+            "amount": amount,
+            "asset": asset_code,
+            "memo": memo_match.group("memo") if memo_match else "",
+        }
+        return f"Pagamento de {params['amount']} {asset_code} para {destination}", params
+
+    def _extract_execute_batch_payment(self, query: str):
+        payments = []
+        asset_text = None
+        previous_end = None
+        for match in BATCH_ITEM_PATTERN.finditer(query):
+            if previous_end is not None and not BATCH_SEPARATOR_PATTERN.match(query[previous_end:match.start()]):
+                return None
+            previous_end = match.end()
+            asset_text = match.group("asset") or asset_text
+            if not asset_text:
+                return None
+            asset_code = self.asset_resolver(asset_text) if self.asset_resolver else asset_text.upper()
+            amount = self._amount(match.group("amount"))
+            if not asset_code or amount is None:
+                return None
+            payments.append({"destination": match.group("name"), "amount": amount, "asset": asset_code})
+        if len(payments) < 2 or not TRAILING_CLAUSE_PATTERN.match(query, previous_end):
+            return None
+
+        memo_match = MEMO_PATTERN.search(query)
+        params = {"payments": payments, "memo": memo_match.group("memo") if memo_match else ""}
+        return f"Pagamento em lote para {len(payments)} destinatários", params
+
+    @staticmethod
+    def _amount(text: str):
+        # "1,000" / "1.000" podem ser mil ou um: o fast path não adivinha
+        try:
+            return parse_amount(text)
+        except ValueError:
+            return None
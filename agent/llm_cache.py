@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from intent_router import normalize_text
+
+
+# TTL (segundos) por tarefa; 0 = nunca cachear
+TASK_TTLS = {
+    "get_account_balance": 30,
+    "get_operations_history": 30,
+    "execute_payment": 600,
+    "execute_batch_payment": 600,
+    "clarification_needed": 0,
+}
+# Respostas do final_agent: saldos expiram rápido; resultado de pagamento é único
+FINAL_TASK_TTLS = {
+    "get_account_balance": 30,
+    "get_operations_history": 30,
+    "execute_payment": 0,
+    "execute_batch_payment": 0,
+    "onboard_user": 0,
+}
+
+# Seed de conta Stellar (S + 55 caracteres base32): nada com isso entra no cache
+SECRET_KEY_PATTERN = re.compile(r"\bS[A-Z2-7]{55}\b")
+
+
+def cache_key_text(text: str) -> str:
+    """Normalized query text: accents, case, punctuation and extra spaces removed."""
+    return " ".join(re.sub(r"[^\w@.]+", " ", normalize_text(text)).split())
+
+
+class LLMCache:
+    """
+    Cache das duas etapas de LLM (mapper e final_agent).
+
+    Camada exata: texto normalizado -> resultado, com LRU e TTL por tarefa.
+    Camada semântica (opcional, LLM_CACHE_SEMANTIC=true): busca por
+    similaridade numa coleção do Chroma em `agent/db`. Ela só guarda
+    resultados sem params (ex.: list_contacts), já que duas frases parecidas
+    podem ter emails, valores ou nomes diferentes.
+    """
+
+    def __init__(self, max_entries: int = None, default_ttl: float = None, semantic: bool = None,
+                 similarity_threshold: float = None, db_path: str = None):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.default_ttl = default_ttl if default_ttl is not None else float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.semantic = semantic if semantic is not None else os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+        self.similarity_threshold = similarity_threshold or float(os.getenv("LLM_CACHE_MAX_DISTANCE", "0.15"))
+        self.db_path = db_path or os.getenv("LLM_CACHE_DB_PATH", "db")
+        self._entries = OrderedDict()
+        self._collection = None
+        self._metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    # --- API pública ---
+
+    def get(self, stage: str, text: str):
+        """Cached value for (stage, text), or None."""
+        if not self.enabled or SECRET_KEY_PATTERN.search(text):
+            return None
+        key = self._key(stage, text)
+        value = self._get_exact(key)
+        if value is not None:
+            self._count("exact_hits")
+            return value
+        if self.semantic and stage == "mapper":
+            value = self._get_semantic(stage, text)
+            if value is not None:
+                self._count("semantic_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, stage: str, text: str, value: dict, task: str = None):
+        if not self.enabled or SECRET_KEY_PATTERN.search(text) or SECRET_KEY_PATTERN.search(json.dumps(value)):
+            return
+        ttl = self._ttl(stage, task)
+        if ttl <= 0:
+            return
+        key = self._key(stage, text)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, json.dumps(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+            self._metrics["stores"] += 1
+        if self.semantic and stage == "mapper" and not value.get("params"):
+            self._put_semantic(stage, text, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["size"] = len(self._entries)
+        lookups = metrics["exact_hits"] + metrics["semantic_hits"] + metrics["misses"]
+        metrics["hit_rate"] = ((metrics["exact_hits"] + metrics["semantic_hits"]) / lookups) if lookups else 0.0
+        return metrics
+
+    # --- Camada exata ---
+
+    def _key(self, stage: str, text: str) -> str:
+        # Só a query do usuário é normalizada; o contexto do final_agent é JSON e vale byte a byte
+        normalized = cache_key_text(text) if stage == "mapper" else text
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{stage}:{digest}"
+
+    def _ttl(self, stage: str, task: str) -> float:
+        ttls = FINAL_TASK_TTLS if stage == "final" else TASK_TTLS
+        return ttls.get(task, self.default_ttl)
+
+    def _get_exact(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Cópia nova a cada hit: quem chama pode alterar o dict à vontade
+        return json.loads(payload)
+
+    def _count(self, metric: str):
+        with self._lock:
+            self._metrics[metric] += 1
+
+    # --- Camada semântica (Chroma local) ---
+
+    def _get_collection(self):
+        if self._collection is None:
+            try:
+                import chromadb
+                client = chromadb.PersistentClient(path=self.db_path)
+                self._collection = client.get_or_create_collection(
+                    "llm_response_cache", metadata={"hnsw:space": "cosine"}
+                )
+            except Exception as e:
+                logging.warning(f"Cache semântico desativado: {e}")
+                self.semantic = False
+        return self._collection
+
+    def _get_semantic(self, stage: str, text: str):
+        collection = self._get_collection()
+        if collection is None:
+            return None
+        try:
+            result = collection.query(query_texts=[cache_key_text(text)], n_results=1, where={"stage": stage})
+        except Exception as e:
+            logging.warning(f"Falha na consulta do cache semântico: {e}")
+            return None
+        if not result["ids"] or not result["ids"][0]:
+            return None
+        if result["distances"][0][0] > self.similarity_threshold:
+            return None
+        return self._get_exact(result["metadatas"][0][0]["key"])
+
+    def _put_semantic(self, stage: str, text: str, key: str):
+        collection = self._get_collection()
+        if collection is None:
+            return
+        try:
+            collection.upsert(ids=[key], documents=[cache_key_text(text)], metadatas=[{"stage": stage, "key": key}])
+        except Exception as e:
+            logging.warning(f"Falha ao gravar no cache semântico: {e}")
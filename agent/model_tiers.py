@@ -0,0 +1,206 @@
+"""
+Task mapper em camadas de modelos (MAPPER_MODE=tiered).
+
+Mapear a mensagem para uma tarefa não precisa de um agente ReAct: é uma
+chamada só, com saída estruturada nativa (response_format json_schema estrito,
+gerado de `task_schemas.task_json_schema`). A primeira camada é um modelo
+rápido e barato; a resposta é validada com os modelos do `task_schemas` e só
+sobe para a próxima camada (o modelo grande) quando a validação falha, faltam
+parâmetros obrigatórios ou a chamada dá erro. Cada camada registra latência,
+tokens e custo estimado, nas métricas do Prometheus e em /mapper/stats.
+
+    MAPPER_TIERS=fast,strong
+    MAPPER_FAST_MODEL=gpt-4o-mini   MAPPER_FAST_PRICE=0.15/0.60   # USD por 1M tokens (entrada/saída)
+    MAPPER_STRONG_MODEL=gpt-4o      MAPPER_STRONG_PRICE=2.50/10.00
+"""
+import importlib
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+from pydantic import ValidationError
+
+from task_schemas import TaskParseError, clarification, missing_params, task_json_schema, validate_task
+from tracing import LLM_COST, MAPPER_TIER_SECONDS, record_tokens, span
+
+
+# Modelo e preço padrão (USD por 1M tokens de entrada/saída) das camadas conhecidas
+DEFAULT_TIERS = {
+    "fast": ("gpt-4o-mini", "0.15/0.60"),
+    "strong": ("gpt-4o", "2.50/10.00"),
+}
+MAPPER_MAX_TOKENS = int(os.getenv("MAPPER_MAX_TOKENS", "300"))
+MAPPER_TIMEOUT_SECONDS = float(os.getenv("MAPPER_TIMEOUT_SECONDS", "20"))
+# Parâmetro obrigatório vazio (ex.: pagamento sem valor) também sobe de camada
+MAPPER_ESCALATE_ON_MISSING = os.getenv("MAPPER_ESCALATE_ON_MISSING", "true").lower() == "true"
+# Latências guardadas por camada para a mediana de /mapper/stats
+LATENCY_WINDOW = 1000
+
+
+def mapper_mode() -> str:
+    """
+    "tiered" or "crew". With AGENT_LLM_FACTORY (fake LLM in benchmarks) and no
+    MAPPER_CLIENT_FACTORY, the default stays "crew" so nothing calls OpenAI.
+    """
+    default = "crew" if os.getenv("AGENT_LLM_FACTORY") and not os.getenv("MAPPER_CLIENT_FACTORY") else "tiered"
+    return os.getenv("MAPPER_MODE", default).lower()
+
+
+def parse_price(text: str) -> tuple:
+    input_price, _, output_price = text.partition("/")
+    return float(input_price), float(output_price or input_price)
+
+
+class ModelTier:
+    def __init__(self, name: str, model: str, input_price: float = 0.0, output_price: float = 0.0):
+        self.name = name
+        self.model = model
+        self.input_price = input_price
+        self.output_price = output_price
+
+    def cost(self, usage: dict) -> float:
+        """Estimated USD cost of one call from its token usage."""
+        return (usage.get("prompt_tokens", 0) * self.input_price
+                + usage.get("completion_tokens", 0) * self.output_price) / 1_000_000
+
+
+def load_tiers() -> list:
+    """Tiers from MAPPER_TIERS, in escalation order."""
+    tiers = []
+    for name in [name.strip() for name in os.getenv("MAPPER_TIERS", "fast,strong").split(",") if name.strip()]:
+        default_model, default_price = DEFAULT_TIERS.get(name, (None, "0/0"))
+        model = os.getenv(f"MAPPER_{name.upper()}_MODEL", default_model)
+        if not model:
+            raise ValueError(f"MAPPER_{name.upper()}_MODEL não definido para a camada '{name}'")
+        price = parse_price(os.getenv(f"MAPPER_{name.upper()}_PRICE", default_price))
+        tiers.append(ModelTier(name, model, *price))
+    if not tiers:
+        raise ValueError("MAPPER_TIERS não tem nenhuma camada")
+    return tiers
+
+
+class OpenAIStructuredClient:
+    """Chat Completions with a strict json_schema response format."""
+
+    def __init__(self):
+        from openai import OpenAI
+        # Sem retries do SDK: uma falha sobe de camada em vez de esperar
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=MAPPER_TIMEOUT_SECONDS, max_retries=0)
+
+    def complete(self, model: str, system: str, user: str, schema: dict) -> tuple:
+        """(JSON text, usage dict) for one structured completion."""
+        response = self.client.chat.completions.create(
+            model=model,
+            temperature=0,
+            max_tokens=MAPPER_MAX_TOKENS,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "task_response", "strict": True, "schema": schema},
+            },
+        )
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            raise TaskParseError(f"model refused: {message.refusal}")
+        usage = response.usage.model_dump() if response.usage else {}
+        return message.content or "", usage
+
+
+def build_structured_client():
+    # MAPPER_CLIENT_FACTORY="modulo:funcao" troca o cliente (ex.: benchmarks.fake_llm:build_fake_structured_client)
+    factory_path = os.getenv("MAPPER_CLIENT_FACTORY")
+    if factory_path:
+        module_name, _, function_name = factory_path.partition(":")
+        return getattr(importlib.import_module(module_name), function_name)()
+    return OpenAIStructuredClient()
+
+
+class TieredMapper:
+    """Maps a query to task JSON, escalating through the tiers until one answer validates."""
+
+    def __init__(self, tiers: list = None, client=None):
+        self.tiers = tiers or load_tiers()
+        self.client = client or build_structured_client()
+        self.schema = task_json_schema()
+        self._stats = {
+            tier.name: {"model": tier.model, "calls": 0, "ok": 0, "incomplete": 0, "invalid": 0, "error": 0,
+                        "escalated": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+            for tier in self.tiers
+        }
+        self._latencies = {tier.name: deque(maxlen=LATENCY_WINDOW) for tier in self.tiers}
+        self._messages = 0
+        self._lock = threading.Lock()
+
+    def map(self, system: str, query: str) -> dict:
+        """Task dict for `query`; clarification_needed (with parse_error) if no tier produced valid JSON."""
+        with self._lock:
+            self._messages += 1
+        fallback = None
+        reason = "no mapper tier answered"
+        for index, tier in enumerate(self.tiers):
+            outcome, task, reason = self._call(tier, system, query)
+            if outcome == "ok" or (outcome == "incomplete" and not MAPPER_ESCALATE_ON_MISSING):
+                return task
+            if task is not None:
+                # Válida, mas incompleta: serve se nenhuma camada acima fizer melhor
+                fallback = task
+            if index + 1 < len(self.tiers):
+                with self._lock:
+                    self._stats[tier.name]["escalated"] += 1
+        return fallback if fallback is not None else clarification(reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for name, counters in self._stats.items():
+                latencies = list(self._latencies[name])
+                tiers[name] = {
+                    **counters,
+                    "cost_usd": round(counters["cost_usd"], 6),
+                    "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                    "avg_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+                }
+            cost = sum(counters["cost_usd"] for counters in self._stats.values())
+            return {
+                "messages": self._messages,
+                "cost_usd": round(cost, 6),
+                "cost_per_message_usd": round(cost / self._messages, 6) if self._messages else None,
+                "tiers": tiers,
+            }
+
+    def _call(self, tier: ModelTier, system: str, query: str) -> tuple:
+        started = time.perf_counter()
+        task, reason, usage = None, "", {}
+        with span(f"mapper.{tier.name}", model=tier.model) as attrs:
+            try:
+                content, usage = self.client.complete(tier.model, system, query, self.schema)
+                task = validate_task(json.loads(content))
+                missing = missing_params(task)
+                outcome = "incomplete" if missing else "ok"
+                reason = f"missing params: {', '.join(missing)}" if missing else ""
+            except (ValueError, ValidationError) as e:
+                outcome, reason = "invalid", str(e).splitlines()[0]
+            except Exception as e:
+                outcome, reason = "error", f"{type(e).__name__}: {e}"
+                logging.warning(f"Camada '{tier.name}' do mapper falhou: {reason}")
+            attrs["outcome"] = outcome
+            cost = tier.cost(usage)
+            if usage:
+                record_tokens(f"mapper.{tier.name}", usage, attrs)
+                attrs["cost_usd"] = round(cost, 6)
+        elapsed = time.perf_counter() - started
+        MAPPER_TIER_SECONDS.observe(elapsed, tier=tier.name, outcome=outcome)
+        LLM_COST.inc(cost, stage="mapper", tier=tier.name)
+        with self._lock:
+            counters = self._stats[tier.name]
+            counters["calls"] += 1
+            counters[outcome] += 1
+            counters["prompt_tokens"] += usage.get("prompt_tokens", 0) or 0
+            counters["completion_tokens"] += usage.get("completion_tokens", 0) or 0
+            counters["cost_usd"] += cost
+            self._latencies[tier.name].append(elapsed)
+        return outcome, task, reason
@@ -0,0 +1,178 @@
+"""
+Envio de pagamentos, sem dependência do CrewAI nem do httpx: o cliente HTTP,
+o store de sessões e a montagem do XDR chegam como parâmetros, então o fluxo
+inteiro roda nos testes com fakes.
+"""
+import logging
+import re
+import time
+
+from responses import describe_batch, describe_payment
+
+
+# Chave pública Stellar (G + 55 caracteres base32)
+STELLAR_PUBLIC_KEY_PATTERN = re.compile(r"^G[A-Z2-7]{55}$")
+
+
+# Código do Horizon para número de sequência vencido: a transação foi recusada
+# antes de ser aplicada, então montar de novo e reenviar não paga duas vezes
+STALE_SEQUENCE_CODE = "tx_bad_seq"
+
+
+async def idempotent_payment(store, session_token: str, idempotency_key: str, execute, max_results: int = 20) -> dict:
+    """
+    Run `execute()` at most once per idempotency key: the result is stored in
+    the session and returned as-is to any later call with the same key.
+    """
+    found = await store.afind_by_token(session_token)
+    if found:
+        stored = (found[1].get("payment_results") or {}).get(idempotency_key)
+        if stored is not None:
+            return stored
+    result = await execute()
+    if found:
+        session_id = found[0]
+        results = dict((await store.aget(session_id) or {}).get("payment_results") or {})
+        results[idempotency_key] = result
+        # dict mantém a ordem de inserção: descarta os mais antigos
+        await store.aupdate(session_id, payment_results=dict(list(results.items())[-max_results:]))
+    return result
+
+
+def secret_key_prompt(task_data: dict) -> dict:
+    """The one confirmation asked before a payment or a whole batch: summary plus the secret key request."""
+    if task_data["task"] == "execute_batch_payment":
+        summary, what = describe_batch(task_data["params"]), "os pagamentos"
+    else:
+        summary, what = describe_payment(task_data["params"]), "o pagamento"
+    return {
+        "message": f"{summary}\nPor favor, forneça sua chave secreta para autorizar {what}.",
+        "task": "clarification_needed",
+        "params": {"requires_secret_key": True}
+    }
+
+
+async def resolve_batch(task_data: dict, load_contacts, asset_index):
+    """
+    Resolve every recipient and asset of an execute_batch_payment up front,
+    with a single contacts fetch (`await load_contacts()` -> ContactIndex);
+    returns an error response listing all unknown names/assets, or None.
+    """
+    payments = task_data["params"].get("payments") or []
+    index = None
+    missing_contacts, missing_assets, suggestions = [], [], {}
+    for payment in payments:
+        destination = (payment.get("destination") or "").strip()
+        if not STELLAR_PUBLIC_KEY_PATTERN.match(destination):
+            index = index or await load_contacts()
+            contact = index.resolve(destination)
+            if contact:
+                payment["destination"] = contact.get("stellar_public_key")
+                payment["contact_name"] = contact.get("contact_name")
+            else:
+                missing_contacts.append(destination)
+                suggestion = index.suggest(destination)
+                if suggestion:
+                    suggestions[destination] = suggestion.get("contact_name")
+        requested = payment.get("asset") or ""
+        asset = asset_index.resolve(requested)
+        if asset:
+            payment["asset_code"] = asset.code
+            payment["issuer"] = asset.issuer or ""
+        else:
+            missing_assets.append(requested)
+
+    if missing_contacts:
+        names = [f"{name} (você quis dizer '{suggestions[name]}'?)" if name in suggestions else name for name in missing_contacts]
+        return {
+            "message": f"Não encontrei na sua lista: {', '.join(names)}. Verifique os nomes ou adicione os contatos primeiro.",
+            "task": "clarification_needed",
+            "params": {"contact_not_found": missing_contacts, "contact_suggestion": suggestions}
+        }
+    if missing_assets:
+        return {
+            "message": f"Não reconheci o ativo '{missing_assets[0]}'. Ativos disponíveis: {asset_index.describe()}.",
+            "task": "clarification_needed",
+            "params": {"asset_not_found": missing_assets[0]}
+        }
+    return None
+
+
+async def execute_batch(payments: list, pay) -> dict:
+    """
+    Pay each resolved item in turn with `await pay(index, payment)`; one
+    failure does not stop the rest, and each item keeps its own result.
+    """
+    results = []
+    for index, payment in enumerate(payments):
+        results.append({**payment, "result": await pay(index, payment)})
+    return {"success": all(item["result"].get("success") for item in results), "results": results}
+
+
+def payment_in_progress() -> dict:
+    return {
+        "message": "Seu pagamento já está sendo processado. Aguarde a confirmação.",
+        "task": "clarification_needed",
+        "params": {"payment_in_progress": True}
+    }
+
+
+def payment_not_completed() -> dict:
+    # A transação pendente já foi consumida: outra chave não pode reaproveitá-la
+    return {
+        "message": "Seu último pagamento não foi concluído e a transação foi encerrada. "
+                   "Para tentar de novo, envie o pedido de pagamento outra vez.",
+        "task": "clarification_needed",
+        "params": {"payment_not_completed": True}
+    }
+
+
+def replay_status(session_data: dict, window_seconds: float, now: float = None):
+    """
+    How to answer a secret key sent again after its payment was submitted:
+    ("done", transaction, result) when something went through, ("in_progress",
+    transaction, None) while it runs, ("failed", transaction, result) when
+    nothing did, or None without a payment in the last `window_seconds`.
+    """
+    last_payment = session_data.get("last_payment")
+    now = time.time() if now is None else now
+    if not last_payment or last_payment.get("at", 0) + window_seconds < now:
+        return None
+    transaction = last_payment["transaction"]
+    result = (session_data.get("payment_results") or {}).get(transaction.get("id"))
+    if result is None:
+        return "in_progress", transaction, None
+    # Lote com parte enviada também é repetido: reenviar pagaria os itens que já foram
+    items = result.get("results") or [{"result": result}]
+    if any((item.get("result") or {}).get("success") for item in items):
+        return "done", transaction, result
+    return "failed", transaction, result
+
+
+def is_stale_sequence(response) -> bool:
+    """True when sign-and-submit refused the XDR only because its sequence number is stale."""
+    # O backend responde 400 para qualquer falha (chave errada, tx_bad_auth,
+    # timeout do Horizon com a transação talvez aplicada): só o código decide
+    return response.status_code == 400 and STALE_SEQUENCE_CODE in response.text
+
+
+async def submit_xdr(client, url: str, headers: dict, sign_payload, unsigned_xdr: str, rebuild=None) -> dict:
+    """
+    Sign and submit `unsigned_xdr` through the backend; raises on HTTP errors.
+
+    `sign_payload(xdr)` builds the request body. With `rebuild` (an XDR
+    prefetched before the secret key arrived), a tx_bad_seq refusal builds the
+    XDR again and resubmits once; any other error is returned as it came.
+    """
+    response = await client.post(url, headers=headers, json=sign_payload(unsigned_xdr))
+    if rebuild is not None and is_stale_sequence(response):
+        # Outro pagamento da conta entrou depois do prefetch e gastou a sequência
+        logging.info(f"XDR pré-montado com sequência vencida, montando de novo: {response.text[:200]}")
+        try:
+            unsigned_xdr = await rebuild()
+        except Exception:
+            # Montar de novo também falhou (ex.: saldo insuficiente): vale o erro do envio
+            return response.json()
+        response = await client.post(url, headers=headers, json=sign_payload(unsigned_xdr))
+    response.raise_for_status()
+    return response.json()
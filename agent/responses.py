@@ -0,0 +1,176 @@
+"""
+Respostas em português geradas por template a partir do resultado da API.
+
+Cada renderer recebe o dict da API (o mesmo que iria como contexto para o
+final_agent) e devolve o texto, ou None quando o formato não é o esperado;
+nesse caso quem chama cai no final_agent.
+"""
+
+MAX_HISTORY_ITEMS = 10
+
+
+def short_key(public_key: str) -> str:
+    if not public_key or len(public_key) <= 12:
+        return public_key or ""
+    return f"{public_key[:4]}…{public_key[-4:]}"
+
+
+def failure_message(data: dict, fallback: str) -> str:
+    return data.get("message") or data.get("error") or fallback
+
+
+def render_list_contacts(data: dict):
+    if not data.get("success"):
+        return f"Não consegui listar seus contatos: {failure_message(data, 'erro desconhecido')}."
+    contacts = data.get("contacts")
+    if contacts is None:
+        return None
+    if not contacts:
+        return "Você ainda não tem contatos salvos. Para adicionar: 'adicionar Maria com chave G...'."
+    lines = [f"- {contact.get('contact_name')}: {contact.get('stellar_public_key')}" for contact in contacts]
+    return f"Seus contatos ({len(contacts)}):\n" + "\n".join(lines)
+
+
+def render_lookup_contact(data: dict):
+    contact = data.get("contact")
+    if not data.get("success") or not contact:
+        return "Não encontrei esse contato na sua lista."
+    return f"Encontrei {contact.get('contact_name')}: {contact.get('stellar_public_key')}"
+
+
+def render_add_contact(data: dict):
+    if not data.get("success"):
+        return f"Não consegui adicionar o contato: {failure_message(data, 'erro desconhecido')}."
+    contact = data.get("contact") or {}
+    name = contact.get("contact_name")
+    return f"Contato {name} adicionado com sucesso!" if name else "Contato adicionado com sucesso!"
+
+
+def render_execute_payment(data: dict):
+    transaction = data.get("transaction") or {}
+    result = data.get("result")
+    if result is None:
+        return None
+    params = transaction.get("params", {})
+    recipient = params.get("contact_name") or short_key(params.get("destination"))
+    description = f"{params.get('amount', '')} {params.get('asset_code', '')} para {recipient}".strip()
+    if result.get("success"):
+        message = f"Pagamento de {description} enviado com sucesso! ✅"
+        if result.get("hash"):
+            message += f"\nHash da transação: {result['hash']}"
+        return message
+    return f"O pagamento de {description} não foi concluído: {failure_message(result, 'erro desconhecido')}."
+
+
+def _batch_item(payment: dict) -> str:
+    recipient = payment.get("contact_name") or short_key(payment.get("destination"))
+    return f"{payment.get('amount', '')} {payment.get('asset_code') or payment.get('asset', '')} para {recipient}"
+
+
+def describe_contact(contact: dict) -> str:
+    return f"{contact.get('contact_name')} ({contact.get('stellar_public_key')})"
+
+
+def _pending_item(payment: dict) -> str:
+    # Antes da chave secreta mostra a chave pública inteira, não só o nome resolvido
+    destination = payment.get("destination", "")
+    recipient = f"{payment['contact_name']} ({destination})" if payment.get("contact_name") else destination
+    return f"{payment.get('amount', '')} {payment.get('asset_code') or payment.get('asset', '')} para {recipient}"
+
+
+def describe_payment(params: dict) -> str:
+    """Summary of a pending payment shown before asking for the secret key."""
+    summary = f"Pagamento: {_pending_item(params)}"
+    if params.get("memo"):
+        summary += f"\nMemo: {params['memo']}"
+    return summary
+
+
+def describe_batch(params: dict) -> str:
+    """Summary of a pending batch shown before asking for the secret key."""
+    payments = params.get("payments") or []
+    lines = [f"- {_pending_item(payment)}" for payment in payments]
+    summary = f"Pagamentos em lote ({len(payments)}):\n" + "\n".join(lines)
+    if params.get("memo"):
+        summary += f"\nMemo: {params['memo']}"
+    return summary
+
+
+def render_execute_batch_payment(data: dict):
+    result = data.get("result")
+    if result is None or result.get("results") is None:
+        return None
+    lines = []
+    for item in result["results"]:
+        outcome = item.get("result") or {}
+        if outcome.get("success"):
+            line = f"✅ {_batch_item(item)}"
+            if outcome.get("hash"):
+                line += f" (hash {outcome['hash']})"
+        else:
+            line = f"❌ {_batch_item(item)}: {failure_message(outcome, 'erro desconhecido')}"
+        lines.append(line)
+    sent = sum(1 for item in result["results"] if (item.get("result") or {}).get("success"))
+    header = "Todos os pagamentos foram enviados!" if result.get("success") else f"{sent} de {len(lines)} pagamentos enviados."
+    return header + "\n" + "\n".join(lines)
+
+
+def render_get_account_balance(data: dict):
+    if not data.get("success"):
+        return f"Não consegui consultar seu saldo: {failure_message(data, 'erro desconhecido')}."
+    balances = data.get("balances")
+    if balances is None:
+        return None
+    if not balances:
+        return "Sua conta não tem saldos no momento."
+    lines = []
+    for balance in balances:
+        code = "XLM" if balance.get("asset_type") == "native" else balance.get("asset_code", "?")
+        lines.append(f"- {balance.get('balance')} {code}")
+    return "Seus saldos:\n" + "\n".join(lines)
+
+
+def render_get_operations_history(data: dict):
+    if not data.get("success"):
+        return f"Não consegui buscar seu histórico: {failure_message(data, 'erro desconhecido')}."
+    history = data.get("history")
+    if history is None:
+        return None
+    if not history:
+        return "Você ainda não tem operações registradas."
+    lines = []
+    for operation in history[:MAX_HISTORY_ITEMS]:
+        date = (operation.get("created_at") or "")[:10]
+        amount = f"{operation.get('amount', '')} {operation.get('asset_code') or 'XLM'}".strip()
+        destination = short_key(operation.get("destination_key"))
+        line = f"- {date} {operation.get('type', '')} {amount}"
+        if destination:
+            line += f" para {destination}"
+        if operation.get("status"):
+            line += f" ({operation['status']})"
+        lines.append(line)
+    header = f"Suas últimas {len(lines)} operações:" if len(history) > MAX_HISTORY_ITEMS else "Suas operações:"
+    return header + "\n" + "\n".join(lines)
+
+
+RENDERERS = {
+    "list_contacts": render_list_contacts,
+    "lookup_contact": render_lookup_contact,
+    "add_contact": render_add_contact,
+    "execute_payment": render_execute_payment,
+    "execute_batch_payment": render_execute_batch_payment,
+    "get_account_balance": render_get_account_balance,
+    "get_operations_history": render_get_operations_history,
+}
+
+
+def render_response(task_type: str, data):
+    """Templated answer for a task result, or None when no template fits."""
+    renderer = RENDERERS.get(task_type)
+    if renderer is None or not isinstance(data, dict):
+        return None
+    try:
+        message = renderer(data)
+    except (AttributeError, TypeError, KeyError):
+        return None
+    return {"message": message} if message else None
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from embeddings import ChromaEmbeddingFunction, get_local_embedder
+
+
+DB_PATH = os.getenv("SEARCH_INDEX_DB_PATH", "db")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_collection_name(collection_name: str, model_name: str) -> str:
+    """
+    Chroma collection for `collection_name` embedded with `model_name`: vectors
+    of another model (other dimension, other space) never share a collection.
+    """
+    # Nome de modelo pode ser um caminho local; o Chroma só aceita [a-zA-Z0-9._-]
+    return f"{collection_name}-{content_hash(model_name)[:12]}"
+
+
+def json_records(data) -> list:
+    """
+    (id, text, metadata) for each record of a JSON document: one per key of a
+    top-level object (issuers.json) or per item of a list (contacts.json).
+    """
+    if isinstance(data, dict):
+        items = [(str(key), value) for key, value in data.items()]
+    elif isinstance(data, list):
+        items = [(str(value.get("id", index)) if isinstance(value, dict) else str(index), value)
+                 for index, value in enumerate(data)]
+    else:
+        items = [("0", data)]
+
+    records = []
+    for record_id, value in items:
+        if isinstance(value, dict):
+            text = f"{record_id}: " + "; ".join(f"{field}: {content}" for field, content in value.items())
+        else:
+            text = f"{record_id}: {value}"
+        records.append((record_id, text, {"record_id": record_id, "json": json.dumps(value, ensure_ascii=False)}))
+    return records
+
+
+class JSONSearchIndex:
+    """
+    Busca vetorial local sobre registros JSON, numa coleção do Chroma em `agent/db`.
+
+    A indexação é incremental: cada registro guarda o hash do seu conteúdo e
+    `sync` só gera embeddings para registros novos ou alterados, apaga os que
+    sumiram da fonte e deixa os iguais como estão. O nome da coleção no Chroma
+    inclui o modelo de embeddings (LOCAL_EMBEDDING_MODEL): trocar o modelo
+    indexa tudo de novo numa coleção nova.
+    """
+
+    def __init__(self, json_path: str, collection_name: str, embedder=None, db_path: str = None):
+        self.json_path = json_path
+        self.collection_name = collection_name
+        self.embedder = embedder or get_local_embedder()
+        self.db_path = db_path or DB_PATH
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                import chromadb
+                client = chromadb.PersistentClient(path=self.db_path)
+                self._collection = client.get_or_create_collection(
+                    model_collection_name(self.collection_name, self.embedder.model_name),
+                    embedding_function=ChromaEmbeddingFunction(self.embedder),
+                    metadata={"hnsw:space": "cosine"},
+                )
+            return self._collection
+
+    def build(self) -> dict:
+        """Sync the index with `json_path`; returns the sync stats."""
+        with open(self.json_path, "r", encoding="utf-8") as f:
+            records = json_records(json.load(f))
+        stats = self.sync(records)
+        logging.info(f"Índice '{self.collection_name}' sincronizado com {self.json_path}: {stats}")
+        return stats
+
+    def sync(self, records: list) -> dict:
+        """
+        Make the collection match `records` ((id, text, metadata) tuples):
+        embed new/changed records, delete stale ones.
+        """
+        collection = self.collection
+        existing = collection.get(include=["metadatas"])
+        current = {doc_id: (metadata or {}).get("hash") for doc_id, metadata in zip(existing["ids"], existing["metadatas"])}
+
+        wanted = {record_id: (text, {**metadata, "hash": content_hash(text)}) for record_id, text, metadata in records}
+        changed = [doc_id for doc_id, (_, metadata) in wanted.items() if current.get(doc_id) != metadata["hash"]]
+        stale = [doc_id for doc_id in current if doc_id not in wanted]
+
+        batch_size = self.embedder.batch_size
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            texts = [wanted[doc_id][0] for doc_id in batch]
+            collection.upsert(
+                ids=batch,
+                documents=texts,
+                embeddings=self.embedder.embed(texts),
+                metadatas=[wanted[doc_id][1] for doc_id in batch],
+            )
+        if stale:
+            collection.delete(ids=stale)
+
+        updated = sum(1 for doc_id in changed if doc_id in current)
+        return {
+            "added": len(changed) - updated,
+            "updated": updated,
+            "deleted": len(stale),
+            "unchanged": len(wanted) - len(changed),
+        }
+
+    def search(self, query: str, n_results: int = 3) -> list:
+        """Closest records to `query`: [{"id", "record", "distance"}]."""
+        collection = self.collection
+        n_results = min(n_results, collection.count())
+        if n_results == 0:
+            return []
+        result = collection.query(query_embeddings=[self.embedder.embed_query(query)], n_results=n_results)
+        if not result["ids"] or not result["ids"][0]:
+            return []
+        return [
+            {"id": metadata["record_id"], "record": json.loads(metadata["json"]), "distance": distance}
+            for metadata, distance in zip(result["metadatas"][0], result["distances"][0])
+        ]
@@ -0,0 +1,153 @@
+"""
+Sobe a API do agente com vários processos (workers).
+
+Cada worker tem seu próprio SimpleAgent, com pool de agentes pré-aquecido,
+executor e caches em memória; sessões e transações pendentes ficam no
+SQLite compartilhado (SESSION_STORE=sqlite), então qualquer worker pode
+atender qualquer mensagem.
+
+    # Uma porta, o kernel distribui as conexões entre os workers
+    python serve.py --workers 4 --port 8000
+
+    # Uma porta por worker, para o gateway dos bots rotear por session_id
+    python serve.py --workers 4 --port 8001 --sticky
+    # -> API_WORKER_ENDPOINTS=http://127.0.0.1:8001/query,...,http://127.0.0.1:8004/query
+
+    # Preload-then-fork: o mestre importa o app e carrega o SimpleAgent uma vez
+    # e os workers nascem por fork, compartilhando essas páginas (copy-on-write)
+    python serve.py --workers 4 --port 8000 --preload
+"""
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+
+def worker_env(workers: int) -> dict:
+    env = dict(os.environ)
+    env["AGENT_WORKERS"] = str(workers)
+    if workers > 1:
+        env.setdefault("SESSION_STORE", "sqlite")
+        # Caminho absoluto: todos os workers precisam abrir o mesmo arquivo
+        env["SESSION_DB_PATH"] = os.path.abspath(env.get("SESSION_DB_PATH", "sessions.sqlite3"))
+    return env
+
+
+def start_sticky_workers(app: str, host: str, port: int, workers: int, env: dict = None) -> list:
+    """One uvicorn process per port (port, port+1, ...); returns the Popen handles."""
+    env = env or worker_env(workers)
+    processes = []
+    for index in range(workers):
+        command = [sys.executable, "-m", "uvicorn", app, "--host", host, "--port", str(port + index), "--log-level", "warning"]
+        processes.append(subprocess.Popen(command, env={**env, "AGENT_WORKER_INDEX": str(index)}))
+    return processes
+
+
+def worker_endpoints(host: str, port: int, workers: int) -> list:
+    return [f"http://{host}:{port + index}/query" for index in range(workers)]
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_preforked(app_path: str, host: str, port: int, workers: int):
+    """
+    Import the app and load its SimpleAgent in this process, then fork the
+    workers on a shared listening socket. O que foi carregado antes do fork
+    (módulos do crewai, índice de ativos, caches vazios) é compartilhado por
+    copy-on-write; o warm-up do pool de agentes roda em cada worker, depois do
+    fork, porque cria threads. Só em sistemas com fork (Linux/macOS).
+    """
+    import uvicorn
+
+    module_name, _, attribute = app_path.partition(":")
+    module = importlib.import_module(module_name)
+    app = getattr(module, attribute)
+    loader = getattr(module, "loader", None)
+    if loader is not None:
+        loader.load()
+        logging.info(f"Preload: import {loader.import_seconds:.2f}s, construção {loader.build_seconds:.2f}s")
+
+    sock = bind_socket(host, port)
+    # Tira os objetos já carregados da coleta do GC: sem isso a coleta nos
+    # workers toca (e copia) as páginas herdadas do mestre
+    gc.freeze()
+
+    children = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.environ["AGENT_WORKER_INDEX"] = str(index)
+            server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+            server.run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+    sock.close()
+    logging.info(f"{workers} workers (fork) em http://{host}:{port}: pids {children}")
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="agent_server:app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AGENT_WORKERS", "1")))
+    parser.add_argument("--sticky", action="store_true", help="one port per worker, for session_id routing in the gateway")
+    parser.add_argument("--preload", action="store_true", help="load the agent once, then fork the workers (copy-on-write)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    env = worker_env(args.workers)
+    if args.preload:
+        os.environ.update(env)
+        serve_preforked(args.app, args.host, args.port, args.workers)
+        return
+    if not args.sticky:
+        os.environ.update(env)
+        import uvicorn
+        uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers)
+        return
+
+    processes = start_sticky_workers(args.app, args.host, args.port, args.workers, env)
+    logging.info("API_WORKER_ENDPOINTS=" + ",".join(worker_endpoints(args.host, args.port, args.workers)))
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
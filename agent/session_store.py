@@ -0,0 +1,441 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class SessionStore(ABC):
+    """
+    Interface do armazenamento de sessões.
+
+    Cada sessão é um dict (sessionToken, userId, email, publicKey e estado da
+    conversa, como `pending_transaction`). A API imita um dict (`get`, `items`)
+    para manter os pontos de uso simples. Sessões vencidas saem na leitura e,
+    a cada SESSION_PURGE_INTERVAL_SECONDS, numa limpeza feita durante uma escrita.
+
+    Código assíncrono usa as versões `a*` (`aget`, `aupdate`, ...): nos
+    backends com I/O elas rodam numa thread, para um banco travado por outro
+    worker não parar o event loop.
+    """
+
+    # O SQLite pode esperar o lock de outro processo; o de memória responde na hora
+    blocking_io = True
+
+    def __init__(self, ttl_seconds: float = None, purge_interval: float = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+        self.purge_interval = purge_interval if purge_interval is not None else float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "300"))
+        self._last_purge = time.monotonic()
+        self._metrics = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._metrics_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, session_id: str, default=None):
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, data: dict):
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, **fields) -> dict:
+        """Merge fields into the session (None removes a key) and return the new data."""
+
+    @abstractmethod
+    def pop_field(self, session_id: str, field: str):
+        """Atomically remove a field and return its value (None if absent or already taken)."""
+
+    @abstractmethod
+    def find_by_token(self, session_token: str):
+        """O(1) reverse lookup: returns (session_id, data) for a sessionToken, or None."""
+
+    @abstractmethod
+    def items(self):
+        ...
+
+    @abstractmethod
+    def get_account_state(self, user_id: str) -> dict:
+        """Per-account (userId) state shared by every session of the user; {} if none."""
+
+    @abstractmethod
+    def update_account_state(self, user_id: str, **fields) -> dict:
+        """Merge fields into the account state (None removes a key) and return it."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Remove every expired session; returns how many were removed."""
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    async def _call(self, method, *args, **kwargs):
+        if not self.blocking_io:
+            return method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def aget(self, session_id: str, default=None):
+        return await self._call(self.get, session_id, default)
+
+    async def aset(self, session_id: str, data: dict):
+        return await self._call(self.set, session_id, data)
+
+    async def aupdate(self, session_id: str, **fields) -> dict:
+        return await self._call(self.update, session_id, **fields)
+
+    async def apop_field(self, session_id: str, field: str):
+        return await self._call(self.pop_field, session_id, field)
+
+    async def afind_by_token(self, session_token: str):
+        return await self._call(self.find_by_token, session_token)
+
+    async def aget_account_state(self, user_id: str) -> dict:
+        return await self._call(self.get_account_state, user_id)
+
+    async def aupdate_account_state(self, user_id: str, **fields) -> dict:
+        return await self._call(self.update_account_state, user_id, **fields)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["size"] = len(self)
+        metrics["backend"] = type(self).__name__
+        return metrics
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._metrics_lock:
+            self._metrics[metric] += amount
+
+    def _maybe_purge(self):
+        # Sem isso, sessões (e pending_transaction) vencidas só saem quando o mesmo id é lido de novo
+        now = time.monotonic()
+        with self._metrics_lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        self.purge_expired()
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl_seconds
+
+    @staticmethod
+    def _merge(data: dict, fields: dict) -> dict:
+        merged = dict(data)
+        for key, value in fields.items():
+            if value is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+        return merged
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU + TTL backend. Fast, but private to a single worker."""
+
+    blocking_io = False
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries or int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+        self._data = OrderedDict()
+        # Índice reverso sessionToken -> session_id, mantido em toda escrita/remoção
+        self._tokens = {}
+        # Estado por conta fica à parte: não conta nem disputa a LRU das sessões
+        self._accounts = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _drop(self, session_id: str):
+        _, data = self._data.pop(session_id)
+        token = data.get("sessionToken")
+        if token and self._tokens.get(token) == session_id:
+            del self._tokens[token]
+
+    def get(self, session_id: str, default=None):
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                self._count("misses")
+                return default
+            expires_at, data = entry
+            if expires_at < time.time():
+                self._drop(session_id)
+                self._count("expired")
+                self._count("misses")
+                return default
+            self._data.move_to_end(session_id)
+            self._count("hits")
+            return dict(data)
+
+    def set(self, session_id: str, data: dict):
+        with self._lock:
+            if session_id in self._data:
+                self._drop(session_id)
+            self._data[session_id] = (self._expires_at(), dict(data))
+            if data.get("sessionToken"):
+                self._tokens[data["sessionToken"]] = session_id
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self._count("evicted")
+        self._maybe_purge()
+
+    def update(self, session_id: str, **fields) -> dict:
+        with self._lock:
+            data = self._merge(self.get(session_id, {}), fields)
+            self.set(session_id, data)
+            return dict(data)
+
+    def pop_field(self, session_id: str, field: str):
+        with self._lock:
+            data = self.get(session_id)
+            if data is None or field not in data:
+                return None
+            value = data.pop(field)
+            self.set(session_id, data)
+            return value
+
+    def find_by_token(self, session_token: str):
+        with self._lock:
+            session_id = self._tokens.get(session_token)
+            entry = self._data.get(session_id) if session_id is not None else None
+            # Lê _data direto: a busca por token não conta como hit/miss de sessão
+            if entry is None or entry[0] < time.time() or entry[1].get("sessionToken") != session_token:
+                return None
+            self._data.move_to_end(session_id)
+            return session_id, dict(entry[1])
+
+    def items(self):
+        now = time.time()
+        with self._lock:
+            return [(session_id, dict(data)) for session_id, (expires_at, data) in self._data.items() if expires_at >= now]
+
+    def get_account_state(self, user_id: str) -> dict:
+        with self._lock:
+            entry = self._accounts.get(user_id)
+            if entry is None or entry[0] < time.time():
+                return {}
+            return dict(entry[1])
+
+    def update_account_state(self, user_id: str, **fields) -> dict:
+        with self._lock:
+            data = self._merge(self.get_account_state(user_id), fields)
+            self._accounts[user_id] = (self._expires_at(), data)
+            self._accounts.move_to_end(user_id)
+            while len(self._accounts) > self.max_entries:
+                self._accounts.popitem(last=False)
+            return dict(data)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [session_id for session_id, (expires_at, _) in self._data.items() if expires_at < now]
+            for session_id in expired:
+                self._drop(session_id)
+            for user_id in [user_id for user_id, (expires_at, _) in self._accounts.items() if expires_at < now]:
+                del self._accounts[user_id]
+        self._count("expired", len(expired))
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Backend em SQLite (modo WAL) que pode ser compartilhado por vários workers
+    do uvicorn na mesma máquina. Expiração por TTL; LRU por `last_access`
+    quando passa de `max_entries`. A leitura só grava `last_access` quando ele
+    tem mais de `last_access_resolution` segundos: ler não disputa o lock de
+    escrita a cada requisição, e a LRU não precisa de precisão maior que essa.
+    """
+
+    last_access_resolution = float(os.getenv("SESSION_LAST_ACCESS_RESOLUTION_SECONDS", "60"))
+
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_entries: int = None):
+        super().__init__(ttl_seconds)
+        self.path = path or os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+        self.max_entries = max_entries or int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+        self._local = threading.local()
+        # Depois de um fork (serve.py --preload) o filho abre a própria conexão
+        os.register_at_fork(after_in_child=self._reset_connections)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            if "session_token" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN session_token TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_session_token ON sessions (session_token)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS account_state ("
+                " user_id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Uma conexão por thread; o SQLite cuida do lock entre processos
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def get(self, session_id: str, default=None):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT data, expires_at, last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return default
+        data, expires_at, last_access = row
+        now = time.time()
+        if expires_at < now:
+            conn.execute("DELETE FROM sessions WHERE session_id = ? AND expires_at < ?", (session_id, now))
+            self._count("expired")
+            self._count("misses")
+            return default
+        if now - last_access >= self.last_access_resolution:
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        self._count("hits")
+        return json.loads(data)
+
+    def set(self, session_id: str, data: dict):
+        conn = self._connect()
+        self._upsert(conn, session_id, data)
+        self._evict_overflow(conn)
+
+    def _upsert(self, conn: sqlite3.Connection, session_id: str, data: dict):
+        conn.execute(
+            "INSERT INTO sessions (session_id, data, session_token, expires_at, last_access) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, session_token = excluded.session_token,"
+            " expires_at = excluded.expires_at, last_access = excluded.last_access",
+            (session_id, json.dumps(data), data.get("sessionToken"), self._expires_at(), time.time()),
+        )
+
+    def update(self, session_id: str, **fields) -> dict:
+        conn = self._connect()
+        # BEGIN IMMEDIATE serializa o read-modify-write entre workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+            data = self._merge(json.loads(row[0]) if row else {}, fields)
+            self._upsert(conn, session_id, data)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+        return data
+
+    def pop_field(self, session_id: str, field: str):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+            data = json.loads(row[0]) if row else {}
+            value = data.pop(field, None)
+            if value is not None:
+                self._upsert(conn, session_id, data)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def find_by_token(self, session_token: str):
+        row = self._connect().execute(
+            "SELECT session_id, data FROM sessions WHERE session_token = ? AND expires_at >= ?",
+            (session_token, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def items(self):
+        rows = self._connect().execute(
+            "SELECT session_id, data FROM sessions WHERE expires_at >= ?", (time.time(),)
+        ).fetchall()
+        return [(session_id, json.loads(data)) for session_id, data in rows]
+
+    def get_account_state(self, user_id: str) -> dict:
+        row = self._connect().execute(
+            "SELECT data FROM account_state WHERE user_id = ? AND expires_at >= ?", (user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_account_state(self, user_id: str, **fields) -> dict:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM account_state WHERE user_id = ? AND expires_at >= ?", (user_id, time.time())
+            ).fetchone()
+            data = self._merge(json.loads(row[0]) if row else {}, fields)
+            conn.execute(
+                "INSERT INTO account_state (user_id, data, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                (user_id, json.dumps(data), self._expires_at()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return data
+
+    def purge_expired(self) -> int:
+        conn = self._connect()
+        now = time.time()
+        cursor = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        conn.execute("DELETE FROM account_state WHERE expires_at < ?", (now,))
+        self._count("expired", cursor.rowcount)
+        return cursor.rowcount
+
+    def _evict_overflow(self, conn: sqlite3.Connection):
+        self._maybe_purge()
+        # COUNT(*) percorre a tabela; só confere o limite a cada N escritas
+        self._writes = getattr(self, "_writes", 0) + 1
+        if self._writes % 100:
+            return
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN"
+                " (SELECT session_id FROM sessions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._count("evicted", overflow)
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def build_session_store() -> SessionStore:
+    """Pick the backend from SESSION_STORE ("memory" or "sqlite")."""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "memory" and int(os.getenv("AGENT_WORKERS", "1")) > 1:
+        # Cada processo teria suas próprias sessões e transações pendentes
+        raise ValueError("SESSION_STORE=memory does not support AGENT_WORKERS > 1; use SESSION_STORE=sqlite")
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
@@ -1,16 +1,43 @@
 from crewai import Agent, Task, Crew, Process
 from crewai.tools import BaseTool
-from crewai_tools import JSONSearchTool
-from langchain_openai import OpenAI
-import requests
+import httpx
+import asyncio
+import functools
+import importlib
+import logging
 import os
 import json 
+import re
+import time
+import uuid
 from dotenv import load_dotenv
-
-
-# Gerenciador de sessão em memória
+from typing import Any
+from bounded_executor import BoundedExecutor, ServerBusy
+from http_client import get_async_client, run_sync
+from account_cache import AccountCache
+from agent_pool import AgentPool
+from asset_index import load_asset_index
+from contacts_cache import ContactIndex, ContactsCache
+from embeddings import use_local_embeddings
+from intent_router import IntentRouter
+from llm_cache import SECRET_KEY_PATTERN, LLMCache, cache_key_text
+from model_tiers import TieredMapper, mapper_mode
+from payments import (
+    STELLAR_PUBLIC_KEY_PATTERN, execute_batch, idempotent_payment, payment_in_progress, payment_not_completed,
+    replay_status, resolve_batch, secret_key_prompt, submit_xdr,
+)
+from responses import describe_contact, render_response
+from search_index import JSONSearchIndex
+from session_store import build_session_store
+from single_flight import SingleFlight, single_flight
+from streaming import emit_event, emit_tokens
+from task_schemas import parse_task_response
+from tracing import annotate, record_tokens, span, start_trace, traced
+
+
+# Gerenciador de sessão (memória com LRU+TTL ou SQLite compartilhado, ver SESSION_STORE)
 # A chave é o ID do usuário da plataforma de chat (ex: 'whatsapp:+5521999999999')
-SESSION_STORAGE = {}
+SESSION_STORAGE = build_session_store()
 USER_INFO = {"email": "", "userPublicKey": "GAW7MQA7YLQLJZF7GD6M7JZWQCB4EGPPC46YSZAXQ7Z5LKLKNYFFOIGU", "phone_number": "100000000"}
 
 
@@ -18,20 +45,65 @@ USER_INFO = {"email": "", "userPublicKey": "GAW7MQA7YLQLJZF7GD6M7JZWQCB4EGPPC46Y
 NODE_API_BASE_URL = os.getenv("NODE_API_BASE_URL", "http://localhost:3001")
 INTERNAL_API_SECRET = os.getenv("INTERNAL_API_SECRET", "hackathon-secret-2024")
 
+# O XDR do pagamento é montado enquanto o usuário digita a chave secreta. O
+# backend fecha a transação com setTimeout(300); o cache expira antes disso
+XDR_PREFETCH_ENABLED = os.getenv("XDR_PREFETCH_ENABLED", "true").lower() == "true"
+XDR_PREFETCH_TTL_SECONDS = min(float(os.getenv("XDR_PREFETCH_TTL_SECONDS", "240")), 290.0)
+
+# Resultados de pagamento guardados por chave de idempotência (id da transação pendente)
+PAYMENT_RESULTS_MAX = int(os.getenv("PAYMENT_RESULTS_MAX", "20"))
+# Chave secreta reenviada dentro desta janela recebe o resultado do pagamento já feito (se algo foi enviado)
+PAYMENT_REPLAY_WINDOW_SECONDS = float(os.getenv("PAYMENT_REPLAY_WINDOW_SECONDS", "600"))
+PAYMENT_FLIGHTS = SingleFlight("payment")
+
+# Limite de iterações do loop ReAct do CrewAI: o mapper (no modo crew) e o
+# final_agent respondem numa passada; o excedente só gasta tokens
+MAPPER_MAX_ITER = int(os.getenv("MAPPER_MAX_ITER", "3"))
+FINAL_AGENT_MAX_ITER = int(os.getenv("FINAL_AGENT_MAX_ITER", "2"))
+
+async def find_session_by_token(session_token: str) -> dict:
+    """Returns the session data for the token, or an error dict."""
+    # ✅ Buscar userId da sessão ativa (índice token -> sessão, O(1))
+    found = await SESSION_STORAGE.afind_by_token(session_token)
+    if not found:
+        return {"success": False, "message": "Session not found or expired"}
+    _, session_data = found
+    if not session_data.get("userId"):
+        return {"success": False, "message": "User ID not found in session"}
+    return session_data
+
+
+def api_headers(session_token: str = None) -> dict:
+    """Headers for the Node API: internal secret, plus the user's JWT when given."""
+    headers = {"Content-Type": "application/json", "x-internal-secret": INTERNAL_API_SECRET}
+    if session_token:
+        headers["Authorization"] = f"Bearer {session_token}"
+    return headers
+
+
+# As ferramentas têm uma implementação só, assíncrona (httpx); `_run`, usado
+# pelo CrewAI nas suas threads, roda o `_arun` num event loop próprio
+
 class LoginTool(BaseTool):
     name: str = "Login Tool"
     description: str = "Authenticates a user by their email and returns a session token."
 
+    @single_flight("tool.login")
     def _run(self, email: str) -> dict:
+        return run_sync(self._arun(email))
+
+    @single_flight("tool.login")
+    @traced("tool.login")
+    async def _arun(self, email: str) -> dict:
         try:
-            response = requests.post(
+            response = await get_async_client().post(
                 f"{NODE_API_BASE_URL}/api/actions/login",
-                headers={"x-internal-secret": INTERNAL_API_SECRET},
+                headers=api_headers(),
                 json={"email": email}
             )
-            response.raise_for_status()  # Lança um erro para status 4xx/5xx
+            response.raise_for_status()
             return response.json()
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             return {"success": False, "message": f"Login failed: {e.response.json().get('message')}"}
         except Exception as e:
             return {"success": False, "message": f"An unexpected error occurred during login: {str(e)}"}
@@ -41,19 +113,25 @@ class CreateAccountTool(BaseTool):
     name: str = "Create Account Tool"
     description: str = "Creates a new user account and returns the necessary keys."
 
+    @single_flight("tool.create_account")
     def _run(self, email: str) -> dict:
+        return run_sync(self._arun(email))
+
+    @single_flight("tool.create_account")
+    @traced("tool.create_account")
+    async def _arun(self, email: str) -> dict:
         try:
             payload = {"email": email, "phone_number": USER_INFO["phone_number"], "public_key": ""}
 
-            response = requests.post(
+            response = await get_async_client().post(
                 f"{NODE_API_BASE_URL}/api/actions/onboard-user",
-                headers={"x-internal-secret": INTERNAL_API_SECRET},
+                headers=api_headers(),
                 json=payload
             )
 
-            response.raise_for_status()  # Lança um erro para status 4xx/5xx
+            response.raise_for_status()
             return response.json()
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             return {"success": False, "message": f"Login failed: {e.response.json().get('message')}"}
         except Exception as e:
             return {"success": False, "message": f"An unexpected error occurred during login: {str(e)}"}
@@ -62,16 +140,17 @@ class ListContactsTool(BaseTool):
     name: str = "List Contacts Tool"
     description: str = "Lists all contacts for the authenticated user."
 
+    @single_flight("tool.list_contacts")
     def _run(self, session_token: str) -> dict:
+        return run_sync(self._arun(session_token))
+
+    @single_flight("tool.list_contacts")
+    @traced("tool.list_contacts")
+    async def _arun(self, session_token: str) -> dict:
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {session_token}",
-                "x-internal-secret": INTERNAL_API_SECRET
-            }
-            response = requests.post(
+            response = await get_async_client().post(
                 f"{NODE_API_BASE_URL}/api/actions/list-contacts",
-                headers=headers
+                headers=api_headers(session_token)
             )
             response.raise_for_status()
             return response.json()
@@ -84,20 +163,27 @@ class AddContactTool(BaseTool):
     name: str = "Add Contact Tool"
     description: str = "Adiciona um novo contato para o usuário, usando o novo endpoint e payload."
 
-    def _run(self, session_token: str, userId: str, contact_name: str, public_key: str) -> dict:
+    @single_flight("tool.add_contact")
+    def _run(self, session_token: str, contact_name: str, public_key: str, userId: str = "") -> dict:
+        return run_sync(self._arun(session_token, contact_name, public_key, userId))
+
+    @single_flight("tool.add_contact")
+    @traced("tool.add_contact")
+    async def _arun(self, session_token: str, contact_name: str, public_key: str, userId: str = "") -> dict:
         try:
-            headers = {
-                "Authorization": f"Bearer {session_token}",
-                "x-internal-secret": INTERNAL_API_SECRET
-            }
+            if not userId:
+                session_data = await find_session_by_token(session_token)
+                if session_data.get("success") is False:
+                    return session_data
+                userId = session_data["userId"]
             payload = {
                 "userId": userId,
                 "contact_name": contact_name,
                 "public_key": public_key
             }
-            response = requests.post(
+            response = await get_async_client().post(
                 f"{NODE_API_BASE_URL}/api/actions/add-contact",
-                headers=headers,
+                headers=api_headers(session_token),
                 json=payload
             )
             response.raise_for_status()
@@ -106,146 +192,589 @@ class AddContactTool(BaseTool):
             return {"success": False, "message": "Falha ao adicionar contato."}
         
 
-class ExecutePaymentTool(BaseTool):
-    name: str = "Execute Payment Tool"
-    description: str = "Executes a payment transaction."
+class GetAccountBalanceTool(BaseTool):
+    name: str = "Get Account Balance Tool"
+    description: str = "Gets the Stellar balances of the authenticated user's account."
+
+    @single_flight("tool.get_account_balance")
+    def _run(self, session_token: str, publicKey: str) -> dict:
+        return run_sync(self._arun(session_token, publicKey))
 
-    def _run(self, session_token: str, destination: str, amount: str, assetCode: str, memo: str = "", secretKey: str = "") -> dict:
+    @single_flight("tool.get_account_balance")
+    @traced("tool.get_account_balance")
+    async def _arun(self, session_token: str, publicKey: str) -> dict:
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {session_token}",
-                "x-internal-secret": INTERNAL_API_SECRET
-            }
-            # ✅ Buscar userId da sessão ativa
-            session_data = None
-            for session_id, data in SESSION_STORAGE.items():
-                if data.get("sessionToken") == session_token:
-                    session_data = data
-                    break
-            if not session_data:
-                return {"success": False, "message": "Session not found or expired"}
-            user_id = session_data.get("userId")
-            if not user_id:
-                return {"success": False, "message": "User ID not found in session"}
-            payload = {
-                "sourcePublicKey": USER_INFO["userPublicKey"],
-                "destination": destination,
-                "amount": amount,
-                "asset_code": assetCode,
-                "memo": memo
-            }
-            response = requests.post(
-                f"{NODE_API_BASE_URL}/api/actions/build-payment-xdr",
-                headers=headers,
-                json=payload
+            response = await get_async_client().post(
+                f"{NODE_API_BASE_URL}/api/actions/get-account-balance",
+                headers=api_headers(session_token),
+                json={"publicKey": publicKey}
             )
             response.raise_for_status()
-            sign_payload = {
-                "secretKey": secretKey,
-                "unsignedXdr": response.json()["xdr"],  # ✅ Corrigir acesso ao JSON
-                "operationData": {
-                    "user_id": user_id,                           # ✅ Correto - existe na tabela
-                    "type": "PAYMENT",                            # ✅ Correto - campo 'type' na tabela
-                    "destination_key": destination,               # ✅ Correto - campo 'destination_key' na tabela
-                    "amount": amount,                             # ✅ Correto - existe na tabela
-                    "asset_code": assetCode,                      # ✅ Correto - existe na tabela
-                    "context": memo                               # ✅ Correto - campo 'context' na tabela
-                }
-            }
-            response = requests.post(
-                f"{NODE_API_BASE_URL}/api/actions/sign-and-submit-xdr",
-                headers=headers,
-                json=sign_payload
+            return response.json()
+        except Exception as e:
+            return {"success": False, "message": "Failed to get account balance."}
+
+
+class GetOperationsHistoryTool(BaseTool):
+    name: str = "Get Operations History Tool"
+    description: str = "Lists the operations of the authenticated user, newest first."
+
+    @single_flight("tool.get_operations_history")
+    def _run(self, session_token: str, since: str = None) -> dict:
+        return run_sync(self._arun(session_token, since))
+
+    @single_flight("tool.get_operations_history")
+    @traced("tool.get_operations_history")
+    async def _arun(self, session_token: str, since: str = None) -> dict:
+        # since: created_at da operação mais recente já conhecida (busca incremental)
+        try:
+            response = await get_async_client().post(
+                f"{NODE_API_BASE_URL}/api/actions/get-operation-history",
+                headers=api_headers(session_token),
+                json={"since": since} if since else {}
             )
             response.raise_for_status()
             return response.json()
+        except Exception as e:
+            return {"success": False, "message": "Failed to get operations history."}
+
+
+class LocalJSONSearchTool(BaseTool):
+    """JSON search over a JSONSearchIndex: local embeddings, no network hop per query."""
+    name: str = "JSON Search Tool"
+    description: str = "Searches a local JSON file."
+    index: Any = None
+
+    @traced("tool.json_search")
+    def _run(self, search_query: str) -> str:
+        return json.dumps(self.index.search(search_query), ensure_ascii=False)
+
+    async def _arun(self, search_query: str) -> str:
+        return await asyncio.to_thread(self._run, search_query)
+
+
+class ExecutePaymentTool(BaseTool):
+    name: str = "Execute Payment Tool"
+    description: str = "Executes a payment transaction."
+
+    def _run(self, session_token: str, destination: str, amount: str, assetCode: str, memo: str = "", secretKey: str = "", assetIssuer: str = "") -> dict:
+        return run_sync(self._arun(session_token, destination, amount, assetCode, memo, secretKey, assetIssuer))
+
+    @traced("tool.execute_payment")
+    async def _arun(self, session_token: str, destination: str, amount: str, assetCode: str, memo: str = "", secretKey: str = "", assetIssuer: str = "", unsignedXdr: str = "", idempotencyKey: str = "") -> dict:
+        # unsignedXdr: XDR já montado (prefetch), só falta assinar e submeter
+        # idempotencyKey: a mesma chave nunca é submetida duas vezes; repetições recebem o resultado original
+        execute = functools.partial(self._execute, session_token, destination, amount, assetCode, memo, secretKey, assetIssuer, unsignedXdr)
+        if not idempotencyKey:
+            return await execute()
+        return await PAYMENT_FLIGHTS.do(idempotencyKey, lambda: idempotent_payment(SESSION_STORAGE, session_token, idempotencyKey, execute, PAYMENT_RESULTS_MAX))
+
+    async def _execute(self, session_token: str, destination: str, amount: str, assetCode: str, memo: str, secretKey: str, assetIssuer: str, unsignedXdr: str) -> dict:
+        try:
+            session_data = await find_session_by_token(session_token)
+            if session_data.get("success") is False:
+                return session_data
+            user_id = session_data["userId"]
+            build = functools.partial(self.abuild_xdr, session_token, destination, amount, assetCode, assetIssuer, memo, session_data.get("publicKey"))
+            # XDR pré-montado só é montado de novo se a rede recusar a sequência (tx_bad_seq)
+            rebuild = build if unsignedXdr else None
+            if not unsignedXdr:
+                unsignedXdr = await build()
+            return await submit_xdr(
+                get_async_client(),
+                f"{NODE_API_BASE_URL}/api/actions/sign-and-submit-xdr",
+                api_headers(session_token),
+                lambda xdr: self._sign_payload(xdr, user_id, destination, amount, assetCode, memo, secretKey),
+                unsignedXdr,
+                rebuild=rebuild
+            )
         except Exception as e:
             return {"success": False, "message": "Failed to execute payment."}
+
+    @traced("tool.build_payment_xdr")
+    async def abuild_xdr(self, session_token: str, destination: str, amount: str, assetCode: str, assetIssuer: str = "", memo: str = "", source_public_key: str = None) -> str:
+        """Unsigned payment XDR from the backend (also checks balances); raises on failure."""
+        response = await get_async_client().post(
+            f"{NODE_API_BASE_URL}/api/actions/build-payment-xdr",
+            headers=api_headers(session_token),
+            json=self._build_payload(destination, amount, assetCode, assetIssuer, memo, source_public_key)
+        )
+        response.raise_for_status()
+        return response.json()["xdr"]
+
+    @traced("tool.execute_batch_payment")
+    async def _arun_batch(self, session_token: str, payments: list, memo: str = "", secretKey: str = "", idempotencyKey: str = "") -> dict:
+        """
+        Pay each recipient in turn. Transações da mesma conta de origem
+        consomem números de sequência consecutivos, então o XDR de um item só
+        pode ser montado depois que o anterior foi submetido.
+        """
+        execute = functools.partial(self._execute_batch, session_token, payments, memo, secretKey, idempotencyKey)
+        if not idempotencyKey:
+            return await execute()
+        return await PAYMENT_FLIGHTS.do(idempotencyKey, lambda: idempotent_payment(SESSION_STORAGE, session_token, idempotencyKey, execute, PAYMENT_RESULTS_MAX))
+
+    async def _execute_batch(self, session_token: str, payments: list, memo: str, secretKey: str, idempotencyKey: str) -> dict:
+        def pay(index, payment):
+            return self._arun(
+                session_token=session_token,
+                destination=payment["destination"],
+                amount=payment["amount"],
+                assetCode=payment["asset_code"],
+                assetIssuer=payment["issuer"],
+                memo=memo,
+                secretKey=secretKey,
+                idempotencyKey=f"{idempotencyKey}:{index}" if idempotencyKey else ""
+            )
+
+        return await execute_batch(payments, pay)
+
+    def _build_payload(self, destination: str, amount: str, assetCode: str, assetIssuer: str, memo: str, source_public_key: str = None) -> dict:
+        # Nomes de campo do buildPaymentXdrSchema do backend; sem emissor o ativo é XLM nativo
+        payload = {
+            "sourcePublicKey": source_public_key or USER_INFO["userPublicKey"],
+            "destination": destination,
+            "amount": amount
+        }
+        if assetIssuer:
+            payload["assetCode"] = assetCode
+            payload["assetIssuer"] = assetIssuer
+        if memo:
+            payload["memoText"] = memo
+        return payload
+
+    def _sign_payload(self, unsigned_xdr: str, user_id: str, destination: str, amount: str, assetCode: str, memo: str, secretKey: str) -> dict:
+        return {
+            "secretKey": secretKey,
+            "unsignedXdr": unsigned_xdr,                      # ✅ Corrigir acesso ao JSON
+            "operationData": {
+                "user_id": user_id,                           # ✅ Correto - existe na tabela
+                "type": "PAYMENT",                            # ✅ Correto - campo 'type' na tabela
+                "destination_key": destination,               # ✅ Correto - campo 'destination_key' na tabela
+                "amount": amount,                             # ✅ Correto - existe na tabela
+                "asset_code": assetCode,                      # ✅ Correto - existe na tabela
+                "context": memo                               # ✅ Correto - campo 'context' na tabela
+            }
+        }
         
 
 class SimpleAgent:
     def __init__(self):
         load_dotenv()
-        self.llm = OpenAI(
-            temperature=0.5,
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            model="gpt-4",
-            max_tokens=1000
-        )
+        self.llm = self._build_llm()
 
         self.login_tool = LoginTool()
         self.list_contacts_tool = ListContactsTool()
+        self.add_contact_tool = AddContactTool()
         self.execute_payment_tool = ExecutePaymentTool()
+        self.get_account_balance_tool = GetAccountBalanceTool()
+        self.get_operations_history_tool = GetOperationsHistoryTool()
         self.create_account_tool = CreateAccountTool()
 
-        self.transaction_register = {}
-        self.secret_key_mode = False
+        # "tiered" (padrão): saída estruturada com escalonamento de modelos (model_tiers.py); "crew": agente do CrewAI
+        self.tiered_mapper = self._build_tiered_mapper()
+
+        # Ferramentas e agentes são construídos uma vez (warm-up) e reutilizados
+        agent_builders = {"final": self._build_final_agent}
+        if self.tiered_mapper is None:
+            agent_builders["mapper"] = self._build_mapper_agent
+        self.agent_pool = AgentPool(
+            tool_builders=self._mapper_tool_builders() if self.tiered_mapper is None else {},
+            agent_builders=agent_builders
+        )
+
+        # Contatos por usuário, em memória; nomes são resolvidos após o mapeamento
+        self.contacts_cache = ContactsCache()
+
+        # Saldos e histórico por usuário, com TTL curto; invalidados após cada pagamento
+        self.account_cache = AccountCache()
+
+        # "template" (padrão): respostas prontas por tarefa, final_agent só sem template; "llm": sempre final_agent
+        self.final_agent_mode = os.getenv("FINAL_AGENT_MODE", "template").lower()
 
+        # Cache das respostas do mapper e do final_agent
+        self.llm_cache = LLMCache()
 
-    def run(self, query: dict, output_file: str = "decision_output.json", session_id: str = "default_session"):
+        # issuers.json carregado uma vez num índice em memória (código, nome, apelido)
+        self.asset_index = load_asset_index()
 
-        contact_search_tool = JSONSearchTool(
-            name="Contacts JSON Search Tool",
-            description="Searches a local JSON file for contact information.",
-            json_path="contacts.json"
+        self.intent_router = IntentRouter(
+            asset_resolver=self._resolve_asset_code
         )
 
-        issuers_search_tool = JSONSearchTool(
+        # Limita quantos crews rodam ao mesmo tempo e quantos podem esperar
+        self.executor = BoundedExecutor()
+
+        # Chamadas iguais ao mapper/final_agent em andamento são compartilhadas
+        self.llm_flights = SingleFlight("llm")
+
+        # session_id -> (id da transação pendente, task do prefetch do XDR) neste processo
+        self._xdr_prefetches = {}
+
+    def _build_llm(self):
+        # AGENT_LLM_FACTORY="modulo:funcao" troca o LLM (ex.: benchmarks.fake_llm:build_fake_llm nos testes de carga)
+        factory_path = os.getenv("AGENT_LLM_FACTORY")
+        if factory_path:
+            module_name, _, function_name = factory_path.partition(":")
+            return getattr(importlib.import_module(module_name), function_name)()
+        # Import tardio: langchain_openai só é carregado quando o LLM real é usado
+        from langchain_openai import OpenAI
+        return OpenAI(
+            temperature=0.5,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            model="gpt-4",
+            max_tokens=1000
+        )
+
+    def _build_tiered_mapper(self):
+        if mapper_mode() != "tiered":
+            return None
+        try:
+            return TieredMapper()
+        except ImportError as e:
+            logging.warning(f"MAPPER_MODE=tiered sem o SDK da OpenAI ({e}); usando o mapper do CrewAI")
+            return None
+
+    def warm_up(self):
+        """Build search tools (and their embeddings) and agent templates ahead of the first request."""
+        self.agent_pool.warm_up()
+
+    def process_query(self, query: str, session_id: str) -> dict:
+        """Entry point used by the HTTP servers."""
+        return self.run({"query": query}, session_id=session_id)
+
+    async def aprocess_query(self, query: str, session_id: str, on_event=None, request_id: str = None) -> dict:
+        """
+        Async entry point used by the HTTP servers. `on_event`, when given, is
+        called on the event loop with each progress event (see `streaming.py`).
+        """
+        return await self.arun({"query": query}, session_id=session_id, on_event=on_event, request_id=request_id)
+
+    def _mapper_tool_builders(self) -> dict:
+        # Os ativos vão direto no prompt e são resolvidos pelo AssetIndex; a busca
+        # vetorial só vale a pena se o issuers.json crescer muito
+        if os.getenv("MAPPER_ISSUERS_SEARCH_TOOL", "false").lower() == "true":
+            return {"issuers": self._build_issuers_search_tool}
+        return {}
+
+    def _build_issuers_search_tool(self):
+        if use_local_embeddings():
+            index = JSONSearchIndex("issuers.json", "issuers")
+            index.build()
+            return LocalJSONSearchTool(
+                name="Issuers Search Tool",
+                description="Searches a local JSON file for issuers code",
+                index=index
+            )
+        from crewai_tools import JSONSearchTool
+        return JSONSearchTool(
             name="Issuers Search Tool",
             description="Searches a local JSON file for issuers code",
             json_path="issuers.json"
         )
 
-        agent = Agent(
+    def _build_mapper_agent(self, tools: dict):
+        return Agent(
             role="Simple Task Mapper",
             goal="Convert a user query into a structured JSON TaskResponse object.",
             backstory="You only produce structured JSON for backend execution.",
             llm=self.llm,
             verbose=True,
-            tools=[contact_search_tool, issuers_search_tool]
+            max_iter=MAPPER_MAX_ITER,
+            tools=list(tools.values())
+        )
+
+    def _build_final_agent(self, tools: dict):
+        return Agent(
+            role="Final Answer Generator",
+            goal="Use the context from the API call to generate a user-facing answer in Portuguese.",
+            backstory="You receive structured data from an API and must summarize or explain it to the user in a friendly, clear way.",
+            llm=self.llm,
+            verbose=True,
+            max_iter=FINAL_AGENT_MAX_ITER
         )
 
+    def run(self, query: dict, output_file: str = None, session_id: str = "default_session"):
+        """Synchronous wrapper around `arun` for scripts and sync callers."""
+        return run_sync(self.arun(query, output_file=output_file, session_id=session_id))
+
+    async def arun(self, query: dict, output_file: str = None, session_id: str = "default_session",
+                   on_event=None, request_id: str = None):
+        """Process one user message inside a trace (spans and metrics in `tracing.py`)."""
+        with start_trace(session_id, request_id):
+            return await self._handle_query(query, output_file or os.getenv("MAPPER_OUTPUT_FILE"), session_id, on_event)
 
-        if self.secret_key_mode:
+    async def _handle_query(self, query: dict, output_file: str, session_id: str, on_event=None):
+        # I/O com a API Node roda no event loop (httpx); crew.kickoff, que é
+        # bloqueante, vai para o executor limitado (ServerBusy quando lotado)
+
+        # O estado da conversa fica na sessão, não na instância: vários workers
+        # podem atender o mesmo usuário
+        session_data = await SESSION_STORAGE.aget(session_id) or {}
+        pending_transaction = session_data.get("pending_transaction")
+
+        if pending_transaction:
             secret_key = query["query"]
-            task_data = self.transaction_register
-            session_token = SESSION_STORAGE.get(session_id).get("sessionToken")
-            payment_result = self.execute_payment_tool._run(
+            session_token = session_data.get("sessionToken")
+            # Consome a transação pendente de forma atômica antes de enviar: com a
+            # chave repetida (ou em dois workers) só uma requisição leva a transação
+            task_data = await SESSION_STORAGE.apop_field(session_id, "pending_transaction")
+            if task_data is None:
+                return await self._replay_payment(session_id, on_event) or payment_in_progress()
+            pending_transaction = task_data
+            await SESSION_STORAGE.aupdate(session_id, prefetched_xdr=None, last_payment={
+                "transaction": task_data,
+                "at": time.time()
+            })
+            if task_data.get("task") == "execute_batch_payment":
+                annotate(task="execute_batch_payment", source="session")
+                emit_event(on_event, "intent", task="execute_batch_payment", source="session")
+                emit_event(on_event, "api_call", name="execute_batch_payment")
+                batch_result = await self.execute_payment_tool._arun_batch(
+                    session_token=session_token,
+                    payments=task_data["params"]["payments"],
+                    memo=task_data["params"].get("memo", ""),
+                    secretKey=secret_key,
+                    idempotencyKey=task_data.get("id", "")
+                )
+                if any(item["result"].get("success") for item in batch_result["results"]):
+                    self.account_cache.invalidate(session_data.get("userId"))
+                    await self._invalidate_xdr_prefetches(session_data.get("userId"))
+                result_data = {"transaction": pending_transaction, "result": batch_result}
+                return await self._final_answer(task_type="execute_batch_payment", data=result_data, on_event=on_event)
+
+            annotate(task="execute_payment", source="session")
+            emit_event(on_event, "intent", task="execute_payment", source="session")
+            emit_event(on_event, "api_call", name="execute_payment")
+            unsigned_xdr = await self._prefetched_xdr(session_id, session_data, task_data)
+            annotate(xdr_prefetched=bool(unsigned_xdr))
+            payment_result = await self.execute_payment_tool._arun(
                 session_token=session_token,
                 destination=task_data["params"]["destination"],
                 amount=task_data["params"]["amount"],
-                assetCode=task_data["params"]["issuer"],
-                memo=task_data["params"]["memo"],
-                secretKey=secret_key
+                assetCode=task_data["params"]["asset_code"],
+                assetIssuer=task_data["params"]["issuer"],
+                memo=task_data["params"].get("memo", ""),
+                secretKey=secret_key,
+                unsignedXdr=unsigned_xdr,
+                idempotencyKey=task_data.get("id", "")
             )
 
-            payment_str = json.dumps(payment_result)
-            transaction_str = json.dumps(self.transaction_register)
+            if payment_result.get("success"):
+                self.account_cache.invalidate(session_data.get("userId"))
+                await self._invalidate_xdr_prefetches(session_data.get("userId"))
+            result_data = {"transaction": pending_transaction, "result": payment_result}
+
+            return await self._final_answer(task_type="execute_payment", data=result_data, on_event=on_event)
+
+        if SECRET_KEY_PATTERN.search(query["query"]):
+            # Chave secreta sem transação pendente: reenvio depois do pagamento
+            replay = await self._replay_payment(session_id, on_event)
+            if replay is not None:
+                return replay
+
+        # Fast path: intenções simples são resolvidas localmente, sem LLM
+        with span("router"):
+            routed = self.intent_router.route(query["query"])
+        if routed is not None:
+            task_data = routed.as_task_data()
+            source = "router"
+        else:
+            task_data = self.llm_cache.get("mapper", query["query"])
+            source = "cache"
+            if task_data is None:
+                emit_event(on_event, "thinking")
+                with span("mapper"):
+                    # Mensagens iguais ao mesmo tempo (usuário repetiu, bot reenviou) esperam o mesmo kickoff
+                    task_data = await self.llm_flights.do(
+                        ("mapper", cache_key_text(query["query"])),
+                        lambda: self.executor.run(self._map_query, query["query"], output_file)
+                    )
+                self.llm_cache.put("mapper", query["query"], task_data, task=task_data.get("task"))
+                source = "llm"
+                if task_data["params"].get("parse_error"):
+                    # Saída do mapper inaproveitável: pede para reformular sem gastar o final_agent
+                    annotate(task="clarification_needed", source=source)
+                    return task_data
+        annotate(task=task_data.get("task"), source=source)
+        emit_event(on_event, "intent", task=task_data.get("task"), source=source)
 
-            context = transaction_str + '\n' + payment_str
+        public_tasks = ["login", "onboard_user"]
 
-            self.secret_key_mode = False
-            self.transaction_register = {}
+        task_type = task_data["task"]
 
-            return self.final_agent(task_type="execute_payment", context=context)
+        if task_type not in public_tasks:
+            if not session_data or not session_data.get("sessionToken"):
+                return {
+                    "message": "Você precisa fazer login primeiro. Por favor, envie seu email para autenticar. Exemplo: 'fazer login com email@exemplo.com'",
+                    "task": "clarification_needed",
+                    "params": {"requires_login": True}
+                }
         
+        result_data = None
+        if task_type == "login":
+            emit_event(on_event, "api_call", name="login")
+            return await self._handle_login(query["query"], session_id)
+        
+        if task_type == "onboard_user":
+            emit_event(on_event, "api_call", name="onboard_user")
+            return await self._handle_onboard(task_data["params"]["email"])
 
+        elif task_type == "list_contacts":
+            emit_event(on_event, "api_call", name="list_contacts")
+            index = await self._contacts_index(session_data)
+            result_data = {"success": True, "contacts": index.contacts, "count": len(index)}
+
+        elif task_type == "lookup_contact":
+            index = await self._contacts_index(session_data)
+            name = task_data["params"].get("contactName", "")
+            # Só consulta: aqui um nome aproximado pode responder direto
+            contact = index.resolve(name) or index.suggest(name)
+            result_data = {"success": bool(contact), "contact": contact}
+
+        elif task_type == "add_contact":
+            params = task_data["params"]
+            emit_event(on_event, "api_call", name="add_contact")
+            add_result = await self.add_contact_tool._arun(
+                session_token=session_data.get("sessionToken"),
+                contact_name=params.get("contact_name") or params.get("contactName", ""),
+                public_key=params.get("public_key") or params.get("publicKey", ""),
+                userId=session_data.get("userId")
+            )
+            if add_result.get("success"):
+                self.contacts_cache.invalidate(session_data.get("userId"))
+                await SESSION_STORAGE.aupdate_account_state(session_data.get("userId"), contacts_changed_at=time.time())
+            result_data = add_result
 
-        description = f"""
-        Convert the following user query into a valid JSON object.
+        elif task_type == "get_account_balance":
+            session_token = session_data.get("sessionToken")
+            emit_event(on_event, "api_call", name="get_account_balance")
+            result_data = await self.account_cache.balances(
+                session_data.get("userId"),
+                lambda: self.get_account_balance_tool._arun(session_token=session_token, publicKey=session_data.get("publicKey") or USER_INFO["userPublicKey"])
+            )
 
-        User Query: "{query["query"]}"
+        elif task_type == "get_operations_history":
+            session_token = session_data.get("sessionToken")
+            emit_event(on_event, "api_call", name="get_operations_history")
+            result_data = await self.account_cache.history(
+                session_data.get("userId"),
+                lambda since: self.get_operations_history_tool._arun(session_token=session_token, since=since)
+            )
 
-        ### JSON Schema (must follow exactly):
-        {{
-          "message": "Short explanation in Portuguese of what is being done",
-          "task": "task_name_here",
-          "params": {{
-            "key": "value"
-          }}
-        }}
+        if task_type == "execute_payment":
+            not_found = await self._resolve_destination(session_data, task_data) or self._resolve_asset_params(task_data)
+            if not_found:
+                return not_found
+
+            task_data["id"] = uuid.uuid4().hex
+            await SESSION_STORAGE.aupdate(session_id, pending_transaction=task_data, prefetched_xdr=None)
+            if XDR_PREFETCH_ENABLED:
+                self._start_xdr_prefetch(session_id, session_data, task_data)
+
+            return secret_key_prompt(task_data)
+
+        if task_type == "execute_batch_payment":
+            not_found = await self._resolve_batch(session_data, task_data)
+            if not_found:
+                return not_found
+
+            task_data["id"] = uuid.uuid4().hex
+            await SESSION_STORAGE.aupdate(session_id, pending_transaction=task_data)
 
+            return secret_key_prompt(task_data)
+        
+
+        return await self._final_answer(task_type=task_type, data=result_data, on_event=on_event)
+
+
+    async def _replay_payment(self, session_id: str, on_event=None):
+        """
+        Answer for a secret key sent again after its payment was submitted: the
+        stored result when something went through (nothing is paid twice),
+        "still processing", "send the request again" when it failed (a
+        corrected key must not get the old failure back), or None when there is
+        no recent payment.
+        """
+        session_data = await SESSION_STORAGE.aget(session_id) or {}
+        replay = replay_status(session_data, PAYMENT_REPLAY_WINDOW_SECONDS)
+        if replay is None:
+            return None
+        status, transaction, result = replay
+        annotate(task=transaction.get("task"), source="replay", replay=status)
+        if status == "in_progress":
+            return payment_in_progress()
+        if status == "failed":
+            return payment_not_completed()
+        return await self._final_answer(task_type=transaction["task"], data={"transaction": transaction, "result": result}, on_event=on_event)
+
+    def _start_xdr_prefetch(self, session_id: str, session_data: dict, task_data: dict):
+        """Build the unsigned XDR in the background while the user types the secret key."""
+        started_at = time.time()
+        task = asyncio.create_task(self._prefetch_xdr(session_id, session_data, task_data, started_at))
+        self._xdr_prefetches[session_id] = (task_data["id"], started_at, task)
+
+        def forget(done_task):
+            if self._xdr_prefetches.get(session_id, (None, None, None))[2] is done_task:
+                del self._xdr_prefetches[session_id]
+
+        task.add_done_callback(forget)
+
+    async def _prefetch_xdr(self, session_id: str, session_data: dict, task_data: dict, started_at: float):
+        params = task_data["params"]
+        try:
+            xdr = await self.execute_payment_tool.abuild_xdr(
+                session_data.get("sessionToken"), params["destination"], params["amount"],
+                params["asset_code"], params["issuer"], params.get("memo", ""), session_data.get("publicKey")
+            )
+        except Exception as e:
+            # Sem XDR pronto o envio monta de novo (e mostra o erro do backend, ex.: saldo insuficiente)
+            logging.info(f"Prefetch do XDR falhou para session_id='{session_id}': {e}")
+            return None
+        # Só grava se a transação ainda é a pendente (o usuário pode ter mudado de ideia)
+        pending = (await SESSION_STORAGE.aget(session_id) or {}).get("pending_transaction") or {}
+        if pending.get("id") == task_data["id"]:
+            await SESSION_STORAGE.aupdate(session_id, prefetched_xdr={
+                "transaction_id": task_data["id"],
+                "xdr": xdr,
+                "built_at": started_at,
+                "expires_at": time.time() + XDR_PREFETCH_TTL_SECONDS
+            })
+        return xdr
+
+    async def _prefetched_xdr(self, session_id: str, session_data: dict, transaction: dict) -> str:
+        """Unsigned XDR prefetched for this pending transaction, or "" to build it now."""
+        # Outro pagamento da mesma conta depois do prefetch gastou o número de sequência do XDR
+        paid_at = (await SESSION_STORAGE.aget_account_state(session_data.get("userId"))).get("last_payment_at", 0)
+        prefetched = session_data.get("prefetched_xdr") or {}
+        if (prefetched.get("transaction_id") == transaction.get("id") and prefetched.get("expires_at", 0) > time.time()
+                and prefetched.get("built_at", 0) > paid_at):
+            return prefetched["xdr"]
+        # Prefetch ainda em andamento neste processo: esperar sai mais barato que montar de novo
+        transaction_id, started_at, task = self._xdr_prefetches.get(session_id, (None, None, None))
+        if (task is not None and transaction_id == transaction.get("id") and started_at > paid_at
+                and task.get_loop() is asyncio.get_running_loop()):
+            with span("payment.await_prefetch"):
+                return await task or ""
+        return ""
+
+    async def _invalidate_xdr_prefetches(self, user_id: str):
+        """Mark XDRs prefetched for this account (in any session or worker) as stale after a payment."""
+        if user_id:
+            await SESSION_STORAGE.aupdate_account_state(user_id, last_payment_at=time.time())
+
+    def _map_query(self, query: str, output_file: str = None) -> dict:
+        """Slow path: map the query with the tiered structured-output mapper, or with the CrewAI agent."""
+        if self.tiered_mapper is None:
+            return self._map_with_crew(query, output_file)
+        task_data = self.tiered_mapper.map(self._mapper_system_prompt(), query)
+        if output_file:
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(task_data, f, ensure_ascii=False, indent=2)
+        return task_data
+
+    def _mapper_tasks_prompt(self) -> str:
+        return f"""
         Tasks available:
         - login: {{ "email": "" }}
         - onboard_user: {{"email": "" }}
@@ -254,94 +783,175 @@ class SimpleAgent:
         - lookup_contact: {{ "contactName": "" }}
         - get_account_balance: {{}}
         - get_operations_history: {{}}
-        - execute_payment: {{ "destination": "", "amount": "", "issuer": "", "memo": ""}}
+        - execute_payment: {{ "destination": "", "amount": "", "asset": "", "memo": ""}}
+        - execute_batch_payment: {{ "payments": [{{ "destination": "", "amount": "", "asset": "" }}], "memo": ""}} (vários destinatários na mesma mensagem)
         - execute_path_payment: {{ "destination": "", "destAsset": "", "destAmount": "", "sourceAsset": "" }}
         - initiate_pix_deposit: {{ "amount": "", "assetCode": "" }}
         - clarification_needed: {{ "message": "" }}
 
-        For destination paramters, check the contacts list to associate the respective name to the public key
-        For the asset, need to get the code present in issuers document
-
-        SEARCH IN JSON TOOL FOR TRANSACTION, use the tools provided to find the necessary information. always do it for transaction
-        ALWAYS USE THEM FOR TRANSACTION
+        For amounts, copy the number as the user wrote it (e.g. "10,5" or "1.000,50"); never guess whether a separator means thousands
+        For the destination parameter, use the contact name exactly as the user wrote it (or the public key if the user gave one); it is resolved to a public key afterwards
+        For the asset parameter, use the code of one of the known assets: {self.asset_index.describe()}
+        (if the user wrote an asset that is not in this list, copy it as written; never swap it for a different asset)
+        """
 
-        ### Rules:
-        - Respond ONLY with the JSON object.
-        - Never include explanations, markdown, or text outside JSON.
+    def _mapper_system_prompt(self) -> str:
+        # O formato vem do JSON Schema da saída estruturada; o prompt só explica as tarefas
+        return f"""
+        Convert the user message into a task for the backend. "message" is a short explanation in Portuguese
+        of what is being done. Fill only the params of the chosen task; leave optional params empty.
+        {self._mapper_tasks_prompt()}
         """
 
+    def _map_with_crew(self, query: str, output_file: str = None) -> dict:
+        """Slow path: ask the CrewAI task mapper to convert the query into task JSON."""
+        description = f"""
+        Convert the following user query into a valid JSON object.
 
-        task = Task(
-            description=description,
-            agent=agent,
-            expected_output="A output file json",
-            output_file=output_file,
-            tools=[contact_search_tool, issuers_search_tool]
-        )
+        User Query: "{query}"
 
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
+        ### JSON Schema (must follow exactly):
+        {{
+          "message": "Short explanation in Portuguese of what is being done",
+          "task": "task_name_here",
+          "params": {{
+            "key": "value"
+          }}
+        }}
+        {self._mapper_tasks_prompt()}
 
-        result = crew.kickoff()
-        task_data = json.load(open(output_file, "r"))
+        ### Rules:
+        - Respond ONLY with the JSON object.
+        - Never include explanations, markdown, or text outside JSON.
+        """
 
-        public_tasks = ["login", "onboard_user"]
 
-        task_type = task_data["task"]
+        with self.agent_pool.acquire() as agents:
+            agent = agents["mapper"]
+            task_options = {"output_file": output_file} if output_file else {}
+            task = Task(
+                description=description,
+                agent=agent,
+                expected_output="A JSON object following the schema",
+                tools=list(self.agent_pool.tools.values()),
+                **task_options
+            )
 
-        session_data = SESSION_STORAGE.get(session_id)
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=True
+            )
 
-        if task_type not in public_tasks:
-            if not session_data or not session_data.get("sessionToken"):
+            with span("mapper.kickoff") as attrs:
+                result = crew.kickoff()
+                record_tokens("mapper", getattr(result, "token_usage", None), attrs)
+        # O resultado vem do crew em memória; o arquivo, quando pedido, é só para depuração
+        return parse_task_response(getattr(result, "raw", None) or str(result))
+
+    async def _contacts_index(self, session_data: dict):
+        """Per-user contact index from the cache, fetched from the API on a miss."""
+        user_id = session_data.get("userId")
+        # add_contact em outro worker: o marcador compartilhado vence a cópia deste processo
+        changed_at = (await SESSION_STORAGE.aget_account_state(user_id)).get("contacts_changed_at", 0)
+        index = self.contacts_cache.get(user_id, changed_at)
+        if index is None:
+            fetched_at = time.time()
+            contacts = await self.list_contacts_tool._arun(session_token=session_data.get("sessionToken"))
+            if not contacts.get("success"):
+                # Falha na API não entra no cache
+                return ContactIndex([])
+            index = self.contacts_cache.put(user_id, contacts.get("contacts", []), fetched_at=fetched_at)
+        return index
+
+    async def _resolve_destination(self, session_data: dict, task_data: dict):
+        """Replace a contact name in execute_payment params by its public key; returns an error response if unknown."""
+        params = task_data["params"]
+        destination = (params.get("destination") or "").strip()
+        if STELLAR_PUBLIC_KEY_PATTERN.match(destination):
+            return None
+
+        index = await self._contacts_index(session_data)
+        contact = index.resolve(destination)
+        if not contact:
+            suggestion = index.suggest(destination)
+            if suggestion:
+                # Nome aproximado não vira destino de pagamento sem o usuário confirmar
                 return {
-                    "message": "Você precisa fazer login primeiro. Por favor, envie seu email para autenticar. Exemplo: 'fazer login com email@exemplo.com'",
+                    "message": f"Não encontrei o contato '{destination}'. Você quis dizer {describe_contact(suggestion)}? "
+                               f"Se sim, repita o pedido com o nome '{suggestion.get('contact_name')}'.",
                     "task": "clarification_needed",
-                    "params": {"requires_login": True}
+                    "params": {"contact_not_found": destination, "contact_suggestion": suggestion.get("contact_name")}
                 }
-        
-        context = ""
-        if task_type == "login":
-            return self._handle_login(query["query"], session_id)
-        
-        if task_type == "onboard_user":
-            return self._handle_onboard(task_data["params"]["email"])
-
-        elif task_type == "list_contacts":
-            session_token = session_data.get("sessionToken")
-            contacts = self.list_contacts_tool._run(session_token=session_token)
-            context = json.dumps(contacts)
-
-        if task_type == "execute_payment":
-            session_token = session_data.get("sessionToken")    
-
-            self.transaction_register = task_data 
-            self.secret_key_mode = True
-
             return {
-                "message": "Por favor, forneça sua chave secreta para autorizar o pagamento.",
+                "message": f"Não encontrei o contato '{destination}' na sua lista. Verifique o nome ou adicione o contato primeiro.",
                 "task": "clarification_needed",
-                "params": {"requires_secret_key": True}
+                "params": {"contact_not_found": destination}
             }
-        
-
-        return self.final_agent(task_type="list_contacts", context=context)
+        params["destination"] = contact.get("stellar_public_key")
+        params["contact_name"] = contact.get("contact_name")
+        return None
+
+    async def _resolve_batch(self, session_data: dict, task_data: dict):
+        """Resolve all recipients/assets of a batch with one contacts fetch; returns an error response or None."""
+        return await resolve_batch(task_data, lambda: self._contacts_index(session_data), self.asset_index)
+
+    def _resolve_asset_code(self, text: str):
+        """Asset code, name or alias -> canonical code, used by the fast path."""
+        asset = self.asset_index.resolve(text)
+        return asset.code if asset else None
+
+    def _resolve_asset_params(self, task_data: dict):
+        """Fill asset_code/issuer in execute_payment params from the AssetIndex; returns an error response if unknown."""
+        params = task_data["params"]
+        requested = params.get("asset") or params.get("assetCode") or params.get("issuer") or ""
+        asset = self.asset_index.resolve(requested)
+        if not asset:
+            return {
+                "message": f"Não reconheci o ativo '{requested}'. Ativos disponíveis: {self.asset_index.describe()}.",
+                "task": "clarification_needed",
+                "params": {"asset_not_found": requested}
+            }
+        params["asset_code"] = asset.code
+        params["issuer"] = asset.issuer or ""
+        return None
 
+    async def _final_answer(self, task_type: str, data, on_event=None) -> dict:
+        """
+        User-facing answer for an API result: a template when one fits (unless
+        FINAL_AGENT_MODE=llm), otherwise final_agent behind the LLM cache.
+        The message is also emitted as token events for streaming clients.
+        """
+        answer = None
+        if self.final_agent_mode != "llm":
+            answer = render_response(task_type, data)
+
+        if answer is None:
+            context = json.dumps(data) if data is not None else ""
+            cache_text = f"{task_type}\n{context}"
+            answer = self.llm_cache.get("final", cache_text)
+            if answer is None:
+                emit_event(on_event, "thinking")
+                with span("final_agent"):
+                    try:
+                        answer = await self.llm_flights.do(
+                            ("final", cache_text),
+                            lambda: self.executor.run(self.final_agent, task_type=task_type, context=context)
+                        )
+                    except ServerBusy as e:
+                        # A ação (pagamento, contato, login) já foi feita: o 503 não pode ser reenviado às cegas
+                        raise ServerBusy(str(e), processed=True) from e
+                self.llm_cache.put("final", cache_text, answer, task=task_type)
+
+        if on_event is not None and isinstance(answer, dict):
+            await emit_tokens(on_event, answer.get("message"))
+        return answer
 
     def final_agent(self, task_type: str, context: str) -> dict:
         """
         Final agent: takes API context and generates a user-facing answer in the same style as the first agent.
         """
-        agent = Agent(
-            role="Final Answer Generator",
-            goal="Use the context from the API call to generate a user-facing answer in Portuguese.",
-            backstory="You receive structured data from an API and must summarize or explain it to the user in a friendly, clear way.",
-            llm=self.llm,
-            verbose=True
-        )
         description = f"""
         You are given the result of an API call for the task: {task_type}.
         Context (JSON): {context}
@@ -350,25 +960,29 @@ class SimpleAgent:
         Respond ONLY with the answer, no markdown, no extra text.
 
         """
-        task = Task(
-            description=description,
-            agent=agent,
-            expected_output="A short answer in Portuguese.",
-        )
+        with self.agent_pool.acquire() as agents:
+            agent = agents["final"]
+            task = Task(
+                description=description,
+                agent=agent,
+                expected_output="A short answer in Portuguese.",
+            )
 
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
-        result = crew.kickoff()
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=True
+            )
+            with span("final_agent.kickoff") as attrs:
+                result = crew.kickoff()
+                record_tokens("final_agent", getattr(result, "token_usage", None), attrs)
         return {"message": str(result)}
     
-    def _handle_onboard(self, email: str):
+    async def _handle_onboard(self, email: str):
         """Handle user onboarding specifically"""
         # Executar onboarding
-        onboard_result = self.create_account_tool._run(email)
+        onboard_result = await self.create_account_tool._arun(email)
 
         if onboard_result.get("success"):
             USER_INFO["email"] = email
@@ -387,10 +1001,9 @@ class SimpleAgent:
             }
     
 
-    def _handle_login(self, query: str, session_id: str):
+    async def _handle_login(self, query: str, session_id: str):
         """Handle login task specifically"""
         # Extrair email da query
-        import re
         email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
         emails = re.findall(email_pattern, query)
         
@@ -405,23 +1018,27 @@ class SimpleAgent:
 
         
         # Executar login
-        login_result = self.login_tool._run(email)
+        login_result = await self.login_tool._arun(email)
 
         if login_result.get("success"):
             # Salvar token na sessão
-            SESSION_STORAGE[session_id] = {
+            await SESSION_STORAGE.aset(session_id, {
                 "sessionToken": login_result.get("sessionToken"),
                 "userId": login_result.get("userId"),
+                "publicKey": login_result.get("publicKey"),
                 "email": email
-            }
+            })
             
             # ✅ Atualizar USER_INFO com userId para operações que dependem dele
             USER_INFO["userId"] = login_result.get("userId")
             USER_INFO["email"] = email
 
-            session_token = SESSION_STORAGE[session_id].get("sessionToken")
-            contacts = self.list_contacts_tool._run(session_token=session_token)
-            json.dump(contacts["contacts"], open(f"contacts.json", "w"), indent=2)
+            # Contatos ficam no cache do usuário (nada de reescrever contacts.json)
+            session_token = login_result.get("sessionToken")
+            fetched_at = time.time()
+            contacts = await self.list_contacts_tool._arun(session_token=session_token)
+            if contacts.get("success"):
+                self.contacts_cache.put(login_result.get("userId"), contacts.get("contacts", []), fetched_at=fetched_at)
 
             return {
                 "message": f"Login realizado com sucesso! Bem-vindo, {email}",
@@ -0,0 +1,110 @@
+"""
+Single-flight: chamadas iguais em andamento viram uma só.
+
+Quando o usuário repete a mensagem ou o bot reenvia, o agente faria as mesmas
+chamadas à API Node e ao LLM em paralelo. `SingleFlight.do(key, fn)` executa
+`fn` só para a primeira chamada de cada chave; as que chegam enquanto ela roda
+esperam e recebem uma cópia do mesmo resultado (ou a mesma exceção). Nada fica
+guardado depois que a chamada termina: isso é papel dos caches.
+"""
+import asyncio
+import copy
+import functools
+import inspect
+import threading
+
+from tracing import SINGLE_FLIGHT
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._metrics = {"leaders": 0, "followers": 0}
+
+    async def do(self, key, fn):
+        """Await `fn()` once per key among concurrent callers on the same event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None or task.get_loop() is not loop
+            if leader:
+                task = loop.create_task(fn())
+                self._tasks[key] = task
+                task.add_done_callback(functools.partial(self._forget_task, key))
+            self._count("leaders" if leader else "followers")
+        # shield: quem desistiu (cliente caiu) não cancela a chamada dos outros
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def do_sync(self, key, fn):
+        """Blocking version of `do` for concurrent callers in different threads."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count("leaders" if leader else "followers")
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "inflight": len(self._tasks) + len(self._calls)}
+
+    def _forget_task(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def _count(self, role: str):
+        self._metrics[role] += 1
+        SINGLE_FLIGHT.inc(name=self.name, role=role[:-1])
+
+
+def single_flight(name: str):
+    """
+    Decorator for tool methods: concurrent calls with the same arguments
+    (excluding `self`) share one execution. Works for sync and async methods.
+    """
+    flight = SingleFlight(name)
+
+    def decorator(fn):
+        def key_for(args, kwargs):
+            return repr(args[1:]), repr(sorted(kwargs.items()))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await flight.do(key_for(args, kwargs), lambda: fn(*args, **kwargs))
+            async_wrapper.flight = flight
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flight.do_sync(key_for(args, kwargs), lambda: fn(*args, **kwargs))
+        wrapper.flight = flight
+        return wrapper
+    return decorator
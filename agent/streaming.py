@@ -0,0 +1,87 @@
+import asyncio
+import json
+import logging
+import os
+import re
+
+from bounded_executor import ServerBusy
+
+
+# Pausa entre os pedaços da resposta final; 0 envia tudo de uma vez
+TOKEN_DELAY_SECONDS = float(os.getenv("STREAM_TOKEN_DELAY_SECONDS", "0.02"))
+# Palavras por evento "token"
+TOKEN_CHUNK_WORDS = int(os.getenv("STREAM_TOKEN_CHUNK_WORDS", "3"))
+
+_WORD_PATTERN = re.compile(r"\S+\s*")
+
+
+def emit_event(on_event, event: str, **fields):
+    """Call the progress callback, if any, with {"event": event, **fields}."""
+    if on_event is None:
+        return
+    try:
+        on_event({"event": event, **fields})
+    except Exception as e:
+        # Um cliente que caiu não pode derrubar a requisição
+        logging.warning(f"Falha ao emitir evento '{event}': {e}")
+
+
+async def emit_tokens(on_event, text: str):
+    """
+    Emit the final message as "token" events of a few words each.
+
+    O crew.kickoff do CrewAI não expõe tokens incrementais, então a resposta do
+    final_agent (ou do template) é fatiada depois de pronta.
+    """
+    if not text:
+        return
+    words = _WORD_PATTERN.findall(text)
+    for start in range(0, len(words), TOKEN_CHUNK_WORDS):
+        emit_event(on_event, "token", text="".join(words[start:start + TOKEN_CHUNK_WORDS]))
+        if TOKEN_DELAY_SECONDS > 0:
+            await asyncio.sleep(TOKEN_DELAY_SECONDS)
+
+
+def ndjson_line(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def stream_query(crew, query: str, session_id: str, request_id: str = None):
+    """
+    Run `crew.aprocess_query` and yield its progress as NDJSON lines.
+
+    Eventos, um JSON por linha:
+      {"event": "intent", "task": ..., "source": "router"|"cache"|"llm"|"session"}
+      {"event": "thinking"}                 (vai chamar o LLM)
+      {"event": "api_call", "name": ...}
+      {"event": "token", "text": ...}       (pedaços da mensagem final)
+      {"event": "result", "result": {...}}  (igual ao corpo de /query)
+      {"event": "error", "status": 503|500, "detail": ...}
+    """
+    events = asyncio.Queue()
+    done = object()
+
+    async def run():
+        try:
+            result = await crew.aprocess_query(query, session_id, on_event=events.put_nowait, request_id=request_id)
+            events.put_nowait({"event": "result", "result": result})
+        except ServerBusy:
+            events.put_nowait({"event": "error", "status": 503, "detail": "Agent is busy, try again shortly"})
+        except Exception as e:
+            logging.error(f"Erro no streaming da query para session_id='{session_id}': {e}")
+            events.put_nowait({"event": "error", "status": 500, "detail": str(e)})
+        finally:
+            events.put_nowait(done)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is done:
+                break
+            yield ndjson_line(event)
+    finally:
+        # Cliente desconectou no meio: o processamento segue até o fim (pode
+        # ser um pagamento), só não há mais para quem enviar os eventos
+        if not task.done():
+            task.add_done_callback(lambda t: t.exception() if not t.cancelled() else None)
@@ -0,0 +1,234 @@
+"""
+Esquemas tipados da saída do task mapper.
+
+O mapper devolve um JSON {"message", "task", "params"}. `parse_task_response`
+lê esse JSON direto do texto do crew (sem passar por arquivo), conserta os
+defeitos comuns de saída de LLM (cercas de markdown, texto antes/depois,
+aspas simples, vírgula sobrando) e valida `params` com o modelo Pydantic da
+tarefa. Quando não dá para aproveitar, devolve um clarification_needed.
+
+`task_json_schema` gera, a partir dos mesmos modelos, o JSON Schema estrito
+usado na saída estruturada nativa do mapper em camadas (model_tiers.py).
+"""
+import ast
+import json
+import re
+from typing import Annotated, List, Optional, get_args, get_origin
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError
+
+from amounts import parse_amount
+
+
+def amount_as_text(value) -> str:
+    # O LLM às vezes manda número e às vezes "10,5"; "1,000" (mil ou um?) não passa na validação
+    if value is None or str(value).strip() == "":
+        return ""
+    if isinstance(value, float):
+        value = format(value, ".7f").rstrip("0").rstrip(".")
+    return parse_amount(value)
+
+
+Amount = Annotated[str, BeforeValidator(amount_as_text)]
+
+
+class TaskParams(BaseModel):
+    # Campos extras do LLM são descartados em vez de falhar
+    model_config = ConfigDict(extra="ignore")
+
+
+class EmailParams(TaskParams):
+    email: str
+
+
+class AddContactParams(TaskParams):
+    contact_name: str
+    public_key: str
+
+
+class LookupContactParams(TaskParams):
+    contactName: str
+
+
+class ExecutePaymentParams(TaskParams):
+    destination: str
+    amount: Amount
+    asset: str = ""
+    memo: str = ""
+
+
+class BatchPaymentItem(TaskParams):
+    destination: str
+    amount: Amount
+    asset: str = ""
+
+
+class ExecuteBatchPaymentParams(TaskParams):
+    payments: List[BatchPaymentItem] = Field(min_length=1)
+    memo: str = ""
+
+
+class ExecutePathPaymentParams(TaskParams):
+    destination: str
+    destAsset: str
+    destAmount: Amount
+    sourceAsset: str = ""
+
+
+class PixDepositParams(TaskParams):
+    amount: Amount
+    assetCode: str = ""
+
+
+class ClarificationParams(TaskParams):
+    message: Optional[str] = None
+
+
+TASK_PARAMS = {
+    "login": EmailParams,
+    "onboard_user": EmailParams,
+    "add_contact": AddContactParams,
+    "list_contacts": TaskParams,
+    "lookup_contact": LookupContactParams,
+    "get_account_balance": TaskParams,
+    "get_operations_history": TaskParams,
+    "execute_payment": ExecutePaymentParams,
+    "execute_batch_payment": ExecuteBatchPaymentParams,
+    "execute_path_payment": ExecutePathPaymentParams,
+    "initiate_pix_deposit": PixDepositParams,
+    "clarification_needed": ClarificationParams,
+}
+
+
+class TaskResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    message: str = ""
+    task: str
+    params: dict = {}
+
+
+class TaskParseError(ValueError):
+    """The mapper output could not be turned into a valid TaskResponse."""
+
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+def _extract_object(text: str) -> str:
+    """First balanced {...} block in text (strings are respected)."""
+    start = text.find("{")
+    if start < 0:
+        raise TaskParseError("no JSON object in mapper output")
+    depth = 0
+    quote = None
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    raise TaskParseError("unbalanced JSON object in mapper output")
+
+
+def repair_json(text: str) -> dict:
+    """Best-effort parse of slightly malformed LLM JSON."""
+    fenced = FENCE_PATTERN.search(text)
+    candidate = _extract_object(fenced.group(1) if fenced else text)
+    candidate = TRAILING_COMMA_PATTERN.sub(r"\1", candidate)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    # Aspas simples e True/False/None no estilo Python
+    try:
+        value = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError):
+        raise TaskParseError("mapper output is not valid JSON")
+    if not isinstance(value, dict):
+        raise TaskParseError("mapper output is not a JSON object")
+    return value
+
+
+def _strict_object(model) -> dict:
+    # Saída estruturada estrita: todo campo é obrigatório (opcionais aceitam "" ou null)
+    properties = {}
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is list:
+            properties[name] = {"type": "array", "items": _strict_object(get_args(annotation)[0])}
+        elif type(None) in get_args(annotation):
+            properties[name] = {"type": ["string", "null"]}
+        else:
+            properties[name] = {"type": "string"}
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def task_json_schema() -> dict:
+    """Strict JSON Schema of TaskResponse: `task` is an enum and `params` any of the task models."""
+    models = list(dict.fromkeys(TASK_PARAMS.values()))
+    return {
+        "type": "object",
+        "properties": {
+            "message": {"type": "string"},
+            "task": {"type": "string", "enum": list(TASK_PARAMS)},
+            "params": {"anyOf": [_strict_object(model) for model in models]},
+        },
+        "required": ["message", "task", "params"],
+        "additionalProperties": False,
+    }
+
+
+def missing_params(task: dict) -> list:
+    """Required params of a validated task that came back empty (e.g. a payment without amount)."""
+    params_model = TASK_PARAMS.get(task.get("task"), TaskParams)
+    return [name for name, field in params_model.model_fields.items()
+            if field.is_required() and task["params"].get(name) in ("", None, [])]
+
+
+def validate_task(data: dict) -> dict:
+    """Validate a task dict against its schema; returns the normalized dict."""
+    response = TaskResponse.model_validate(data)
+    params_model = TASK_PARAMS.get(response.task)
+    if params_model is None:
+        raise TaskParseError(f"unknown task '{response.task}'")
+    params = params_model.model_validate(response.params or {}).model_dump(exclude_none=True)
+    return {"message": response.message, "task": response.task, "params": params}
+
+
+def clarification(reason: str) -> dict:
+    """clarification_needed asking the user to rephrase; `parse_error` says why the mapper output was unusable."""
+    return {
+        "message": "Não entendi bem o pedido. Pode reformular?",
+        "task": "clarification_needed",
+        "params": {"message": "Não entendi bem o pedido. Pode reformular?", "parse_error": reason},
+    }
+
+
+def parse_task_response(text: str) -> dict:
+    """
+    Task dict from the raw mapper output: fast `json.loads`, then the repair
+    step, then schema validation. Falls back to clarification_needed.
+    """
+    text = (text or "").strip()
+    try:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = repair_json(text)
+        return validate_task(data)
+    except (TaskParseError, ValidationError) as e:
+        return clarification(str(e).splitlines()[0])
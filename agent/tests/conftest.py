@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do agente são importados pelo nome (como em simple.py), a partir de agent/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
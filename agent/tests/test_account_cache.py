@@ -0,0 +1,137 @@
+import asyncio
+
+from account_cache import AccountCache
+
+
+def op(op_id, created_at, status="COMPLETED", amount="10"):
+    return {"id": op_id, "created_at": created_at, "status": status, "amount": amount, "type": "PAYMENT"}
+
+
+class FakeHistoryApi:
+    """Backend de histórico em memória: devolve as operações com created_at >= since."""
+
+    def __init__(self, *operations):
+        self.operations = {operation["id"]: operation for operation in operations}
+        self.calls = []
+
+    def put(self, operation):
+        self.operations[operation["id"]] = operation
+
+    async def fetch(self, since=None):
+        self.calls.append(since)
+        history = [operation for operation in self.operations.values() if since is None or operation["created_at"] >= since]
+        return {"success": True, "history": sorted(history, key=lambda operation: operation["created_at"], reverse=True)}
+
+
+def history(cache, api, user_id="u1"):
+    return asyncio.run(cache.history(user_id, api.fetch))["history"]
+
+
+def statuses(items):
+    return {item["id"]: item["status"] for item in items}
+
+
+def test_history_is_cached_until_the_ttl():
+    api = FakeHistoryApi(op(1, "2024-01-01"))
+    cache = AccountCache(ttl_seconds=60)
+    assert history(cache, api) == history(cache, api)
+    assert api.calls == [None]
+    assert cache.stats()["hits"] == 1
+
+
+def test_incremental_fetch_merges_new_operations():
+    api = FakeHistoryApi(op(1, "2024-01-01"), op(2, "2024-01-02"))
+    cache = AccountCache(ttl_seconds=60)
+    history(cache, api)
+    api.put(op(3, "2024-01-03"))
+    cache.invalidate("u1")
+    assert [item["id"] for item in history(cache, api)] == [3, 2, 1]
+    assert api.calls == [None, "2024-01-02"]
+
+
+def test_pending_operation_is_refreshed_after_invalidate():
+    api = FakeHistoryApi(op(1, "2024-01-01"), op(2, "2024-01-02", status="PENDING"), op(3, "2024-01-03"))
+    cache = AccountCache(ttl_seconds=60)
+    assert statuses(history(cache, api))[2] == "PENDING"
+
+    api.put(op(2, "2024-01-02", status="COMPLETED"))
+    cache.invalidate("u1")
+    items = history(cache, api)
+    assert statuses(items) == {1: "COMPLETED", 2: "COMPLETED", 3: "COMPLETED"}
+    assert len(items) == 3
+    # O cursor voltou até a operação pendente mais antiga, não ao created_at mais recente
+    assert api.calls == [None, "2024-01-02"]
+
+    # Sem pendentes, o cursor volta a ser o mais recente
+    cache.invalidate("u1")
+    history(cache, api)
+    assert api.calls[-1] == "2024-01-03"
+
+
+def test_refetched_rows_replace_cached_ones():
+    api = FakeHistoryApi(op(1, "2024-01-01"), op(2, "2024-01-02", status="PENDING"))
+    cache = AccountCache(ttl_seconds=60)
+    history(cache, api)
+    api.put(op(2, "2024-01-02", status="FAILED"))
+    cache.invalidate("u1")
+    assert statuses(history(cache, api))[2] == "FAILED"
+
+
+def test_periodic_full_refresh_updates_operations_older_than_the_cursor():
+    api = FakeHistoryApi(op(1, "2024-01-01"), op(2, "2024-01-02"))
+    cache = AccountCache(ttl_seconds=-1, full_refresh_seconds=0)
+    history(cache, api)
+    # Mudou uma operação antiga, fora do alcance do cursor
+    api.put(op(1, "2024-01-01", status="FAILED"))
+    assert statuses(history(cache, api))[1] == "FAILED"
+    assert api.calls == [None, None]
+    assert cache.stats()["full_refreshes"] == 1
+
+
+def test_history_respects_max_history():
+    api = FakeHistoryApi(*(op(index, f"2024-01-{index:02d}") for index in range(1, 6)))
+    cache = AccountCache(ttl_seconds=60, max_history=3)
+    assert [item["id"] for item in history(cache, api)] == [5, 4, 3]
+
+
+def test_failed_fetch_is_not_cached():
+    calls = []
+
+    async def fetch(since=None):
+        calls.append(since)
+        return {"success": False, "message": "api down"}
+
+    cache = AccountCache(ttl_seconds=60)
+    assert asyncio.run(cache.history("u1", fetch))["success"] is False
+    assert asyncio.run(cache.history("u1", fetch))["success"] is False
+    assert calls == [None, None]
+
+
+def test_balances_cache_and_invalidate():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"success": True, "balances": [{"balance": str(len(calls))}]}
+
+    cache = AccountCache(ttl_seconds=60)
+    first = asyncio.run(cache.balances("u1", fetch))
+    assert asyncio.run(cache.balances("u1", fetch)) == first
+    cache.invalidate("u1")
+    assert asyncio.run(cache.balances("u1", fetch))["balances"] == [{"balance": "2"}]
+    assert len(calls) == 2
+
+
+def test_fetch_started_before_invalidate_is_not_cached():
+    cache = AccountCache(ttl_seconds=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        # Um pagamento termina enquanto a busca está em andamento
+        cache.invalidate("u1")
+        return {"success": True, "balances": []}
+
+    asyncio.run(cache.balances("u1", fetch))
+    asyncio.run(cache.balances("u1", fetch))
+    assert len(calls) == 2
@@ -0,0 +1,47 @@
+import sys
+import time
+import types
+
+import pytest
+
+from agent_loader import AgentLoader, AgentNotReady
+
+
+class FakeAgent:
+    def warm_up(self):
+        pass
+
+
+def fake_simple(monkeypatch, agent_class):
+    module = types.ModuleType("simple")
+    module.SimpleAgent = agent_class
+    monkeypatch.setitem(sys.modules, "simple", module)
+
+
+def test_get_returns_the_loaded_agent(monkeypatch):
+    fake_simple(monkeypatch, FakeAgent)
+    loader = AgentLoader()
+    loader.start_background_load().join(5)
+    assert isinstance(loader.get(timeout=1), FakeAgent)
+    assert loader.loaded
+
+
+def test_get_fails_fast_after_a_failed_load(monkeypatch):
+    def broken():
+        raise RuntimeError("no OPENAI_API_KEY")
+
+    fake_simple(monkeypatch, broken)
+    loader = AgentLoader()
+    loader.start_background_load().join(5)
+
+    started = time.perf_counter()
+    with pytest.raises(AgentNotReady, match="no OPENAI_API_KEY"):
+        loader.get(timeout=30)
+    assert time.perf_counter() - started < 1
+    assert loader.status()["load_error"] == "no OPENAI_API_KEY"
+
+
+def test_get_times_out_while_loading():
+    loader = AgentLoader()
+    with pytest.raises(AgentNotReady, match="still loading"):
+        loader.get(timeout=0.01)
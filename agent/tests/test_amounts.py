@@ -0,0 +1,30 @@
+import pytest
+
+from amounts import AmbiguousAmountError, parse_amount
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("10", "10"),
+    ("10,5", "10.5"),
+    ("10.5", "10.5"),
+    ("0,125", "0.125"),
+    ("0.1234567", "0.1234567"),
+    ("1.000,50", "1000.50"),
+    ("1,000.50", "1000.50"),
+    ("1.000.000", "1000000"),
+    ("12,3456", "12.3456"),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1,000", "1.000", "10.500", "250,000"])
+def test_thousands_or_decimal_is_ambiguous(text):
+    with pytest.raises(AmbiguousAmountError):
+        parse_amount(text)
+
+
+@pytest.mark.parametrize("text", ["1.000,5.0", "1,00.50", "10,00,0", "abc", "", "1.0000.000"])
+def test_invalid_amounts(text):
+    with pytest.raises(ValueError):
+        parse_amount(text)
@@ -0,0 +1,48 @@
+import pytest
+
+from asset_index import AssetIndex, load_asset_index
+
+ISSUERS = {
+    "USDC": {"issuer": "GA5ZSEJYB37JRC5AVCIA5MOP4RHTM335X2KGX3IHOJAPP5RE34K4KZVN", "name": "USD Coin"},
+    "EURC": {"issuer": "GDHU6WRG4IEQXM5NZ4BMPKOXHW76MZM4Y2IEMFDVXBSDP6SJY4ITNPP2", "name": "Euro Coin"},
+    "BRLC": {"issuer": "GDHU6WRG4IEQXM5NZ4BMPKOXHW76MZM4Y2IEMFDVXBSDP6SJY4ITNPP2", "name": "Brazilian Real Coin"},
+}
+
+
+@pytest.fixture
+def index():
+    return AssetIndex(ISSUERS)
+
+
+@pytest.mark.parametrize("text, code", [
+    ("USDC", "USDC"),
+    ("usdc", "USDC"),
+    ("USD Coin", "USDC"),
+    ("dólares", "USDC"),
+    ("reais", "BRLC"),
+    ("euro", "EURC"),
+    ("xlm", "XLM"),
+    ("lumens", "XLM"),
+    ("GA5ZSEJYB37JRC5AVCIA5MOP4RHTM335X2KGX3IHOJAPP5RE34K4KZVN", "USDC"),
+])
+def test_resolve_exact_code_name_alias_or_issuer(index, text, code):
+    assert index.resolve(text).code == code
+
+
+@pytest.mark.parametrize("text", ["usdt", "us", "eu", "usd", "usdcc", "btc", "", None])
+def test_resolve_never_swaps_the_asset(index, text):
+    assert index.resolve(text) is None
+
+
+def test_shared_issuer_is_ambiguous(index):
+    assert index.resolve("GDHU6WRG4IEQXM5NZ4BMPKOXHW76MZM4Y2IEMFDVXBSDP6SJY4ITNPP2") is None
+
+
+def test_native_asset_has_no_issuer(index):
+    assert index.resolve("XLM").is_native
+
+
+def test_bundled_issuers_load():
+    index = load_asset_index()
+    assert index.resolve("USDC").issuer
+    assert "XLM (Stellar Lumens)" in index.describe()
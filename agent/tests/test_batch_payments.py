@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from asset_index import AssetIndex
+from contacts_cache import ContactIndex
+from payments import execute_batch, idempotent_payment, replay_status, resolve_batch, secret_key_prompt
+from responses import render_execute_batch_payment
+from session_store import MemorySessionStore
+
+USDC_ISSUER = "GA5ZSEJYB37JRC5AVCIA5MOP4RHTM335X2KGX3IHOJAPP5RE34K4KZVN"
+GPAULO = "GPAULO" + "A" * 50
+GBOB = "GBOB" + "B" * 52
+GRAW = "GRAW" + "C" * 52
+
+ASSETS = AssetIndex({"USDC": {"issuer": USDC_ISSUER, "name": "USD Coin"}})
+CONTACTS = ContactIndex([
+    {"contact_name": "Paulo", "stellar_public_key": GPAULO},
+    {"contact_name": "Bob", "stellar_public_key": GBOB},
+])
+
+
+def batch(*payments, memo=""):
+    return {"task": "execute_batch_payment", "id": "tx1", "params": {"payments": [dict(p) for p in payments], "memo": memo}}
+
+
+def resolve(task_data):
+    loads = []
+
+    async def load_contacts():
+        loads.append(1)
+        return CONTACTS
+
+    error = asyncio.run(resolve_batch(task_data, load_contacts, ASSETS))
+    return error, loads
+
+
+def test_resolves_every_recipient_and_asset_with_one_contacts_fetch():
+    task_data = batch(
+        {"destination": "Paulo", "amount": "50", "asset": "dolar"},
+        {"destination": "bob", "amount": "30", "asset": "USDC"},
+        {"destination": GRAW, "amount": "5", "asset": "xlm"},
+    )
+    error, loads = resolve(task_data)
+    assert error is None
+    assert loads == [1]
+    assert [(p["destination"], p.get("contact_name"), p["asset_code"], p["issuer"]) for p in task_data["params"]["payments"]] == [
+        (GPAULO, "Paulo", "USDC", USDC_ISSUER),
+        (GBOB, "Bob", "USDC", USDC_ISSUER),
+        (GRAW, None, "XLM", ""),
+    ]
+
+
+def test_public_keys_only_skip_the_contacts_fetch():
+    error, loads = resolve(batch({"destination": GRAW, "amount": "5", "asset": "XLM"}))
+    assert error is None and loads == []
+
+
+def test_unknown_recipients_are_reported_together():
+    error, _ = resolve(batch(
+        {"destination": "Pau", "amount": "50", "asset": "USDC"},
+        {"destination": "Bob", "amount": "30", "asset": "USDC"},
+        {"destination": "Maria", "amount": "10", "asset": "USDC"},
+    ))
+    assert error["params"]["contact_not_found"] == ["Pau", "Maria"]
+    assert "Maria" in error["message"] and "Pau" in error["message"]
+
+
+def test_unknown_asset_is_reported():
+    error, _ = resolve(batch({"destination": "Bob", "amount": "30", "asset": "usdt"}))
+    assert error["params"] == {"asset_not_found": "usdt"}
+
+
+def test_whole_batch_asks_for_the_secret_key_once():
+    task_data = batch(
+        {"destination": "Paulo", "amount": "50", "asset": "USDC"},
+        {"destination": "Bob", "amount": "30", "asset": "USDC"},
+        memo="almoço",
+    )
+    resolve(task_data)
+    prompt = secret_key_prompt(task_data)
+    assert prompt["params"] == {"requires_secret_key": True}
+    assert prompt["message"].count("chave secreta") == 1
+    assert f"50 USDC para Paulo ({GPAULO})" in prompt["message"]
+    assert f"30 USDC para Bob ({GBOB})" in prompt["message"]
+    assert "Memo: almoço" in prompt["message"]
+
+
+def resolved_payments():
+    task_data = batch(
+        {"destination": "Paulo", "amount": "50", "asset": "USDC"},
+        {"destination": "Bob", "amount": "30", "asset": "USDC"},
+        {"destination": GRAW, "amount": "5", "asset": "XLM"},
+    )
+    resolve(task_data)
+    return task_data["params"]["payments"]
+
+
+def test_partial_failure_keeps_paying_and_is_reported():
+    calls = []
+
+    async def pay(index, payment):
+        calls.append((index, payment["destination"]))
+        if payment["destination"] == GBOB:
+            return {"success": False, "message": "saldo insuficiente"}
+        return {"success": True, "hash": f"h{index}"}
+
+    result = asyncio.run(execute_batch(resolved_payments(), pay))
+    assert calls == [(0, GPAULO), (1, GBOB), (2, GRAW)]
+    assert result["success"] is False
+    assert [item["result"]["success"] for item in result["results"]] == [True, False, True]
+
+    message = render_execute_batch_payment({"result": result})
+    assert message.startswith("2 de 3 pagamentos enviados.")
+    assert "❌ 30 USDC para Bob: saldo insuficiente" in message
+    assert "✅ 50 USDC para Paulo (hash h0)" in message
+
+
+def test_batch_is_replayed_not_paid_again():
+    store = MemorySessionStore(ttl_seconds=60)
+    store.set("s1", {"sessionToken": "t1", "userId": "u1"})
+    payments = resolved_payments()
+    submitted = []
+
+    async def pay(index, payment):
+        # Cada item tem a sua chave de idempotência, derivada da do lote
+        async def submit():
+            submitted.append(index)
+            return {"success": index != 1, "hash": f"h{index}"}
+        return await idempotent_payment(store, "t1", f"tx1:{index}", submit)
+
+    async def main():
+        first = await idempotent_payment(store, "t1", "tx1", lambda: execute_batch(payments, pay))
+        again = await idempotent_payment(store, "t1", "tx1", lambda: execute_batch(payments, pay))
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert again == first
+    assert submitted == [0, 1, 2]
+    # Lote com parte enviada: a chave reenviada recebe o resultado, não um pedido para pagar tudo de novo
+    store.update("s1", last_payment={"transaction": batch(*payments), "at": 1000.0})
+    assert replay_status(store.get("s1"), window_seconds=600, now=1010.0)[0] == "done"
+
+
+def test_items_already_paid_are_not_paid_again_when_the_batch_is_retried():
+    # O lote caiu no meio (worker reiniciou): os itens já enviados voltam do store
+    store = MemorySessionStore(ttl_seconds=60)
+    store.set("s1", {"sessionToken": "t1"})
+    payments = resolved_payments()
+    submitted = []
+
+    def pay_with(crash_at):
+        async def pay(index, payment):
+            async def submit():
+                if index == crash_at:
+                    raise RuntimeError("worker caiu")
+                submitted.append(index)
+                return {"success": True}
+            return await idempotent_payment(store, "t1", f"tx1:{index}", submit)
+        return pay
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(execute_batch(payments, pay_with(crash_at=1)))
+    result = asyncio.run(execute_batch(payments, pay_with(crash_at=None)))
+    assert submitted == [0, 1, 2]
+    assert result["success"] is True
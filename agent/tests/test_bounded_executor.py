@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+import pytest
+
+from bounded_executor import REJECTED_HEADER, BoundedExecutor, ServerBusy, unavailable_headers
+
+
+def test_full_queue_rejects_fast():
+    executor = BoundedExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ServerBusy) as busy:
+            await executor.run(lambda: None)
+        release.set()
+        await running
+        return busy.value
+
+    try:
+        assert asyncio.run(main()).processed is False
+    finally:
+        executor.shutdown()
+
+
+def test_only_unprocessed_rejections_can_be_retried():
+    assert unavailable_headers(1) == {"Retry-After": "1", REJECTED_HEADER: "before-processing"}
+    # Recusa depois do pagamento/contato: o cliente não pode reenviar
+    assert unavailable_headers(1, processed=True) == {"Retry-After": "1"}
+    assert ServerBusy("full", processed=True).processed is True
@@ -0,0 +1,86 @@
+import pytest
+
+from contacts_cache import ContactIndex, ContactsCache
+from responses import describe_batch, describe_payment
+
+BOB = {"contact_name": "Bob", "stellar_public_key": "GBOB"}
+ANNA = {"contact_name": "Anna", "stellar_public_key": "GANNA"}
+PAULO = {"contact_name": "Paulo Silva", "stellar_public_key": "GPAULO"}
+JOAO = {"contact_name": "João", "stellar_public_key": "GJOAO"}
+
+
+@pytest.fixture
+def index():
+    return ContactIndex([BOB, ANNA, PAULO, JOAO])
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Bob", BOB),
+    ("bob", BOB),
+    (" ANNA ", ANNA),
+    ("joao", JOAO),
+    ("Paulo Silva", PAULO),
+])
+def test_resolve_exact_names(index, name, expected):
+    assert index.resolve(name) == expected
+
+
+@pytest.mark.parametrize("name", ["Bobby", "bo", "Ana", "Paul", "Pualo Silva", "", "Maria"])
+def test_resolve_never_guesses(index, name):
+    assert index.resolve(name) is None
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Paul", PAULO),
+    ("Pualo Silva", PAULO),
+    ("Ana", ANNA),
+])
+def test_suggest_close_names(index, name, expected):
+    assert index.suggest(name) == expected
+
+
+@pytest.mark.parametrize("name", ["bo", "Bobby", "Maria", "Bob", ""])
+def test_suggest_without_a_confident_candidate(index, name):
+    # "bo" é curto demais, "Bobby" não é prefixo de ninguém e "Bob" já é exato
+    assert index.suggest(name) is None
+
+
+def test_suggest_requires_unique_prefix():
+    index = ContactIndex([{"contact_name": "Paulo"}, {"contact_name": "Paula"}])
+    assert index.suggest("Paul") is None
+
+
+def test_suggest_ignores_short_candidates():
+    index = ContactIndex([{"contact_name": "Al"}, {"contact_name": "Bob"}])
+    assert index.suggest("Alberto") is None
+
+
+def test_payment_prompts_show_recipient_key_amount_and_asset():
+    payment = {"destination": "GBOB", "contact_name": "Bob", "amount": "10", "asset_code": "USDC", "memo": "aluguel"}
+    assert describe_payment(payment) == "Pagamento: 10 USDC para Bob (GBOB)\nMemo: aluguel"
+    batch = describe_batch({"payments": [payment, {"destination": "GXYZ", "amount": "5", "asset_code": "XLM"}]})
+    assert batch == "Pagamentos em lote (2):\n- 10 USDC para Bob (GBOB)\n- 5 XLM para GXYZ"
+
+
+def test_cache_ttl_and_invalidation():
+    cache = ContactsCache(ttl_seconds=60)
+    assert cache.get("u1") is None
+    cache.put("u1", [BOB])
+    assert cache.get("u1").resolve("bob") == BOB
+    cache.invalidate("u1")
+    assert cache.get("u1") is None
+
+    expired = ContactsCache(ttl_seconds=-1)
+    expired.put("u1", [BOB])
+    assert expired.get("u1") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "invalidations": 1, "users": 0}
+
+
+def test_lists_fetched_before_a_shared_change_are_misses():
+    # add_contact em outro worker marcou contacts_changed_at depois desta busca
+    cache = ContactsCache(ttl_seconds=60)
+    cache.put("u1", [BOB], fetched_at=100.0)
+    assert cache.get("u1", changed_at=50.0).resolve("bob") == BOB
+    assert cache.get("u1", changed_at=150.0) is None
+    cache.put("u1", [BOB, ANNA], fetched_at=200.0)
+    assert cache.get("u1", changed_at=150.0).resolve("anna") == ANNA
@@ -0,0 +1,103 @@
+import pytest
+
+from intent_router import IntentRouter
+
+ASSETS = {"usdc": "USDC", "xlm": "XLM", "brlc": "BRLC"}
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(asset_resolver=lambda text: ASSETS.get(text.lower()), threshold=0.8)
+
+
+def test_single_payment(router):
+    result = router.route("manda 10,5 USDC pro Bob")
+    assert result.task == "execute_payment"
+    assert result.params == {"destination": "Bob", "amount": "10.5", "asset": "USDC", "memo": ""}
+
+
+def test_grouped_amount_with_decimals(router):
+    assert router.route("send 1,000.50 USDC to Bob").params["amount"] == "1000.50"
+
+
+@pytest.mark.parametrize("query", ["send 1,000 USDC to Bob", "manda 1.000 USDC pro Bob"])
+def test_ambiguous_thousands_fall_back_to_llm(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "nao quero mandar 10 xlm pro bob",
+    "mandei 20 USDC pro Bob ontem?",
+    "quanto mandei 10 xlm pro bob",
+    "posso mandar 10 xlm pro bob?",
+    "don't send 10 xlm to bob",
+])
+def test_negations_questions_and_past_tense_are_not_orders(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize("query, destination", [
+    ("pay 10 usdc to bob@gmail.com", "bob@gmail.com"),
+    ("manda 50 xlm pro Bob.", "Bob"),
+    ("manda 50 xlm pro Bob, valeu", "Bob"),
+    ("send 5 XLM to GAW7MQA7YLQLJZF7GD6M7JZWQCB4EGPPC46YSZAXQ7Z5LKLKNYFFOIGU", "GAW7MQA7YLQLJZF7GD6M7JZWQCB4EGPPC46YSZAXQ7Z5LKLKNYFFOIGU"),
+])
+def test_destination_is_a_whole_token(router, query, destination):
+    assert router.route(query).params["destination"] == destination
+
+
+@pytest.mark.parametrize("query", [
+    "manda 10 xlm para o bob do trabalho",
+    "manda 10 xlm pra meu irmão",
+    "manda 10 xlm pra conta do bob",
+    "manda 10 xlm pra Maria Silva",
+    "manda 10 xlm pro bob e pro ana",
+    "send 10 xlm to bob and alice",
+    "manda 10 xlm pro bob, ana e carlos",
+    "send 10 xlm to bob or alice",
+    "manda 10 xlm pro bob ou ana",
+])
+def test_anything_but_a_memo_after_the_destination_falls_back_to_llm(router, query):
+    # Um token só não é o destinatário inteiro: o pagamento iria para a pessoa errada
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize("query, memo", [
+    ("mande 25 usdc pro Paulo com a nota 'aluguel'", "aluguel"),
+    ('send 5 xlm to Paulo with memo "rent".', "rent"),
+    ("manda 10 xlm pro Paulo, memo 'almoço' valeu", "almoço"),
+])
+def test_memo_after_the_destination_is_kept(router, query, memo):
+    result = router.route(query)
+    assert (result.params["destination"], result.params["memo"]) == ("Paulo", memo)
+
+
+def test_unknown_asset_is_not_routed(router):
+    assert router.route("manda 10 USDT pro Bob") is None
+
+
+def test_batch_payment_carries_asset_forward(router):
+    result = router.route("paga 50 USDC pro Paulo e 30 pro Bob")
+    assert result.task == "execute_batch_payment"
+    assert result.params["payments"] == [
+        {"destination": "Paulo", "amount": "50", "asset": "USDC"},
+        {"destination": "Bob", "amount": "30", "asset": "USDC"},
+    ]
+
+
+def test_batch_with_ambiguous_amount_is_not_routed(router):
+    assert router.route("paga 1.000 USDC pro Paulo e 30 pro Bob") is None
+
+
+@pytest.mark.parametrize("query", [
+    "paga 50 USDC pro Paulo do trabalho e 30 pro Bob",
+    "paga 50 USDC pro Paulo e 30 pro Bob e ana",
+])
+def test_batch_with_extra_words_after_a_destination_is_not_routed(router, query):
+    assert router.route(query) is None
+
+
+def test_login_extracts_email(router):
+    result = router.route("fazer login com maria@example.com")
+    assert result.task == "login"
+    assert result.params == {"email": "maria@example.com"}
@@ -0,0 +1,55 @@
+from llm_cache import LLMCache, cache_key_text
+
+SECRET = "S" + "A" * 55
+
+
+def make_cache(**options):
+    return LLMCache(max_entries=options.pop("max_entries", 10), default_ttl=60, semantic=False, **options)
+
+
+def test_cache_key_text_normalizes():
+    assert cache_key_text("Listar meus CONTATOS!") == cache_key_text("listar meus contatos")
+    assert cache_key_text("Saldo, por favor?") == "saldo por favor"
+    assert cache_key_text("login com ana@mail.com") == "login com ana@mail.com"
+
+
+def test_mapper_hits_ignore_case_and_punctuation():
+    cache = make_cache()
+    cache.put("mapper", "Listar meus contatos!", {"task": "list_contacts", "params": {}}, task="list_contacts")
+    assert cache.get("mapper", "listar meus contatos") == {"task": "list_contacts", "params": {}}
+    assert cache.get("final", "listar meus contatos") is None
+
+
+def test_hits_are_copies():
+    cache = make_cache()
+    cache.put("mapper", "saldo", {"task": "x", "params": {}}, task="list_contacts")
+    cache.get("mapper", "saldo")["params"]["changed"] = True
+    assert cache.get("mapper", "saldo") == {"task": "x", "params": {}}
+
+
+def test_task_ttls():
+    cache = make_cache()
+    cache.put("mapper", "não entendi", {"task": "clarification_needed"}, task="clarification_needed")
+    cache.put("final", "execute_payment\n{}", {"message": "ok"}, task="execute_payment")
+    assert cache.get("mapper", "não entendi") is None
+    assert cache.get("final", "execute_payment\n{}") is None
+    assert cache.stats()["stores"] == 0
+
+
+def test_secret_keys_are_never_cached():
+    cache = make_cache()
+    cache.put("mapper", f"pagar com {SECRET}", {"task": "x"}, task="list_contacts")
+    cache.put("mapper", "pagar", {"task": "x", "params": {"secretKey": SECRET}}, task="list_contacts")
+    assert cache.get("mapper", "pagar") is None
+    assert cache.stats()["stores"] == 0
+
+
+def test_lru_eviction_and_stats():
+    cache = make_cache(max_entries=2)
+    for text in ["a", "b", "c"]:
+        cache.put("mapper", text, {"task": text}, task="list_contacts")
+    assert cache.get("mapper", "a") is None
+    assert cache.get("mapper", "c") == {"task": "c"}
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["exact_hits"], stats["misses"]) == (2, 1, 1, 1)
+    assert stats["hit_rate"] == 0.5
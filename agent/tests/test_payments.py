@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import pytest
+
+from payments import idempotent_payment, is_stale_sequence, payment_not_completed, replay_status, submit_xdr
+from session_store import MemorySessionStore
+
+SUBMIT_URL = "http://api/api/actions/sign-and-submit-xdr"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeClient:
+    """Answers each POST with the next queued response and records the payloads."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    async def post(self, url, headers=None, json=None):
+        self.posts.append(json)
+        return self.responses.pop(0)
+
+
+def sign_payload(xdr):
+    return {"secretKey": "S...", "unsignedXdr": xdr}
+
+
+def submit(client, rebuild=None, xdr="XDR-1"):
+    return asyncio.run(submit_xdr(client, SUBMIT_URL, {}, sign_payload, xdr, rebuild=rebuild))
+
+
+def rebuilder(calls, xdr="XDR-2"):
+    async def rebuild():
+        calls.append(1)
+        return xdr
+    return rebuild
+
+
+STALE = FakeResponse(400, {"success": False, "error": "Transaction failed: tx_bad_seq"})
+BAD_AUTH = FakeResponse(400, {"success": False, "error": "Transaction failed: tx_bad_auth"})
+TIMEOUT = FakeResponse(400, {"success": False, "error": "Horizon timeout (504)"})
+PAID = FakeResponse(200, {"success": True, "hash": "abc"})
+
+
+def test_is_stale_sequence():
+    assert is_stale_sequence(STALE)
+    assert not is_stale_sequence(BAD_AUTH)
+    assert not is_stale_sequence(PAID)
+
+
+def test_prefetched_xdr_with_stale_sequence_is_rebuilt_once():
+    calls = []
+    client = FakeClient(STALE, PAID)
+    assert submit(client, rebuild=rebuilder(calls)) == {"success": True, "hash": "abc"}
+    assert calls == [1]
+    assert [post["unsignedXdr"] for post in client.posts] == ["XDR-1", "XDR-2"]
+
+
+@pytest.mark.parametrize("response", [BAD_AUTH, TIMEOUT])
+def test_prefetched_xdr_other_failures_are_not_resubmitted(response):
+    # Chave errada ou timeout do Horizon: reenviar pode pagar duas vezes
+    calls = []
+    client = FakeClient(response)
+    with pytest.raises(RuntimeError):
+        submit(client, rebuild=rebuilder(calls))
+    assert calls == []
+    assert len(client.posts) == 1
+
+
+def test_stale_sequence_without_prefetch_is_not_retried():
+    client = FakeClient(STALE)
+    with pytest.raises(RuntimeError):
+        submit(client)
+    assert len(client.posts) == 1
+
+
+def test_failed_rebuild_returns_the_submit_error():
+    async def rebuild():
+        raise RuntimeError("saldo insuficiente")
+
+    client = FakeClient(STALE)
+    assert submit(client, rebuild=rebuild) == STALE.body
+    assert len(client.posts) == 1
+
+
+def test_idempotent_payment_runs_once_per_key():
+    store = MemorySessionStore(ttl_seconds=60)
+    store.set("s1", {"sessionToken": "t1", "userId": "u1"})
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        return {"success": True, "hash": "abc"}
+
+    async def main():
+        first = await idempotent_payment(store, "t1", "tx1", execute)
+        second = await idempotent_payment(store, "t1", "tx1", execute)
+        return first, second
+
+    assert asyncio.run(main()) == ({"success": True, "hash": "abc"},) * 2
+    assert calls == [1]
+    assert store.get("s1")["payment_results"] == {"tx1": {"success": True, "hash": "abc"}}
+
+
+def test_idempotent_payment_keeps_only_recent_results():
+    store = MemorySessionStore(ttl_seconds=60)
+    store.set("s1", {"sessionToken": "t1"})
+
+    async def execute():
+        return {"success": True}
+
+    async def main():
+        for key in ("a", "b", "c"):
+            await idempotent_payment(store, "t1", key, execute, max_results=2)
+
+    asyncio.run(main())
+    assert list(store.get("s1")["payment_results"]) == ["b", "c"]
+
+
+def test_failed_payment_then_corrected_key_is_not_replayed():
+    store = MemorySessionStore(ttl_seconds=60)
+    transaction = {"id": "tx1", "task": "execute_payment", "params": {"destination": "GBOB", "amount": "10"}}
+    store.set("s1", {"sessionToken": "t1", "userId": "u1", "pending_transaction": transaction})
+    keys = []
+
+    async def execute():
+        keys.append("SMISTYPED")
+        return {"success": False, "message": "Invalid secret key"}
+
+    async def main():
+        # Primeira chave (digitada errada): consome a transação pendente e falha
+        await store.apop_field("s1", "pending_transaction")
+        await store.aupdate("s1", last_payment={"transaction": transaction, "at": 1000.0})
+        return await idempotent_payment(store, "t1", "tx1", execute)
+
+    assert asyncio.run(main())["success"] is False
+    # Chave corrigida logo depois: nada é repetido nem reenviado, o usuário refaz o pedido
+    status, _, _ = replay_status(store.get("s1"), window_seconds=600, now=1010.0)
+    assert status == "failed"
+    assert payment_not_completed()["params"] == {"payment_not_completed": True}
+    assert "envie o pedido de pagamento" in payment_not_completed()["message"]
+    assert keys == ["SMISTYPED"]
+
+
+@pytest.mark.parametrize("result, expected", [
+    (None, "in_progress"),
+    ({"success": True, "hash": "abc"}, "done"),
+    ({"success": False, "message": "Invalid secret key"}, "failed"),
+    # Lote com parte enviada: repetir o resultado, nunca pedir para reenviar tudo
+    ({"success": False, "results": [{"result": {"success": True}}, {"result": {"success": False}}]}, "done"),
+    ({"success": False, "results": [{"result": {"success": False}}]}, "failed"),
+])
+def test_replay_status(result, expected):
+    session = {"last_payment": {"transaction": {"id": "tx1"}, "at": 1000.0}}
+    if result is not None:
+        session["payment_results"] = {"tx1": result}
+    assert replay_status(session, window_seconds=600, now=1010.0)[0] == expected
+
+
+def test_replay_window_expires():
+    session = {"last_payment": {"transaction": {"id": "tx1"}, "at": 1000.0}, "payment_results": {"tx1": {"success": True}}}
+    assert replay_status(session, window_seconds=600, now=1700.0) is None
+    assert replay_status({}, window_seconds=600) is None
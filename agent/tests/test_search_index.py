@@ -0,0 +1,53 @@
+import re
+
+from search_index import JSONSearchIndex, json_records, model_collection_name
+
+
+class FakeEmbedder:
+    batch_size = 2
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def get(self, include=None):
+        return {"ids": list(self.docs), "metadatas": [metadata for _, metadata in self.docs.values()]}
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.docs[doc_id] = (document, metadata)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            del self.docs[doc_id]
+
+
+def test_collection_name_depends_on_the_model():
+    first = model_collection_name("issuers", "sentence-transformers/all-MiniLM-L6-v2")
+    assert first == model_collection_name("issuers", "sentence-transformers/all-MiniLM-L6-v2")
+    assert first != model_collection_name("issuers", "/models/paraphrase-multilingual-MiniLM-L12-v2")
+    # Caminho local vira um nome aceito pelo Chroma
+    assert re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]", model_collection_name("issuers", "/models/x y"))
+
+
+def test_sync_embeds_only_new_or_changed_records():
+    embedder = FakeEmbedder()
+    index = JSONSearchIndex("unused.json", "issuers", embedder=embedder)
+    index._collection = FakeCollection()
+
+    assert index.sync(json_records({"USDC": {"name": "USD Coin"}, "EURC": {"name": "Euro Coin"}})) == {
+        "added": 2, "updated": 0, "deleted": 0, "unchanged": 0,
+    }
+    embedder.embedded.clear()
+    stats = index.sync(json_records({"USDC": {"name": "USD Coin"}, "BRLC": {"name": "Real"}}))
+    assert stats == {"added": 1, "updated": 0, "deleted": 1, "unchanged": 1}
+    assert embedder.embedded == ["BRLC: name: Real"]
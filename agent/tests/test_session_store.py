@@ -0,0 +1,192 @@
+import asyncio
+import threading
+
+import pytest
+
+from session_store import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    return MemorySessionStore(ttl_seconds=60)
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_set_get_and_update(store):
+    store.set("s1", {"sessionToken": "t1", "userId": "u1"})
+    assert store.get("s1") == {"sessionToken": "t1", "userId": "u1"}
+    assert store.get("missing", {}) == {}
+
+    data = store.update("s1", publicKey="GABC", userId=None)
+    assert data == {"sessionToken": "t1", "publicKey": "GABC"}
+    assert store.get("s1") == data
+
+
+def test_find_by_token(store):
+    store.set("s1", {"sessionToken": "t1"})
+    store.set("s2", {"sessionToken": "t2"})
+    assert store.find_by_token("t2") == ("s2", {"sessionToken": "t2"})
+    assert store.find_by_token("nope") is None
+
+    # Login novo na mesma sessão: o token antigo não resolve mais
+    store.set("s1", {"sessionToken": "t3"})
+    assert store.find_by_token("t1") is None
+    assert store.find_by_token("t3")[0] == "s1"
+
+
+def test_find_by_token_does_not_count_session_hits(store):
+    store.set("s1", {"sessionToken": "t1"})
+    before = store.stats()
+    store.find_by_token("t1")
+    store.find_by_token("nope")
+    after = store.stats()
+    assert (after["hits"], after["misses"]) == (before["hits"], before["misses"])
+
+
+def test_expired_sessions_are_not_returned(store):
+    store.ttl_seconds = -1
+    store.set("s1", {"sessionToken": "t1", "pending_transaction": {"task": "execute_payment"}})
+    assert store.get("s1") is None
+    assert store.find_by_token("t1") is None
+    assert store.pop_field("s1", "pending_transaction") is None
+
+
+def test_purge_expired(store):
+    store.ttl_seconds = -1
+    store.set("old", {"sessionToken": "t1"})
+    store.ttl_seconds = 60
+    store.set("new", {"sessionToken": "t2"})
+    assert store.purge_expired() == 1
+    assert len(store) == 1
+    assert [session_id for session_id, _ in store.items()] == ["new"]
+
+
+def test_writes_purge_expired_sessions_periodically(store):
+    store.ttl_seconds = -1
+    store.set("old", {"sessionToken": "t1"})
+    store.ttl_seconds = 60
+    store.purge_interval = 0
+    store.update("other", userId="u2")
+    # A sessão vencida saiu sem que ninguém lesse "old" de novo
+    assert len(store) == 1
+
+
+def test_pop_field(store):
+    store.set("s1", {"sessionToken": "t1", "pending_transaction": {"id": 1}})
+    assert store.pop_field("s1", "pending_transaction") == {"id": 1}
+    assert store.pop_field("s1", "pending_transaction") is None
+    assert store.get("s1") == {"sessionToken": "t1"}
+
+
+def test_pop_field_is_atomic_across_threads(store):
+    # Duas confirmações simultâneas da mesma transação: só uma pode executar
+    for attempt in range(5):
+        store.set("s1", {"sessionToken": "t1", "pending_transaction": {"attempt": attempt}})
+        barrier = threading.Barrier(8)
+        results = []
+
+        def confirm():
+            barrier.wait()
+            results.append(store.pop_field("s1", "pending_transaction"))
+
+        threads = [threading.Thread(target=confirm) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [value for value in results if value is not None] == [{"attempt": attempt}]
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(ttl_seconds=60, max_entries=2)
+    store.set("a", {"sessionToken": "ta"})
+    store.set("b", {"sessionToken": "tb"})
+    store.get("a")
+    store.set("c", {"sessionToken": "tc"})
+    assert store.get("b") is None
+    assert store.find_by_token("tb") is None
+    assert store.get("a") is not None
+    assert store.stats()["evicted"] == 1
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    first = SQLiteSessionStore(path=path, ttl_seconds=60)
+    second = SQLiteSessionStore(path=path, ttl_seconds=60)
+    first.update("s1", sessionToken="t1", pending_transaction={"id": 1})
+    assert second.find_by_token("t1")[0] == "s1"
+    assert second.pop_field("s1", "pending_transaction") == {"id": 1}
+    assert first.pop_field("s1", "pending_transaction") is None
+
+
+def test_stats_counts_hits_and_misses(store):
+    store.set("s1", {"sessionToken": "t1"})
+    store.get("s1")
+    store.get("missing")
+    stats = store.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_async_methods_match_the_sync_ones(store):
+    async def main():
+        await store.aset("s1", {"sessionToken": "t1"})
+        await store.aupdate("s1", pending_transaction={"id": 1})
+        found = await store.afind_by_token("t1")
+        popped = await store.apop_field("s1", "pending_transaction")
+        return found, popped, await store.aget("s1")
+
+    found, popped, data = asyncio.run(main())
+    assert found == ("s1", {"sessionToken": "t1", "pending_transaction": {"id": 1}})
+    assert popped == {"id": 1}
+    assert data == {"sessionToken": "t1"}
+
+
+def test_sqlite_reads_do_not_write_on_every_access(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    store.set("s1", {"sessionToken": "t1"})
+    conn = store._connect()
+    changes = conn.total_changes
+    store.get("s1")
+    store.get("s1")
+    assert conn.total_changes == changes
+
+    store.last_access_resolution = 0
+    store.get("s1")
+    assert conn.total_changes == changes + 1
+
+
+def test_account_state_is_kept_apart_from_sessions(store):
+    store.set("s1", {"sessionToken": "t1"})
+    assert store.get_account_state("u1") == {}
+    assert store.update_account_state("u1", last_payment_at=1.0) == {"last_payment_at": 1.0}
+    assert store.update_account_state("u1", contacts_changed_at=2.0, last_payment_at=None) == {"contacts_changed_at": 2.0}
+    assert asyncio.run(store.aget_account_state("u1")) == {"contacts_changed_at": 2.0}
+    # Não aparece entre as sessões nem ocupa espaço delas
+    assert len(store) == 1
+    assert store.get("u1") is None and store.get("account:u1") is None
+
+
+def test_account_state_does_not_evict_sessions():
+    store = MemorySessionStore(ttl_seconds=60, max_entries=2)
+    store.set("a", {"sessionToken": "ta"})
+    store.set("b", {"sessionToken": "tb"})
+    for user_id in ("u1", "u2", "u3"):
+        store.update_account_state(user_id, last_payment_at=1.0)
+    assert store.get("a") is not None and store.get("b") is not None
+    assert store.get_account_state("u1") == {}
+    assert store.get_account_state("u3") == {"last_payment_at": 1.0}
+
+
+def test_purge_expired_covers_account_state(store):
+    store.ttl_seconds = -1
+    store.update_account_state("u1", last_payment_at=1.0)
+    store.ttl_seconds = 60
+    assert store.get_account_state("u1") == {}
+    store.purge_expired()
+    assert store.update_account_state("u1", contacts_changed_at=2.0) == {"contacts_changed_at": 2.0}
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, single_flight
+
+
+def test_concurrent_async_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"balances": [1]}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("balances", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"balances": [1]}] * 5
+    # Seguidores recebem cópias: alterar um resultado não afeta os outros
+    results[1]["balances"].append(2)
+    assert results[2] == {"balances": [1]}
+    assert flight.stats() == {"leaders": 1, "followers": 4, "inflight": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    async def main():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")), flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert flight.stats()["leaders"] == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("api down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+    assert len(calls) == 1
+    # Nada fica guardado: a próxima chamada executa de novo
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.do("k", fail))
+    assert len(calls) == 2
+
+
+def test_do_sync_coalesces_threads():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return [42]
+
+    leader = threading.Thread(target=lambda: results.append(flight.do_sync("k", slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do_sync("k", slow))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["followers"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [[42]] * 4
+
+
+def test_decorator_keys_on_arguments():
+    calls = []
+
+    class Tool:
+        @single_flight("tool")
+        async def fetch(self, session_token, since=None):
+            calls.append((session_token, since))
+            await asyncio.sleep(0.01)
+            return session_token
+
+    tool = Tool()
+
+    async def main():
+        return await asyncio.gather(tool.fetch("t1"), tool.fetch("t1"), tool.fetch("t2"), tool.fetch("t1", since="x"))
+
+    assert asyncio.run(main()) == ["t1", "t1", "t2", "t1"]
+    assert sorted(calls, key=repr) == sorted([("t1", None), ("t2", None), ("t1", "x")], key=repr)
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from task_schemas import (  # noqa: E402
+    TaskParseError, missing_params, parse_task_response, repair_json, task_json_schema, validate_task,
+)
+
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"task": "list_contacts", "params": {}}\n```',
+    'Aqui está: {"task": "list_contacts", "params": {},} espero ter ajudado',
+    "{'task': 'list_contacts', 'params': {'flag': True}}",
+    '{"task": "list_contacts", "params": {"note": "chave {x}"}}',
+])
+def test_repair_json(text):
+    assert repair_json(text)["task"] == "list_contacts"
+
+
+@pytest.mark.parametrize("text", ["sem json aqui", '{"task": "x"', "{'a': }"])
+def test_repair_json_gives_up(text):
+    with pytest.raises(TaskParseError):
+        repair_json(text)
+
+
+def test_parse_task_response_validates_params():
+    task = parse_task_response(
+        '{"message": "ok", "task": "execute_payment", "params": {"destination": "Bob", "amount": 10, "asset": "XLM", "extra": 1}}'
+    )
+    assert task == {
+        "message": "ok",
+        "task": "execute_payment",
+        "params": {"destination": "Bob", "amount": "10", "asset": "XLM", "memo": ""},
+    }
+
+
+@pytest.mark.parametrize("text", [
+    "não sei",
+    '{"task": "transfer_everything", "params": {}}',
+    '{"task": "execute_payment", "params": {"amount": "10"}}',
+])
+def test_parse_task_response_falls_back_to_clarification(text):
+    task = parse_task_response(text)
+    assert task["task"] == "clarification_needed"
+    assert task["params"]["parse_error"]
+
+
+@pytest.mark.parametrize("amount, expected", [
+    ("10,5", "10.5"),
+    ("1.000,50", "1000.50"),
+    ("1,000.50", "1000.50"),
+    (25, "25"),
+    (0.5, "0.5"),
+    ("", ""),
+])
+def test_amounts_are_normalized(amount, expected):
+    task = validate_task({"task": "execute_payment", "params": {"destination": "Bob", "amount": amount}})
+    assert task["params"]["amount"] == expected
+
+
+@pytest.mark.parametrize("task, params", [
+    ("execute_payment", {"destination": "Bob", "amount": "1,000"}),
+    ("execute_batch_payment", {"payments": [{"destination": "Bob", "amount": "1.000"}]}),
+    ("execute_path_payment", {"destination": "Bob", "destAsset": "USDC", "destAmount": "250,000"}),
+    ("initiate_pix_deposit", {"amount": "1.000"}),
+])
+def test_thousands_or_decimal_amounts_are_rejected(task, params):
+    # "1,000" nunca vira "1.000" (um): o mapper sobe de camada ou pede para reformular
+    assert parse_task_response(json.dumps({"task": task, "params": params}))["task"] == "clarification_needed"
+
+
+def test_missing_params():
+    task = validate_task({"task": "execute_payment", "params": {"destination": "Bob", "amount": ""}})
+    assert missing_params(task) == ["amount"]
+
+
+def test_task_json_schema_is_strict():
+    schema = task_json_schema()
+    assert "execute_payment" in schema["properties"]["task"]["enum"]
+    for option in schema["properties"]["params"]["anyOf"]:
+        assert option["additionalProperties"] is False
+        assert set(option["required"]) == set(option["properties"])
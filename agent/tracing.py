@@ -0,0 +1,221 @@
+"""
+Spans e métricas do pipeline do agente.
+
+Cada requisição abre um trace (`start_trace`) com request_id e session_id;
+dentro dele, `span("nome")` (ou o decorator `traced`) mede uma etapa: router,
+mapper, kickoff do CrewAI, ferramentas, final_agent. As durações alimentam
+histogramas expostos no formato de texto do Prometheus (`render_metrics`,
+servido em GET /metrics), junto com tokens do LLM e latência das chamadas
+HTTP à API Node. Com TRACE_LOG=true, cada trace é registrado como uma linha
+JSON no logger "agent.trace".
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TRACE_LOG = os.getenv("TRACE_LOG", "false").lower() == "true"
+trace_logger = logging.getLogger("agent.trace")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': '+Inf'})} {entry['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {entry['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {entry['count']}")
+        return lines
+
+
+SPAN_SECONDS = Histogram("agent_span_seconds", "Duração de cada etapa do pipeline do agente.", labels=("span",))
+REQUESTS = Counter("agent_requests_total", "Requisições processadas por tarefa e origem do mapeamento.", labels=("task", "source"))
+LLM_TOKENS = Counter("agent_llm_tokens_total", "Tokens consumidos pelo LLM por etapa.", labels=("stage", "kind"))
+HTTP_SECONDS = Histogram("agent_http_request_seconds", "Latência das chamadas HTTP de saída (API Node).",
+                         labels=("method", "endpoint", "status"))
+SINGLE_FLIGHT = Counter("agent_single_flight_total", "Chamadas por single-flight: leader executa, follower reaproveita.",
+                        labels=("name", "role"))
+LLM_COST = Counter("agent_llm_cost_usd_total", "Custo estimado do LLM em dólares, por etapa e camada de modelo.",
+                   labels=("stage", "tier"))
+MAPPER_TIER_SECONDS = Histogram("agent_mapper_tier_seconds", "Latência de cada chamada do mapper por camada e resultado.",
+                                labels=("tier", "outcome"))
+METRICS = [SPAN_SECONDS, REQUESTS, LLM_TOKENS, HTTP_SECONDS, SINGLE_FLIGHT, LLM_COST, MAPPER_TIER_SECONDS]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    def __init__(self, session_id: str, request_id: str = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.session_id = session_id
+        self.attrs = {}
+        self.spans = []
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "session_id": self.session_id,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+
+_current_trace = ContextVar("agent_trace", default=None)
+
+
+def annotate(**attrs):
+    """Add attributes (e.g. task, source) to the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+@contextmanager
+def start_trace(session_id: str, request_id: str = None):
+    """Open the trace of one request; on exit counts it and, with TRACE_LOG, logs it as JSON."""
+    trace = Trace(session_id, request_id)
+    token = _current_trace.set(trace)
+    try:
+        with span("request"):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        REQUESTS.inc(task=trace.attrs.get("task", "unknown"), source=trace.attrs.get("source", "none"))
+        if TRACE_LOG:
+            trace_logger.info(json.dumps(trace.as_dict(), ensure_ascii=False, default=str))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage. Yields a dict the caller can add attributes to (e.g. token counts)."""
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        SPAN_SECONDS.observe(duration, span=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({"name": name, "ms": round(duration * 1000, 2), **attrs})
+
+
+def traced(name: str):
+    """Decorator version of `span` for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_tokens(stage: str, usage, span_attrs: dict = None):
+    """Count LLM tokens from a CrewAI usage object or dict (prompt/completion/total)."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+        if value:
+            LLM_TOKENS.inc(value, stage=stage, kind=kind.replace("_tokens", ""))
+            if span_attrs is not None:
+                span_attrs[kind] = value
+
+
+async def observe_request(request):
+    # Hooks do httpx: marca o início na requisição e mede na resposta
+    request.extensions["trace_started"] = time.perf_counter()
+
+
+async def observe_response(response):
+    started = response.request.extensions.get("trace_started")
+    if started is None:
+        return
+    request = response.request
+    HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                         endpoint=request.url.path, status=str(response.status_code))
+
+
+HTTPX_EVENT_HOOKS = {"request": [observe_request], "response": [observe_response]}
@@ -166,7 +166,8 @@ export class ActionsController {
         });
       }
       
-      const history = await OperationService.getOperationHistory(userId);
+      const since = req.body?.since;
+      const history = await OperationService.getOperationHistory(userId, since);
 
       res.status(200).json({ success: true, history: history });
 
@@ -49,7 +49,9 @@ export const listContactsSchema = z.object({
 });
 
 export const getOperationHistorySchema = z.object({
-  body: z.object({}).optional(),
+  body: z.object({
+    since: z.string().optional(),
+  }).optional(),
 });
 
 export const getAccountBalanceSchema = z.object({
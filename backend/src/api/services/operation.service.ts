@@ -1,14 +1,20 @@
 import { supabase } from '../../config/supabase';
 
 export class OperationService {
-  static async getOperationHistory(userId: string): Promise<any[]> {
+  static async getOperationHistory(userId: string, since?: string): Promise<any[]> {
     console.log(`Fetching operation history for user_id: ${userId}`);
 
-    const { data, error } = await supabase
+    let query = supabase
       .from('operations') 
       .select('*')
-      .eq('user_id', userId)
-      .order('created_at', { ascending: false });
+      .eq('user_id', userId);
+
+    // Busca incremental: só operações a partir do cursor (created_at) do cliente
+    if (since) {
+      query = query.gte('created_at', since);
+    }
+
+    const { data, error } = await query.order('created_at', { ascending: false });
 
     if (error) {
       throw new Error(`Database error: ${error.message}`);
@@ -0,0 +1,248 @@
+# agent_client.py
+import os
+import json
+import time
+import random
+import zlib
+import asyncio
+import logging
+import httpx
+
+# Texto provisório exibido enquanto o agente trabalha, por tipo de evento
+PROGRESS_MESSAGES = {
+    "thinking": "🤔 Pensando...",
+    "intent": "🔎 Entendi o pedido, processando...",
+    "api_call": "⏳ Consultando a rede Stellar...",
+}
+PLACEHOLDER_MESSAGE = "⏳ Processando..."
+FALLBACK_MESSAGE = "Não obtive uma resposta válida do assistente."
+
+# Só um 503 com este header (agente carregando, fila cheia antes do mapper) é
+# garantia de que a query não foi processada. Um 503 sem ele (fila cheia no
+# final_agent, depois do pagamento/contato/login) e 502/504 de um proxy podem
+# vir depois dos efeitos da mensagem: reenviar repetiria a ação
+REJECTED_HEADER = "X-Agent-Rejected"
+# Limites dos buckets do histograma de latência, em segundos
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def query_endpoints() -> list:
+    """
+    URLs de /query. Com API_WORKER_ENDPOINTS (lista separada por vírgula, uma
+    por worker de `agent/serve.py --sticky`), o gateway roteia por session_id;
+    senão, usa API_ENDPOINT.
+    """
+    workers = [url.strip() for url in os.getenv("API_WORKER_ENDPOINTS", "").split(",") if url.strip()]
+    return workers or [os.getenv("API_ENDPOINT", "")]
+
+
+def stream_endpoint(query_endpoint: str) -> str:
+    """URL de /query/stream: API_STREAM_ENDPOINT (só sem workers) ou a de /query + "/stream"."""
+    if os.getenv("API_STREAM_ENDPOINT") and not os.getenv("API_WORKER_ENDPOINTS"):
+        return os.getenv("API_STREAM_ENDPOINT")
+    return query_endpoint.rstrip("/") + "/stream"
+
+
+def streaming_enabled() -> bool:
+    return os.getenv("AGENT_STREAMING", "true").lower() not in ("0", "false", "no")
+
+
+def http2_available() -> bool:
+    # httpx só fala HTTP/2 com o pacote opcional "h2" instalado (httpx[http2])
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LatencyHistogram:
+    """Histograma cumulativo de latências (segundos) com contagem, soma e percentis aproximados."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float):
+        """Limite superior do bucket que contém o percentil (None se vazio; inf acima do último bucket)."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg": (self.total / self.count) if self.count else None,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {f"le_{bound}": count for bound, count in zip(self.buckets + ("inf",), self.counts)},
+        }
+
+
+def rejected_before_processing(response: httpx.Response) -> bool:
+    return response.status_code == 503 and REJECTED_HEADER in response.headers
+
+
+class AgentAPIClient:
+    """
+    Cliente HTTP único do orquestrador para a API do agente, compartilhado
+    pelos bots do Telegram e do Discord.
+
+    Mantém um pool de conexões com keep-alive (HTTP/2 quando o pacote "h2"
+    está instalado), reenvia com backoff exponencial e jitter em falhas de
+    conexão e nos 503 que o agente marca como recusados antes do
+    processamento, e registra a latência de cada requisição por plataforma.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive: int = None, timeout: float = None,
+                 max_retries: int = None, backoff_base: float = None, backoff_max: float = None):
+        self.timeout = timeout or float(os.getenv("API_TIMEOUT_SECONDS", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("API_MAX_RETRIES", "2"))
+        self.backoff_base = backoff_base or float(os.getenv("API_BACKOFF_BASE_SECONDS", "0.5"))
+        self.backoff_max = backoff_max or float(os.getenv("API_BACKOFF_MAX_SECONDS", "5"))
+        self.http2 = os.getenv("API_HTTP2", "true").lower() not in ("0", "false", "no") and http2_available()
+        limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("API_MAX_CONNECTIONS", "50")),
+            max_keepalive_connections=max_keepalive or int(os.getenv("API_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("API_KEEPALIVE_EXPIRY_SECONDS", "60")),
+        )
+        # O timeout vale entre bytes recebidos, então um stream longo não expira
+        self.client = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=httpx.Timeout(self.timeout))
+        self.latency = {}
+        self.endpoints = query_endpoints()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def endpoint_for(self, session_id: str) -> str:
+        """
+        Worker fixo por session_id (crc32 módulo o número de workers). O estado
+        da sessão e os marcadores que invalidam os caches locais (pagamento,
+        contato novo) ficam no SQLite compartilhado, então isso não é
+        necessário para a correção, mas mantém os caches de contatos/LLM de
+        cada worker quentes para os seus usuários.
+        """
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+        return self.endpoints[zlib.crc32(session_id.encode("utf-8")) % len(self.endpoints)]
+
+    def stats(self) -> dict:
+        return {platform: histogram.snapshot() for platform, histogram in self.latency.items()}
+
+    async def query(self, data_to_send: dict, on_update=None, platform: str = "bot") -> str:
+        """
+        Envia a mensagem ao agente e devolve o texto final da resposta.
+
+        Com streaming (padrão), lê o NDJSON de /query/stream e chama
+        `on_update(texto_parcial)` conforme chegam eventos de progresso e pedaços
+        da resposta, no máximo uma vez a cada STREAM_EDIT_INTERVAL_SECONDS (as
+        plataformas limitam edições de mensagem). Com AGENT_STREAMING=false, faz
+        a chamada bloqueante a /query.
+        """
+        started = time.perf_counter()
+        failed = True
+        endpoint = self.endpoint_for(str(data_to_send.get("session_id", "")))
+        try:
+            if streaming_enabled():
+                content = await self._query_stream(stream_endpoint(endpoint), data_to_send, on_update, platform)
+            else:
+                response = await self._send("POST", endpoint, json=data_to_send)
+                content = response.json().get("result", {}).get("message") or FALLBACK_MESSAGE
+            failed = False
+            return content
+        finally:
+            self.latency.setdefault(platform, LatencyHistogram()).observe(time.perf_counter() - started, error=failed)
+
+    async def _send(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying connection failures and 503s marked with
+        REJECTED_HEADER with jittered backoff.
+
+        Read timeouts, 502/504 and unmarked 503s are not retried: the agent may
+        already have acted on the message (e.g. submitted a payment), so
+        resending could run it twice.
+        """
+        attempt = 0
+        while True:
+            try:
+                request = self.client.build_request(method, url, **kwargs)
+                response = await self.client.send(request, stream=stream)
+                if not rejected_before_processing(response) or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                await response.aclose()
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            attempt += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        # Full jitter: espera aleatória até o teto exponencial, respeitando Retry-After
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    async def _query_stream(self, url: str, data_to_send: dict, on_update, platform: str) -> str:
+        edit_interval = float(os.getenv("STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+        last_update = 0.0
+        last_text = None
+        partial = ""
+
+        async def update(text: str):
+            nonlocal last_update, last_text
+            if on_update is None or not text or text == last_text:
+                return
+            now = time.monotonic()
+            if now - last_update < edit_interval:
+                return
+            last_update, last_text = now, text
+            try:
+                await on_update(text)
+            except Exception as exc:
+                # Falha ao editar a mensagem não interrompe a leitura do stream
+                logging.warning(f"[{platform}] Falha ao atualizar a mensagem: {exc}")
+
+        response = await self._send("POST", url, stream=True, json=data_to_send)
+        try:
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                kind = event.get("event")
+                if kind == "token":
+                    partial += event.get("text", "")
+                    await update(partial + " ▌")
+                elif kind in PROGRESS_MESSAGES and not partial:
+                    await update(PROGRESS_MESSAGES[kind])
+                elif kind == "result":
+                    return (event.get("result") or {}).get("message") or partial or FALLBACK_MESSAGE
+                elif kind == "error":
+                    raise RuntimeError(f"Agente respondeu com erro {event.get('status')}: {event.get('detail')}")
+        finally:
+            await response.aclose()
+
+        return partial or FALLBACK_MESSAGE
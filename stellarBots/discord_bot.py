@@ -2,13 +2,17 @@
 import os
 import logging
 import discord
-import httpx
 
-def setup_discord_bot():
-    """Prepara e retorna o cliente do bot do Discord, mas não o executa."""
+from agent_client import PLACEHOLDER_MESSAGE
+
+def setup_discord_bot(api_client, dispatcher):
+    """
+    Prepara e retorna o cliente do bot do Discord, mas não o executa.
+    `api_client` (AgentAPIClient) e `dispatcher` (SessionDispatcher) são
+    compartilhados e criados pelo main.py.
+    """
     
     DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-    API_ENDPOINT = os.getenv("API_ENDPOINT")
 
     if not DISCORD_TOKEN:
         raise ValueError("Token do Discord não encontrado!")
@@ -39,27 +43,28 @@ def setup_discord_bot():
             "session_id": session_id
         }
         
-        logging.info(f"[Discord] Enviando para a API do Agente: {data_to_send}")
-
-        try:
-            async with httpx.AsyncClient() as http_client:
-                response = await http_client.post(API_ENDPOINT, json=data_to_send, timeout=60.0)
-                response.raise_for_status()
-                
-                # A resposta da API agora vem dentro de uma chave "result"
-                api_response_data = response.json().get('result', {})
-                
-                # Assumimos que o crew sempre retorna uma chave "message" para o usuário
-                content = api_response_data.get("message", "Não obtive uma resposta válida do assistente.")
-                
-                if not content:
-                    await message.channel.send("Desculpe, não recebi um conteúdo válido para exibir.")
-                    return
-
-                await message.channel.send(content)
-                
-        except Exception as exc:
-            logging.error(f"[Discord] Erro ao comunicar com a API do Agente: {exc}")
-            await message.channel.send("Desculpe, estou com um problema técnico para contatar o assistente.")
-            
+        async def answer():
+            logging.info(f"[Discord] Enviando para a API do Agente: {data_to_send}")
+
+            try:
+                # Indicador de digitação enquanto o stream chega; a resposta é editada aos poucos
+                async with message.channel.typing():
+                    reply = await message.channel.send(PLACEHOLDER_MESSAGE)
+
+                    async def edit_reply(text):
+                        await reply.edit(content=text)
+
+                    content = await api_client.query(data_to_send, on_update=edit_reply, platform="Discord")
+
+                await reply.edit(content=content)
+
+            except Exception as exc:
+                logging.error(f"[Discord] Erro ao comunicar com a API do Agente: {exc}")
+                await message.channel.send("Desculpe, estou com um problema técnico para contatar o assistente.")
+
+        # Mensagens do mesmo usuário são processadas em ordem; recusas respondem na hora
+        refusal = dispatcher.submit(session_id, answer)
+        if refusal:
+            await message.channel.send(refusal)
+
     return client
\ No newline at end of file
@@ -0,0 +1,130 @@
+# dispatcher.py
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+RATE_LIMITED_MESSAGE = "Você está enviando mensagens rápido demais. Aguarde alguns segundos e tente de novo. ⏳"
+BUSY_MESSAGE = "Estou atendendo muitas pessoas agora. Tente de novo em instantes, por favor. 🙏"
+
+
+class TokenBucket:
+    """Limite de taxa por usuário: `rate` mensagens por segundo com rajadas de até `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SessionDispatcher:
+    """
+    Fila de trabalho dos bots em direção à API do agente.
+
+    Cada session_id tem uma fila FIFO atendida por uma única tarefa, então as
+    mensagens de um usuário chegam ao SimpleAgent na ordem em que foram
+    enviadas (ex.: pedido de pagamento e depois a chave secreta). Um semáforo
+    global limita as requisições simultâneas à API; como cada usuário ocupa no
+    máximo uma vaga, a capacidade é dividida entre os usuários. Mensagens além
+    do limite de taxa do usuário, da fila do usuário ou do total pendente são
+    recusadas na hora, para o bot responder com uma mensagem de "ocupado".
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue_per_session: int = None, max_pending: int = None,
+                 rate_per_second: float = None, burst: int = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("DISPATCH_MAX_CONCURRENCY", "16"))
+        self.max_queue_per_session = max_queue_per_session or int(os.getenv("DISPATCH_MAX_QUEUE_PER_SESSION", "5"))
+        self.max_pending = max_pending or int(os.getenv("DISPATCH_MAX_PENDING", "500"))
+        self.rate_per_second = rate_per_second or float(os.getenv("DISPATCH_RATE_PER_SECOND", "1"))
+        self.burst = burst or int(os.getenv("DISPATCH_BURST", "5"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+        self._pending = 0
+        self._in_flight = 0
+        self._metrics = {"accepted": 0, "rate_limited": 0, "shed": 0, "completed": 0, "failed": 0}
+
+    def submit(self, session_id: str, job) -> str:
+        """
+        Enfileira `job` (função async sem argumentos) para a sessão e retorna
+        imediatamente: None se aceito, ou a mensagem de recusa para o usuário.
+        """
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            bucket = self._buckets[session_id] = TokenBucket(self.rate_per_second, self.burst)
+        if not bucket.allow():
+            self._metrics["rate_limited"] += 1
+            return RATE_LIMITED_MESSAGE
+
+        queue = self._queues.get(session_id) or deque()
+        if len(queue) >= self.max_queue_per_session or self._pending >= self.max_pending:
+            self._metrics["shed"] += 1
+            return BUSY_MESSAGE
+
+        self._queues[session_id] = queue
+        queue.append(job)
+        self._pending += 1
+        self._metrics["accepted"] += 1
+        if session_id not in self._workers:
+            self._workers[session_id] = asyncio.create_task(self._drain(session_id))
+        return None
+
+    async def _drain(self, session_id: str):
+        queue = self._queues[session_id]
+        try:
+            while queue:
+                job = queue.popleft()
+                try:
+                    async with self._semaphore:
+                        self._in_flight += 1
+                        try:
+                            await job()
+                        finally:
+                            self._in_flight -= 1
+                    self._metrics["completed"] += 1
+                except Exception as exc:
+                    self._metrics["failed"] += 1
+                    logging.error(f"Erro ao processar mensagem da sessão '{session_id}': {exc}")
+                finally:
+                    self._pending -= 1
+        finally:
+            # Sem mensagens na fila: libera a sessão (o bucket expira em prune_buckets)
+            self._workers.pop(session_id, None)
+            if not queue:
+                self._queues.pop(session_id, None)
+
+    def prune_buckets(self):
+        """Descarta buckets de usuários ociosos que já recarregaram por completo."""
+        now = time.monotonic()
+        full_after = self.burst / self.rate_per_second
+        idle = [sid for sid, bucket in self._buckets.items()
+                if sid not in self._workers and now - bucket.updated > full_after]
+        for session_id in idle:
+            del self._buckets[session_id]
+
+    def stats(self) -> dict:
+        return {
+            **self._metrics,
+            "pending": self._pending,
+            "active_sessions": len(self._workers),
+            "in_flight": self._in_flight,
+        }
+
+    async def aclose(self):
+        """Cancela as filas em andamento (desligamento do orquestrador)."""
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,179 @@
+# fake_telegram.py
+"""
+Telegram falso para testar o modo webhook localmente, sem rede.
+
+`bot-api` sobe uma API de bots falsa que responde "ok" a qualquer método
+(getMe, setWebhook, sendMessage, editMessageText, ...) e conta as chamadas;
+`send` dispara updates sintéticos no webhook, como o Telegram faria, e mostra
+quantos foram aceitos e a latência da ingestão.
+
+    # 1. API de bots falsa
+    python fake_telegram.py bot-api --port 8081
+    # 2. webhook apontando para ela (e para a API do agente)
+    TELEGRAM_TOKEN=123:fake TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot \\
+        TELEGRAM_WEBHOOK_SECRET=dev-secret API_ENDPOINT=http://127.0.0.1:8000/query \\
+        python telegram_webhook.py --port 8443
+    # 3. updates de 50 usuários, 3 mensagens cada
+    python fake_telegram.py send --url http://127.0.0.1:8443/telegram/webhook --secret dev-secret \\
+        --users 50 --messages 3 --bot-api http://127.0.0.1:8081
+"""
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from urllib.parse import parse_qs
+
+import httpx
+
+MESSAGES = [
+    "olá",
+    "qual o meu saldo?",
+    "listar meus contatos",
+    "mostrar meu histórico de operações",
+]
+
+
+def fake_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+class FakeBotAPI:
+    """App ASGI com o mínimo da API de bots que o python-telegram-bot usa."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        if scope["path"] == "/stats":
+            payload = dict(self.calls)
+        else:
+            # /bot<token>/<método>
+            method = scope["path"].rsplit("/", 1)[-1]
+            self.calls[method] += 1
+            payload = {"ok": True, "result": self.result(method, self.parameters(scope, body))}
+
+        data = json.dumps(payload).encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": data})
+
+    @staticmethod
+    def parameters(scope, body: bytes) -> dict:
+        content_type = dict(scope["headers"]).get(b"content-type", b"")
+        if content_type.startswith(b"application/json"):
+            return json.loads(body or b"{}")
+        return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+    def result(self, method: str, parameters: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(parameters.get("chat_id", 0))
+            return {
+                "message_id": int(parameters.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+        return True
+
+
+async def send_updates(url: str, secret: str, users: int, messages: int, concurrency: int) -> dict:
+    """Envia `messages` updates por usuário; as mensagens de cada usuário saem em ordem."""
+    update_ids = itertools.count(int(time.time()))
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+    latencies = []
+
+    async def user(client: httpx.AsyncClient, user_id: int):
+        for index in range(messages):
+            update = fake_update(next(update_ids), user_id, MESSAGES[(user_id + index) % len(MESSAGES)])
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as exc:
+                    statuses[type(exc).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=10) as client:
+        await asyncio.gather(*(user(client, 100000 + user_id) for user_id in range(users)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "updates": len(latencies),
+        "statuses": dict(statuses),
+        "updates_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+    }
+
+
+async def wait_for_replies(bot_api: str, expected: int, timeout: float) -> dict:
+    """Espera a API falsa receber `expected` sendMessage (as respostas dos bots)."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while True:
+            calls = (await client.get(f"{bot_api.rstrip('/')}/stats")).json()
+            if calls.get("sendMessage", 0) >= expected or time.monotonic() > deadline:
+                return calls
+            await asyncio.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    bot_api = commands.add_parser("bot-api", help="fake Telegram Bot API")
+    bot_api.add_argument("--host", default="127.0.0.1")
+    bot_api.add_argument("--port", type=int, default=8081)
+    sender = commands.add_parser("send", help="post synthetic updates to the webhook")
+    sender.add_argument("--url", default="http://127.0.0.1:8443/telegram/webhook")
+    sender.add_argument("--secret", required=True)
+    sender.add_argument("--users", type=int, default=10)
+    sender.add_argument("--messages", type=int, default=3)
+    sender.add_argument("--concurrency", type=int, default=20)
+    sender.add_argument("--bot-api", help="fake Bot API URL, to wait for the bot replies")
+    sender.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    if args.command == "bot-api":
+        import uvicorn
+        uvicorn.run(FakeBotAPI(), host=args.host, port=args.port, lifespan="off", log_level="warning")
+        return
+
+    result = asyncio.run(send_updates(args.url, args.secret, args.users, args.messages, args.concurrency))
+    print(f"updates: {result['updates']}  status: {result['statuses']}  "
+          f"{result['updates_per_second']:.1f} updates/s  p50 {result['p50'] * 1000:.1f} ms  p95 {result['p95'] * 1000:.1f} ms")
+    if args.bot_api:
+        accepted = result["statuses"].get(200, 0)
+        calls = asyncio.run(wait_for_replies(args.bot_api, accepted, args.timeout))
+        print(f"chamadas à API de bots: {calls}")
+
+
+if __name__ == "__main__":
+    main()
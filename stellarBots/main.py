@@ -6,12 +6,27 @@ import logging
 # Importa as funções de setup que acabamos de criar
 from discord_bot import setup_discord_bot
 from telegram_bot import setup_telegram_bot
+from agent_client import AgentAPIClient
+from dispatcher import SessionDispatcher
 
 # Configuração básica de logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 
+async def log_latency_stats(api_client: AgentAPIClient, dispatcher: SessionDispatcher):
+    """Registra periodicamente os histogramas de latência por plataforma e o estado da fila."""
+    interval = float(os.getenv("BOT_METRICS_LOG_INTERVAL_SECONDS", "300"))
+    while True:
+        await asyncio.sleep(interval)
+        dispatcher.prune_buckets()
+        logging.info(f"Fila de mensagens: {dispatcher.stats()}")
+        for platform, snapshot in api_client.stats().items():
+            logging.info(
+                f"[{platform}] Latência da API do Agente: n={snapshot['count']} erros={snapshot['errors']} "
+                f"p50<={snapshot['p50']}s p95<={snapshot['p95']}s p99<={snapshot['p99']}s"
+            )
+
 async def main():
     """
     Função principal que inicializa e executa os dois bots concorrentemente.
@@ -25,26 +40,53 @@ async def main():
     if not DISCORD_TOKEN or not TELEGRAM_TOKEN:
         raise ValueError("DISCORD_TOKEN e TELEGRAM_TOKEN devem ser definidos como variáveis de ambiente.")
 
+    # Um único cliente HTTP com pool de conexões, compartilhado pelos dois bots
+    api_client = AgentAPIClient()
+    logging.info(f"Cliente da API do Agente pronto (HTTP/2: {api_client.http2})")
+    # Fila FIFO por usuário, com limite global de requisições simultâneas ao agente
+    dispatcher = SessionDispatcher()
+    metrics_task = asyncio.create_task(log_latency_stats(api_client, dispatcher))
+
+    # "polling" (padrão) ou "webhook": o Telegram entrega os updates por HTTP (telegram_webhook.py)
+    telegram_mode = os.getenv("TELEGRAM_MODE", "polling").lower()
+    webhook = telegram_mode == "webhook"
+
     # Prepara os bots
-    discord_client = setup_discord_bot()
-    telegram_application = setup_telegram_bot()
+    discord_client = setup_discord_bot(api_client, dispatcher)
+    telegram_application = setup_telegram_bot(api_client, dispatcher, webhook=webhook)
 
     # Gerenciador de contexto para garantir que o bot do Telegram seja finalizado corretamente
     async with telegram_application:
         # Inicializa a aplicação do Telegram
         await telegram_application.initialize()
         
-        # --- LINHA ADICIONADA ---
-        # Começa a buscar por atualizações (polling) em segundo plano
-        await telegram_application.updater.start_polling()
-        
-        # Ativa os handlers (process_message, start, etc.)
-        await telegram_application.start()
-        
-        logging.info("Bot do Telegram iniciado e fazendo polling...")
+        webhook_task = None
+        if webhook:
+            from telegram_webhook import serve_webhook
+
+            # Ativa os handlers e sobe o endpoint HTTP que recebe os updates
+            await telegram_application.start()
+            webhook_task = asyncio.create_task(serve_webhook(telegram_application))
+            logging.info("Bot do Telegram iniciado em modo webhook...")
+        else:
+            # Começa a buscar por atualizações (polling) em segundo plano
+            await telegram_application.updater.start_polling()
+
+            # Ativa os handlers (process_message, start, etc.)
+            await telegram_application.start()
+
+            logging.info("Bot do Telegram iniciado e fazendo polling...")
         
-        # Inicia o cliente do Discord. Ele vai manter o loop de eventos vivo para os dois bots.
-        await discord_client.start(DISCORD_TOKEN)
+        try:
+            # Inicia o cliente do Discord. Ele vai manter o loop de eventos vivo para os dois bots.
+            await discord_client.start(DISCORD_TOKEN)
+        finally:
+            metrics_task.cancel()
+            if webhook_task:
+                webhook_task.cancel()
+                await asyncio.gather(webhook_task, return_exceptions=True)
+            await dispatcher.aclose()
+            await api_client.aclose()
 
 if __name__ == "__main__":
     try:
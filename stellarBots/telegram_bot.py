@@ -1,15 +1,21 @@
 # telegram_bot.py
 import os
 import logging
-import httpx
 from telegram import Update
+from telegram.constants import ChatAction
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
-def setup_telegram_bot():
-    """Prepara e retorna a aplicação do bot do Telegram, mas não a executa."""
+from agent_client import PLACEHOLDER_MESSAGE
+
+def setup_telegram_bot(api_client, dispatcher, webhook: bool = False):
+    """
+    Prepara e retorna a aplicação do bot do Telegram, mas não a executa.
+    `api_client` (AgentAPIClient) e `dispatcher` (SessionDispatcher) são
+    compartilhados e criados pelo main.py. Com `webhook=True` a aplicação não
+    tem Updater: os updates chegam pelo telegram_webhook.py.
+    """
 
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-    API_ENDPOINT = os.getenv("API_ENDPOINT")
 
     if not TELEGRAM_TOKEN:
         raise ValueError("Token do Telegram não encontrado!")
@@ -32,31 +38,34 @@ def setup_telegram_bot():
             "session_id": session_id
         }
 
-        logging.info(f"[Telegram] Enviando para a API do Agente: {data_to_send}")
+        async def answer():
+            logging.info(f"[Telegram] Enviando para a API do Agente: {data_to_send}")
+
+            try:
+                # Feedback imediato: "digitando..." e uma mensagem que vai sendo editada
+                await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
+                reply = await update.message.reply_text(PLACEHOLDER_MESSAGE)
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(API_ENDPOINT, json=data_to_send, timeout=60.0) # Aumentei o timeout
-                response.raise_for_status()
-                
-                # A resposta da API agora vem dentro de uma chave "result"
-                api_response_data = response.json().get('result', {})
-                
-                # Assumimos que o crew sempre retorna uma chave "message" para o usuário
-                content = api_response_data.get("message", "Não obtive uma resposta válida do assistente.")
+                content = await api_client.query(data_to_send, on_update=reply.edit_text, platform="Telegram")
 
-                if not content:
-                    await update.message.reply_text("Desculpe, não recebi um conteúdo válido.")
-                    return
+                await reply.edit_text(content)
 
-                # Por enquanto, enviamos a resposta como texto simples.
-                await update.message.reply_text(content)
+            except Exception as exc:
+                logging.error(f"[Telegram] Erro ao comunicar com a API do Agente: {exc}")
+                await update.message.reply_text("Desculpe, estou com um problema técnico para contatar o assistente.")
 
-        except Exception as exc:
-            logging.error(f"[Telegram] Erro ao comunicar com a API do Agente: {exc}")
-            await update.message.reply_text("Desculpe, estou com um problema técnico para contatar o assistente.")
+        # Entra na fila do usuário e libera o handler; recusas (limite/lotação) respondem na hora
+        refusal = dispatcher.submit(session_id, answer)
+        if refusal:
+            await update.message.reply_text(refusal)
 
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    builder = Application.builder().token(TELEGRAM_TOKEN)
+    if os.getenv("TELEGRAM_API_BASE_URL"):
+        # Ex.: a API de bots falsa do fake_telegram.py ("http://127.0.0.1:8081/bot")
+        builder = builder.base_url(os.getenv("TELEGRAM_API_BASE_URL"))
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), process_message))
     
@@ -0,0 +1,249 @@
+# telegram_webhook.py
+"""
+Modo webhook do bot do Telegram (TELEGRAM_MODE=webhook no main.py).
+
+Em vez de um processo fazendo long polling, o Telegram faz POST de cada update
+num endpoint HTTP (um app ASGI pequeno servido pelo uvicorn). O endpoint
+confere o header X-Telegram-Bot-Api-Secret-Token, descarta update_id
+repetidos, coloca o update na fila de um worker e responde 200 na hora. Os
+workers são escolhidos pelo id do usuário, então as mensagens de cada usuário
+são tratadas na ordem em que chegaram; fila cheia responde 503 e o Telegram
+reenvia depois.
+
+A ordem por usuário (e a deduplicação de update_id) vale dentro de um
+processo: o POST do Telegram não traz nada em que um load balancer possa
+rotear por usuário, então com várias réplicas a mensagem de pagamento e a
+chave secreta de um mesmo usuário poderiam ser tratadas fora de ordem. Rode
+uma réplica só e escale com TELEGRAM_WEBHOOK_WORKERS (as chamadas à API do
+agente são I/O, um processo dá conta). Para rodar só o Telegram, sem o
+Discord do main.py:
+
+    TELEGRAM_WEBHOOK_SECRET=... TELEGRAM_WEBHOOK_URL=https://bots.exemplo.com/telegram/webhook \\
+        python telegram_webhook.py --port 8443
+
+Para testar sem o Telegram, veja fake_telegram.py.
+"""
+import os
+import re
+import hmac
+import json
+import zlib
+import asyncio
+import logging
+import argparse
+from collections import OrderedDict
+
+import uvicorn
+from telegram import Update
+
+SECRET_HEADER = b"x-telegram-bot-api-secret-token"
+# O Telegram só aceita 1 a 256 caracteres A-Z, a-z, 0-9, "_" e "-"
+SECRET_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def webhook_secret() -> str:
+    secret = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+    if not SECRET_PATTERN.match(secret):
+        raise ValueError("TELEGRAM_WEBHOOK_SECRET deve ser definido (1-256 caracteres: letras, números, '_' e '-').")
+    return secret
+
+
+def update_key(data: dict) -> str:
+    """Id do usuário (ou do chat) que enviou o update, para escolher o worker."""
+    for value in data.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("chat") or (value.get("message") or {}).get("chat")
+            if isinstance(sender, dict) and sender.get("id") is not None:
+                return str(sender["id"])
+    return str(data.get("update_id", ""))
+
+
+class WebhookWorkerPool:
+    """
+    Workers que entregam os updates recebidos à Application do python-telegram-bot.
+
+    Cada worker tem a sua fila e o update vai para o worker do seu usuário
+    (crc32 do id módulo o número de workers): usuários diferentes são
+    processados em paralelo e os updates de um mesmo usuário, em ordem.
+    """
+
+    def __init__(self, application, workers: int = None, queue_size: int = None):
+        self.application = application
+        self.workers = workers or int(os.getenv("TELEGRAM_WEBHOOK_WORKERS", "8"))
+        queue_size = queue_size or int(os.getenv("TELEGRAM_WEBHOOK_QUEUE_SIZE", "200"))
+        self._queues = [asyncio.Queue(maxsize=queue_size) for _ in range(self.workers)]
+        self._tasks = []
+        self._metrics = {"accepted": 0, "rejected": 0, "processed": 0, "failed": 0}
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    def submit(self, data: dict) -> bool:
+        """Enfileira o update; False se a fila do worker estiver cheia."""
+        queue = self._queues[zlib.crc32(update_key(data).encode("utf-8")) % self.workers]
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self._metrics["rejected"] += 1
+            return False
+        self._metrics["accepted"] += 1
+        return True
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            data = await queue.get()
+            try:
+                update = Update.de_json(data, self.application.bot)
+                await self.application.process_update(update)
+                self._metrics["processed"] += 1
+            except Exception as exc:
+                self._metrics["failed"] += 1
+                logging.error(f"[Telegram] Erro ao processar o update {data.get('update_id')}: {exc}")
+            finally:
+                queue.task_done()
+
+    def stats(self) -> dict:
+        return {**self._metrics, "queued": sum(queue.qsize() for queue in self._queues), "workers": self.workers}
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class TelegramWebhookApp:
+    """
+    App ASGI do webhook: POST `path` recebe os updates e GET /healthz responde
+    ao health check do load balancer com as métricas do pool.
+    """
+
+    def __init__(self, pool: WebhookWorkerPool, secret: str, path: str = None, dedup_size: int = None):
+        self.pool = pool
+        self.secret = secret.encode("utf-8")
+        self.path = path or os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
+        # O Telegram reenvia o update se não receber 200 a tempo; o processo lembra os últimos ids
+        self.dedup_size = dedup_size or int(os.getenv("TELEGRAM_WEBHOOK_DEDUP_SIZE", "10000"))
+        self._seen = OrderedDict()
+        self._metrics = {"unauthorized": 0, "invalid": 0, "duplicates": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["method"] == "GET" and scope["path"] == "/healthz":
+            await self._respond(send, 200, {"ok": True, **self.stats()})
+        elif scope["path"] != self.path:
+            await self._respond(send, 404, {"ok": False})
+        elif scope["method"] != "POST":
+            await self._respond(send, 405, {"ok": False})
+        else:
+            status = await self._handle_update(scope, receive)
+            await self._respond(send, status, {"ok": status == 200})
+
+    async def _handle_update(self, scope, receive) -> int:
+        headers = dict(scope["headers"])
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, b""), self.secret):
+            self._metrics["unauthorized"] += 1
+            return 403
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > MAX_BODY_BYTES:
+                self._metrics["invalid"] += 1
+                return 413
+        try:
+            data = json.loads(body)
+            update_id = data["update_id"]
+        except (ValueError, TypeError, KeyError):
+            self._metrics["invalid"] += 1
+            return 400
+
+        if update_id in self._seen:
+            self._metrics["duplicates"] += 1
+            return 200
+        if not self.pool.submit(data):
+            return 503
+        self._seen[update_id] = True
+        while len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return 200
+
+    def stats(self) -> dict:
+        return {**self._metrics, **self.pool.stats()}
+
+    @staticmethod
+    async def _respond(send, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if status == 503:
+            headers.append((b"retry-after", b"1"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def serve_webhook(application, host: str = None, port: int = None):
+    """
+    Serve o webhook até ser cancelado. A `application` já deve estar
+    inicializada e iniciada (`initialize()` e `start()`). Com
+    TELEGRAM_WEBHOOK_URL, registra a URL no Telegram (setWebhook é idempotente,
+    então um restart pode repetir o registro).
+    """
+    secret = webhook_secret()
+    pool = WebhookWorkerPool(application)
+    app = TelegramWebhookApp(pool, secret)
+    host = host or os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0")
+    port = port or int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+
+    url = os.getenv("TELEGRAM_WEBHOOK_URL")
+    if url:
+        await application.bot.set_webhook(
+            url=url,
+            secret_token=secret,
+            max_connections=int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40")),
+            allowed_updates=["message"],
+        )
+        logging.info(f"Webhook do Telegram registrado em {url}")
+
+    pool.start()
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, lifespan="off", log_level="warning"))
+    logging.info(f"Webhook do Telegram ouvindo em http://{host}:{port}{app.path} ({pool.workers} workers)")
+    try:
+        await server.serve()
+    finally:
+        logging.info(f"Webhook do Telegram encerrado: {app.stats()}")
+        await pool.aclose()
+
+
+async def main(host: str, port: int):
+    """Processo só com o Telegram em modo webhook (sem o Discord)."""
+    from agent_client import AgentAPIClient
+    from dispatcher import SessionDispatcher
+    from telegram_bot import setup_telegram_bot
+
+    api_client = AgentAPIClient()
+    dispatcher = SessionDispatcher()
+    telegram_application = setup_telegram_bot(api_client, dispatcher, webhook=True)
+    async with telegram_application:
+        await telegram_application.start()
+        try:
+            await serve_webhook(telegram_application, host, port)
+        finally:
+            await telegram_application.stop()
+            await dispatcher.aclose()
+            await api_client.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Telegram webhook server")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port))
+    except KeyboardInterrupt:
+        logging.info("Desligando o webhook do Telegram...")
@@ -0,0 +1,110 @@
+import asyncio
+
+from dispatcher import BUSY_MESSAGE, RATE_LIMITED_MESSAGE, SessionDispatcher, TokenBucket
+
+
+def make_dispatcher(**options):
+    defaults = {"max_concurrency": 4, "max_queue_per_session": 5, "max_pending": 100, "rate_per_second": 100, "burst": 100}
+    return SessionDispatcher(**{**defaults, **options})
+
+
+async def drain(dispatcher):
+    while dispatcher.stats()["pending"]:
+        await asyncio.sleep(0.001)
+
+
+def test_messages_of_a_session_run_in_order():
+    # Pedido de pagamento e depois a chave secreta: nunca podem inverter
+    async def main():
+        dispatcher = make_dispatcher()
+        handled = []
+
+        def job(session_id, text, delay):
+            async def run():
+                await asyncio.sleep(delay)
+                handled.append((session_id, text))
+            return run
+
+        for session_id in ["a", "b"]:
+            assert dispatcher.submit(session_id, job(session_id, "pagar", 0.02)) is None
+            assert dispatcher.submit(session_id, job(session_id, "chave", 0)) is None
+        await drain(dispatcher)
+        return handled, dispatcher.stats()
+
+    handled, stats = asyncio.run(main())
+    assert [text for session_id, text in handled if session_id == "a"] == ["pagar", "chave"]
+    assert [text for session_id, text in handled if session_id == "b"] == ["pagar", "chave"]
+    assert stats["completed"] == 4 and stats["active_sessions"] == 0
+
+
+def test_global_concurrency_cap():
+    async def main():
+        dispatcher = make_dispatcher(max_concurrency=2)
+        running, peak = 0, 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        for session_id in range(6):
+            dispatcher.submit(str(session_id), job)
+        await drain(dispatcher)
+        return peak
+
+    assert asyncio.run(main()) == 2
+
+
+def test_full_session_queue_is_shed():
+    async def main():
+        dispatcher = make_dispatcher(max_queue_per_session=2)
+        replies = [dispatcher.submit("a", lambda: asyncio.sleep(0.01)) for _ in range(4)]
+        await drain(dispatcher)
+        return replies, dispatcher.stats()
+
+    replies, stats = asyncio.run(main())
+    assert replies == [None, None, BUSY_MESSAGE, BUSY_MESSAGE]
+    assert stats["shed"] == 2
+
+
+def test_rate_limit_per_session():
+    async def main():
+        dispatcher = make_dispatcher(rate_per_second=0.001, burst=2)
+        replies = [dispatcher.submit("a", lambda: asyncio.sleep(0)) for _ in range(3)]
+        other = dispatcher.submit("b", lambda: asyncio.sleep(0))
+        await drain(dispatcher)
+        return replies, other
+
+    replies, other = asyncio.run(main())
+    assert replies == [None, None, RATE_LIMITED_MESSAGE]
+    assert other is None
+
+
+def test_failed_job_does_not_stop_the_queue():
+    async def main():
+        dispatcher = make_dispatcher()
+        handled = []
+
+        async def fail():
+            raise RuntimeError("api down")
+
+        async def ok():
+            handled.append("ok")
+
+        dispatcher.submit("a", fail)
+        dispatcher.submit("a", ok)
+        await drain(dispatcher)
+        return handled, dispatcher.stats()
+
+    handled, stats = asyncio.run(main())
+    assert handled == ["ok"]
+    assert (stats["failed"], stats["completed"]) == (1, 1)
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=1000, burst=1)
+    assert bucket.allow()
+    bucket.updated -= 0.01
+    assert bucket.allow()